@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Encode Batcher - Cross-request micro-batching for GNN encoding
+Concurrent requests each encode a graph of a handful of nodes; the per-call
+overhead dominates. Pending jobs are collected for a few milliseconds, merged
+into one disjoint-union graph (PyG Batch layout), encoded with a single
+forward pass and the slices are scattered back to each caller's future.
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import torch
+
+
+@dataclass
+class _EncodeJob:
+    encoder: Callable[[torch.Tensor, torch.Tensor], torch.Tensor]  # (x, edge_index) -> z
+    x: torch.Tensor
+    edge_index: torch.Tensor
+    candidates_z: Optional[torch.Tensor]  # score last node against these, if given
+    future: Future = field(default_factory=Future)
+
+
+class EncodeBatcher:
+    """
+    Dynamic batcher for an encoder callable (+ optional candidate scoring)
+
+    The encoder is ModelArtifacts.encoder: eager model.model.encode or an
+    exported TorchScript module, both (x, edge_index) -> z.
+
+    Callers run on inference worker threads and block on the returned
+    result; one background thread forms batches of up to max_batch_size
+    graphs, waiting at most max_wait_ms after the first job arrives. Since
+    every caller blocks until its result is back, the wait ends early once
+    all active callers have a job in the batch. A caller that finds the
+    batcher idle (nothing queued or running) encodes on its own thread,
+    skipping the queue and thread handoff.
+    """
+
+    def __init__(self, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue[_EncodeJob]" = queue.Queue()
+        self._active_lock = threading.Lock()
+        self._active = 0  # callers blocked in _submit
+        self._direct = 0  # callers encoding on their own thread
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+        self._thread.start()
+
+        self.batches = 0
+        self.jobs = 0
+        self.direct_jobs = 0
+
+    def encode(self, encoder, x: torch.Tensor, edge_index: torch.Tensor) -> torch.Tensor:
+        """Latent z for every node of one graph"""
+        z, _ = self._submit(encoder, x, edge_index, None)
+        return z
+
+    def encode_and_score(
+        self,
+        encoder,
+        x: torch.Tensor,
+        edge_index: torch.Tensor,
+        candidates_z: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Encode one graph and score its last node against candidate latents
+
+        Returns:
+            (z [num_nodes, latent_dim], probs [num_candidates])
+        """
+        return self._submit(encoder, x, edge_index, candidates_z)
+
+    def _submit(self, encoder, x, edge_index, candidates_z):
+        if self._stop.is_set():
+            raise RuntimeError("EncodeBatcher has been shut down")
+        job = _EncodeJob(encoder=encoder, x=x, edge_index=edge_index, candidates_z=candidates_z)
+        with self._active_lock:
+            direct = self._active == 0 and self._direct == 0
+            if direct:
+                self._direct += 1
+                self.direct_jobs += 1
+            else:
+                self._active += 1
+
+        if direct:
+            # Nothing to batch with: skip the round-trip through the batcher thread
+            try:
+                return self._run_one(job)
+            finally:
+                with self._active_lock:
+                    self._direct -= 1
+
+        try:
+            self._queue.put(job)
+            return job.future.result()
+        finally:
+            with self._active_lock:
+                self._active -= 1
+
+    def _collect(self) -> List[_EncodeJob]:
+        """Block for the first job, then gather more until full or timed out"""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        jobs = [first]
+        wait_until = time.perf_counter() + self.max_wait_s
+
+        while len(jobs) < self.max_batch_size:
+            if len(jobs) >= self._active:
+                # Nobody else is waiting on us - don't sit out the timer
+                try:
+                    jobs.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+
+            remaining = wait_until - time.perf_counter()
+            try:
+                if remaining > 0:
+                    jobs.append(self._queue.get(timeout=remaining))
+                else:
+                    jobs.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return jobs
+
+    def _run(self):
+        while not self._stop.is_set():
+            jobs = self._collect()
+            if not jobs:
+                continue
+
+            # Jobs from different model versions (hot-reload) are run separately
+            by_encoder: Dict[Callable, List[_EncodeJob]] = {}
+            for job in jobs:
+                by_encoder.setdefault(job.encoder, []).append(job)
+
+            for group in by_encoder.values():
+                try:
+                    self._run_batch(group)
+                except Exception as e:
+                    for job in group:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+
+            self.batches += 1
+            self.jobs += len(jobs)
+
+    @torch.no_grad()
+    def _run_one(self, job: _EncodeJob) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+        """Unbatched encode (+ scoring) of one job (matches a batch of one up to float rounding)"""
+        z = job.encoder(job.x, job.edge_index)
+        if job.candidates_z is None:
+            return z, None
+        return z, torch.sigmoid(job.candidates_z @ z[-1])
+
+    @torch.no_grad()
+    def _run_batch(self, jobs: List[_EncodeJob]):
+        encoder = jobs[0].encoder
+
+        # Disjoint union (same layout as torch_geometric Batch): node ids of
+        # graph k are offset by ptr[k]; built by hand to skip Data overhead
+        ptr = [0]
+        for job in jobs:
+            ptr.append(ptr[-1] + job.x.shape[0])
+        x_all = torch.cat([job.x for job in jobs], dim=0)
+        edge_all = torch.cat([job.edge_index + ptr[k] for k, job in enumerate(jobs)], dim=1)
+        z_all = encoder(x_all, edge_all)
+
+        # Batched scoring: each job's last-node latent against its own candidates
+        scored = [k for k, j in enumerate(jobs) if j.candidates_z is not None]
+        probs_split: Dict[int, torch.Tensor] = {}
+        if scored:
+            counts = [jobs[k].candidates_z.shape[0] for k in scored]
+            cand_all = torch.cat([jobs[k].candidates_z for k in scored], dim=0)
+            last_z = z_all[torch.tensor([ptr[k + 1] - 1 for k in scored], device=z_all.device)]
+            last_rep = torch.repeat_interleave(last_z, torch.tensor(counts, device=z_all.device), dim=0)
+            probs = torch.sigmoid((cand_all * last_rep).sum(dim=-1))
+            for k, p in zip(scored, torch.split(probs, counts)):
+                probs_split[k] = p
+
+        for k, job in enumerate(jobs):
+            job.future.set_result((z_all[ptr[k]:ptr[k + 1]], probs_split.get(k)))
+
+    def shutdown(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def get_stats(self) -> Dict:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_s * 1000.0,
+            'batches': self.batches,
+            'jobs': self.jobs,
+            'avg_batch_size': self.jobs / self.batches if self.batches else 0.0,
+            'direct_jobs': self.direct_jobs,
+            'pending': self._queue.qsize(),
+        }
+
+
+# Singleton instance for global access
+_global_batcher: Optional[EncodeBatcher] = None
+
+
+def get_batcher() -> EncodeBatcher:
+    """Get or create the process-wide batcher (sized from env)"""
+    global _global_batcher
+
+    if _global_batcher is None:
+        _global_batcher = EncodeBatcher(
+            max_batch_size=int(os.getenv("ENCODE_BATCH_MAX_SIZE", "32")),
+            max_wait_ms=float(os.getenv("ENCODE_BATCH_MAX_WAIT_MS", "2")),
+        )
+
+    return _global_batcher
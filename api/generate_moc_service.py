@@ -6,26 +6,52 @@ For admin panel integration
 
 import os
 import sys
+import time
 import json
+import random
+import asyncio
+import threading
 import torch
 import tempfile
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from dataclasses import dataclass, field
 
 # Add scripts to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
 
-from scripts.gnn_model import LegoGNN
+from scripts.model_registry import get_registry, ModelArtifacts
 from scripts.validate_connection import ConnectionValidator
-from sqlalchemy import create_engine, text
+from scripts.rule_store import get_rule_store
+from scripts.theme_candidate_index import get_index as get_theme_index
+from scripts.moc_search import generate_variants, validator_mask, build_remaining_vector
+from api.inference_executor import get_executor, ExecutorSaturated
+from api.encode_batcher import get_batcher
+from api.result_cache import get_result_cache, make_cache_key
+from api.metrics import get_metrics, RequestTimings
+from scripts.db import (
+    get_async_engine, dispose_async_engine, get_pool_stats,
+    fetch_theme_candidates, fetch_connectivity_rules
+)
+from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
 import numpy as np
 
 load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+
+# Seconds between checks for new model files on disk (0 disables hot-reload)
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "10"))
+
+# Fetch per-request DB rows on the event loop through the async pool
+# (0 → workers query through the shared sync pool instead)
+USE_ASYNC_DB = os.getenv("DB_ASYNC", "1") == "1"
+_async_db_ready = False
+
+# Known neighbors of the last part tried when none of the top 5 is valid (0 disables)
+NEIGHBOR_PROPOSALS = int(os.getenv("NEIGHBOR_PROPOSALS", "20"))
 
 app = FastAPI()
 
@@ -45,138 +71,428 @@ class PartInventoryItem(BaseModel):
 class MOCGenerationRequest(BaseModel):
     parts_inventory: List[PartInventoryItem]
     seed_part: str = "3001"
-    num_steps: int = 5
+    num_steps: int = Field(5, ge=0)
     theme_id: int = 158
+    num_variants: int = Field(1, ge=1)   # >1 (or beam_width) → batched search
+    beam_width: Optional[int] = Field(None, ge=1)
+    generation_mode: Literal["beam", "sample"] = "beam"
+    seed: Optional[int] = None           # None → random seed (returned in the response)
+    include_timings: bool = False        # add per-stage 'timings' (ms) to the response
+
+@app.on_event("startup")
+def load_model_artifacts():
+    """Load model artifacts once so requests never pay the cold start"""
+    registry = get_registry()
+    registry.load()
+    if MODEL_RELOAD_INTERVAL > 0:
+        registry.start_watcher(interval=MODEL_RELOAD_INTERVAL)
+    
+    get_executor()
+    get_batcher()
+    
+    global _async_db_ready
+    if USE_ASYNC_DB:
+        try:
+            get_async_engine()
+            _async_db_ready = True
+        except ImportError as e:
+            print(f"⚠️ Async DB driver unavailable ({e}), using the sync pool")
+    
+    try:
+        get_theme_index().warm()
+    except Exception as e:
+        # Index not built yet - lookups fall back to the DB per theme
+        print(f"⚠️ Theme candidate index not warmed: {e}")
+
+@app.on_event("shutdown")
+def stop_model_watcher():
+    get_registry().stop_watcher()
+    get_executor().shutdown(wait=False)
+    get_batcher().shutdown()
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    await dispose_async_engine()
+
+def _resolve_seed(request: MOCGenerationRequest) -> int:
+    """Fix the request's seed so the whole generation is reproducible"""
+    if request.seed is None:
+        request.seed = random.SystemRandom().randrange(2**31)
+    return request.seed
+
+def _result_cache_key(request: MOCGenerationRequest, model_version: str, runtime: str,
+                      rules_version: Optional[str]) -> str:
+    return make_cache_key(
+        model_version=model_version,
+        runtime=runtime,
+        rules_version=rules_version,
+        inventory=[(item.part_num, item.quantity) for item in request.parts_inventory],
+        seed_part=request.seed_part,
+        theme_id=request.theme_id,
+        num_steps=request.num_steps,
+        seed=request.seed,
+        num_variants=request.num_variants,
+        beam_width=request.beam_width,
+        generation_mode=request.generation_mode
+    )
 
 @app.post("/api/generate-moc")
 async def generate_moc(request: MOCGenerationRequest):
     """Generate MOC from parts inventory"""
     
+    timings = RequestTimings()
+    _resolve_seed(request)
+    
+    # Identical (seeded) requests are answered without touching the pool
+    cache = get_result_cache()
+    artifacts = get_registry().get()
+    cache_key = _result_cache_key(request, artifacts.version, artifacts.runtime,
+                                  get_rule_store().version(request.theme_id))
+    cached = cache.get(cache_key)
+    if cached is not None:
+        get_metrics().observe_request(timings, "generate-moc", "cached")
+        return _with_timings(request, {**cached, "cached": True}, timings)
+    
+    await _prefetch_db_rows(request, timings)
+    
+    # Blocking work runs in the inference pool so the event loop stays free
     try:
-        # Load model
-        device = torch.device('mps' if torch.backends.mps.is_available() else 'cpu')
-        
-        with open("ai_data/part_to_idx.json", "r") as f:
-            part_to_idx = json.load(f)
+        result = await get_executor().submit(_generate_moc_sync, request, timings)
+    except ExecutorSaturated as e:
+        get_metrics().observe_request(timings, "generate-moc", "rejected")
+        raise HTTPException(
+            status_code=503,
+            detail="Generation queue is full, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    if result.get("success"):
+        # Key by the model and rules that actually produced it (a reload may have landed)
+        cache.put(_result_cache_key(request, result["model_version"], result["runtime"],
+                                    result["rules_version"]), result)
+    
+    get_metrics().observe_request(timings, "generate-moc", "ok" if result.get("success") else "error")
+    return _with_timings(request, result, timings)
+
+def _with_timings(request: MOCGenerationRequest, result: dict, timings: RequestTimings) -> dict:
+    """Attach the debug timings block if asked (never stored in the result cache)"""
+    if not request.include_timings:
+        return result
+    return {**result, "timings": timings.as_dict()}
+
+async def _timed(timings: RequestTimings, stage: str, coro):
+    with timings.span(stage):
+        return await coro
+
+async def _fetch_rules_into_store(theme_id: int):
+    get_rule_store().put(theme_id, await fetch_connectivity_rules(theme_id))
+
+async def _fetch_candidates_into_index(theme_id: int):
+    index = get_theme_index()
+    candidates = await fetch_theme_candidates(theme_id, index.max_parts_per_theme)
+    if candidates:
+        index.put(theme_id, candidates)
+
+async def _prefetch_db_rows(request: MOCGenerationRequest, timings: RequestTimings):
+    """
+    Load whatever the shared caches are missing through the async pool
+    
+    Theme candidates go into the theme index and connectivity rules into
+    the rule store, so the worker only hits the DB if this fails. Warm
+    themes cost two dict lookups.
+    """
+    if not _async_db_ready:
+        return
+    
+    pending = []
+    if not get_theme_index().is_fresh(request.theme_id):
+        pending.append(_timed(timings, 'sql_candidates', _fetch_candidates_into_index(request.theme_id)))
+    if not get_rule_store().load_snapshot(request.theme_id):
+        pending.append(_timed(timings, 'rules_load', _fetch_rules_into_store(request.theme_id)))
+    if not pending:
+        return
+    
+    try:
+        await asyncio.gather(*pending)
+    except (SQLAlchemyError, OSError) as e:
+        print(f"⚠️ Async DB prefetch failed ({e.__class__.__name__}), loading in worker")
+
+def _ldr_line(i: int, part_num: str) -> str:
+    """LDraw type-1 line for the i-th generated part (one part per 20 LDU along X)"""
+    return f"1 72 {i * 20} 0 0 1 0 0 0 1 0 0 0 1 {part_num}.dat"
+
+LDR_HEADER = ["0 AI Generated MOC - Star Wars", "0 Name: ai_moc.ldr", ""]
+
+def _build_ldr(parts_list: List[str]) -> str:
+    """LDraw file for a generated part sequence"""
+    ldr_lines = list(LDR_HEADER)
+    
+    for i, part_num in enumerate(parts_list):
+        ldr_lines.append(_ldr_line(i, part_num))
+    
+    return "\n".join(ldr_lines)
+
+class GenerationError(Exception):
+    """Request can't be served (unknown seed part, empty theme...)"""
+
+@dataclass
+class GenerationContext:
+    """Everything a generation needs, resolved once per request"""
+    artifacts: ModelArtifacts
+    seed_idx: int
+    candidates: List[int]                # global part indices to score each step
+    validator: ConnectionValidator
+    remaining: Optional[torch.Tensor]    # owned quantity per part (None = unconstrained)
+    timings: RequestTimings = field(default_factory=RequestTimings)
+
+def _prepare_generation(request: MOCGenerationRequest,
+                        timings: Optional[RequestTimings] = None) -> GenerationContext:
+    """Resolve model snapshot, seed, candidates, validator and inventory"""
+    timings = timings or RequestTimings()
+    
+    # Resident model snapshot (stays consistent even if a hot-reload happens mid-request)
+    with timings.span('model_load'):
+        artifacts = get_registry().get()
+    part_to_idx = artifacts.part_to_idx
+    
+    # Get seed
+    if request.seed_part not in part_to_idx:
+        raise GenerationError(f"Seed part {request.seed_part} not found in database")
+    
+    seed_idx = part_to_idx[request.seed_part]
+    
+    # Initialize validator
+    with timings.span('rules_load'):
+        validator = ConnectionValidator(theme_id=request.theme_id)
+    
+    # Get theme candidates (in-memory index, DB fallback on miss)
+    with timings.span('sql_candidates'):
+        theme_parts = get_theme_index().get_part_nums(request.theme_id, limit=100)
+    
+    theme_candidates = [part_to_idx[p] for p in theme_parts if p in part_to_idx]
+    
+    # Owned quantities, aligned with part_to_idx (built once per request)
+    remaining = build_remaining_vector(
+        [(item.part_num, item.quantity) for item in request.parts_inventory],
+        part_to_idx,
+        artifacts.node_features.shape[0],
+        device=artifacts.device
+    )
+    
+    if remaining is not None:
+        # Only parts the user owns; if none are typical for the theme, score every owned part
+        owned = remaining > 0
+        theme_t = torch.tensor(theme_candidates, dtype=torch.long, device=artifacts.device)
+        candidates = theme_t[owned[theme_t]].tolist()
+        if not candidates:
+            candidates = torch.nonzero(owned).flatten().tolist()
+    else:
+        candidates = theme_candidates
+    
+    if not candidates:
+        raise GenerationError(f"No candidate parts found for theme {request.theme_id}")
+    
+    return GenerationContext(artifacts, seed_idx, candidates, validator, remaining, timings)
+
+def _generate_variants_sync(request: MOCGenerationRequest, ctx: GenerationContext) -> dict:
+    """Batched multi-MOC generation (all beams scored per step as tensor ops)"""
+    artifacts = ctx.artifacts
+    with ctx.timings.span('scoring'):
+        variants = generate_variants(
+            artifacts.latent_table,
+            ctx.seed_idx,
+            torch.tensor(ctx.candidates, dtype=torch.long),
+            num_steps=request.num_steps,
+            num_variants=request.num_variants,
+            beam_width=request.beam_width,
+            mode=request.generation_mode,
+            seed=request.seed,
+            mask_fn=validator_mask(ctx.validator, artifacts.idx_to_part),
+            remaining=ctx.remaining
+        )
+    
+    results = []
+    with ctx.timings.span('ldraw'):
+        for variant in variants:
+            parts_list = [artifacts.idx_to_part[i] for i in variant.indices]
+            results.append({
+                "ldr_content": _build_ldr(parts_list),
+                "parts_used": parts_list,
+                "num_parts": len(parts_list),
+                "score": variant.score
+            })
+    
+    best = results[0]
+    return {
+        "success": True,
+        "ldr_content": best["ldr_content"],
+        "parts_used": best["parts_used"],
+        "num_parts": best["num_parts"],
+        "variants": results,
+        "model_version": artifacts.version,
+        "runtime": artifacts.runtime,
+        "rules_version": ctx.validator.theme_rules.version,
+        "seed": request.seed
+    }
+
+def _iter_greedy_steps(request: MOCGenerationRequest, ctx: GenerationContext,
+                       cancel_event: Optional[threading.Event] = None):
+    """
+    Greedy generation, one accepted part per step
+    
+    Yields:
+        {'step', 'part_idx', 'part_num', 'score', 'valid', 'reason'}
+    Stops early once cancel_event is set or the inventory runs out.
+    """
+    artifacts = ctx.artifacts
+    theme_candidates = ctx.candidates
+    validator = ctx.validator
+    timings = ctx.timings
+    device = artifacts.device
+    idx_to_part = artifacts.idx_to_part
+    node_features = artifacts.node_features
+    encoder = artifacts.encoder
+    
+    candidate_pos = {idx_to_part[c]: i for i, c in enumerate(theme_candidates)}
+    
+    # Isolated latents of every theme candidate, gathered once per request
+    candidates_t = torch.tensor(theme_candidates, dtype=torch.long, device=device)
+    candidates_z = artifacts.latent_table[candidates_t]
+    
+    # Per-request RNG: the random context edges are reproducible from the seed
+    generator = torch.Generator()
+    generator.manual_seed(request.seed)
+    
+    # Remaining quantity of each candidate (seed consumes one if owned)
+    remaining = None
+    if ctx.remaining is not None:
+        remaining = ctx.remaining.clone()
+        remaining[ctx.seed_idx] -= 1
+    
+    current_indices = [ctx.seed_idx]
+    
+    for step in range(request.num_steps):
+        if cancel_event is not None and cancel_event.is_set():
+            return
         
-        idx_to_part = {v: k for k, v in part_to_idx.items()}
+        # Build current graph
+        x = node_features[current_indices].to(device)
+        num_nodes = len(current_indices)
         
-        node_features = torch.load("ai_data/node_features.pt", weights_only=False)
-        num_features = node_features.shape[1]
+        # Sparse random edges
+        if num_nodes > 1:
+            rows = torch.randint(0, num_nodes, (num_nodes * 3,), generator=generator)
+            cols = torch.randint(0, num_nodes, (num_nodes * 3,), generator=generator)
+            mask = rows != cols
+            edge_index = torch.stack([rows[mask], cols[mask]], dim=0).to(device)
+        else:
+            edge_index = torch.empty((2, 0), dtype=torch.long).to(device)
         
-        model = LegoGNN(num_features=num_features, hidden_dim=32, latent_dim=16)
-        model.load_state_dict(torch.load("ai_models/vgae_model.pth", map_location=device, weights_only=False))
-        model.to(device)
-        model.eval()
+        # Encode + score last node against every theme candidate
+        # (micro-batched with other in-flight requests)
+        last_node_idx = current_indices[-1]
+        with timings.span('encode'):
+            _, probs = get_batcher().encode_and_score(encoder, x, edge_index, candidates_z)
         
-        # Get seed
-        if request.seed_part not in part_to_idx:
-            return {
-                "success": False,
-                "error": f"Seed part {request.seed_part} not found in database"
-            }
+        scoring_start = time.perf_counter()
         
-        seed_idx = part_to_idx[request.seed_part]
+        # Inventory mask: candidates the user has run out of can't be picked
+        if remaining is not None:
+            available = remaining[candidates_t] > 0
+            if not bool(available.any()):
+                return
+            probs = probs.masked_fill(~available, -1.0)
         
-        # Initialize validator
-        validator = ConnectionValidator(theme_id=request.theme_id)
+        # Find best valid connection
+        top_k = min(5, len(theme_candidates))
+        top_indices = [i for i in torch.topk(probs, top_k).indices.tolist() if probs[i] >= 0]
         
-        # Get theme candidates
-        sql = text("""
-            SELECT DISTINCT p.part_num
-            FROM parts p
-            JOIN inventories i ON p.part_num = ANY(
-                SELECT jsonb_array_elements_text((i.parts_json)::jsonb)
-            )
-            JOIN sets s ON i.set_num = s.set_num
-            WHERE s.theme_id = :theme_id
-            LIMIT 100
-        """)
+        # Validate the top 5 in one batch, take the first valid one in score order
+        last_part = idx_to_part[last_node_idx]
+        pos_a = np.array([0, 0, 0])
+        pos_b = np.array([20 * (step + 1), 0, 0])
+        cand_parts = [idx_to_part[theme_candidates[i]] for i in top_indices]
+        selected = _first_valid(validator, last_part, top_indices, cand_parts, pos_a, pos_b)
         
-        with engine.connect() as conn:
-            theme_parts = [row[0] for row in conn.execute(sql, {'theme_id': request.theme_id}).fetchall()]
+        if selected is None and NEIGHBOR_PROPOSALS > 0:
+            # Propose the last part's most frequent rule neighbors (adjacency index slice)
+            cand_parts = [
+                p for p in validator.get_neighbor_parts(last_part, NEIGHBOR_PROPOSALS)
+                if p in candidate_pos and probs[candidate_pos[p]] >= 0
+            ]
+            selected = _first_valid(validator, last_part, [candidate_pos[p] for p in cand_parts],
+                                    cand_parts, pos_a, pos_b)
+            if selected is not None:
+                selected = (selected[0], True, f"{selected[2]}, proposed from known neighbors")
         
-        theme_candidates = [part_to_idx[p] for p in theme_parts if p in part_to_idx]
+        if selected is None:
+            # Fallback to best scored
+            selected = (top_indices[0], False, "No valid connection in top candidates, using best scored")
         
-        # Generate
-        current_indices = [seed_idx]
-        
-        for step in range(request.num_steps):
-            # Build current graph
-            x = node_features[current_indices].to(device)
-            num_nodes = len(current_indices)
-            
-            # Sparse random edges
-            if num_nodes > 1:
-                rows = torch.randint(0, num_nodes, (num_nodes * 3,))
-                cols = torch.randint(0, num_nodes, (num_nodes * 3,))
-                mask = rows != cols
-                edge_index = torch.stack([rows[mask], cols[mask]], dim=0).to(device)
-            else:
-                edge_index = torch.empty((2, 0), dtype=torch.long).to(device)
-            
-            # Encode
-            z = model.encode(x, edge_index)
-            
-            # Sample candidates
-            import random
-            candidates = random.sample(theme_candidates, min(20, len(theme_candidates)))
-            
-            # Score
-            last_node_idx = current_indices[-1]
-            last_z = z[-1].unsqueeze(0)
-            
-            candidates_z = model.encode(
-                node_features[candidates].to(device),
-                torch.empty((2, 0), dtype=torch.long).to(device)
-            )
-            
-            probs = torch.sigmoid((last_z @ candidates_z.t()).squeeze())
-            
-            # Find best valid connection
-            sorted_indices = torch.argsort(probs, descending=True)
-            selected_candidate_global_idx = None
-            
-            for idx in sorted_indices[:5]:  # Try top 5
-                cand_idx = candidates[idx.item()]
-                cand_part = idx_to_part[cand_idx]
-                last_part = idx_to_part[last_node_idx]
-                
-                # Validate
-                is_valid, _ = validator.validate_connection(
-                    last_part, cand_part,
-                    np.array([0, 0, 0]),
-                    np.array([20 * (step + 1), 0, 0])
-                )
-                
-                if is_valid:
-                    selected_candidate_global_idx = cand_idx
-                    break
-            
-            if selected_candidate_global_idx is None:
-                # Fallback to first
-                selected_candidate_global_idx = candidates[0]
-            
-            current_indices.append(selected_candidate_global_idx)
+        idx, is_valid, reason = selected
+        timings.add('scoring', time.perf_counter() - scoring_start)
+        selected_candidate_global_idx = theme_candidates[idx]
+        current_indices.append(selected_candidate_global_idx)
+        if remaining is not None:
+            remaining[selected_candidate_global_idx] -= 1
         
-        # Build LDraw
-        parts_list = [idx_to_part[i] for i in current_indices]
+        yield {
+            "step": step + 1,
+            "part_idx": selected_candidate_global_idx,
+            "part_num": idx_to_part[selected_candidate_global_idx],
+            "score": float(probs[idx]),
+            "valid": is_valid,
+            "reason": reason
+        }
+
+def _first_valid(validator: ConnectionValidator, last_part: str, indices: List[int],
+                 cand_parts: List[str], pos_a: np.ndarray, pos_b: np.ndarray):
+    """(index, True, reason) of the first candidate that validates, in the given order"""
+    if not indices:
+        return None
+    valid_mask, _ = validator.validate_connections_batch(last_part, cand_parts, pos_a, pos_b)
+    for idx, cand_part, is_valid in zip(indices, cand_parts, valid_mask):
+        if is_valid:
+            _, reason = validator.validate_connection(last_part, cand_part, pos_a, pos_b)
+            return idx, True, reason
+    return None
+
+def _generate_moc_sync(request: MOCGenerationRequest, timings: Optional[RequestTimings] = None) -> dict:
+    """Generation body (runs on an inference worker thread)"""
+    
+    try:
+        ctx = _prepare_generation(request, timings)
+        artifacts = ctx.artifacts
         
-        ldr_lines = ["0 AI Generated MOC - Star Wars", "0 Name: ai_moc.ldr", ""]
+        if request.num_variants > 1 or request.beam_width:
+            return _generate_variants_sync(request, ctx)
         
-        for i, part_num in enumerate(parts_list):
-            x_pos = i * 20
-            ldr_lines.append(f"1 72 {x_pos} 0 0 1 0 0 0 1 0 0 0 1 {part_num}.dat")
+        # Generate
+        current_indices = [ctx.seed_idx]
+        for event in _iter_greedy_steps(request, ctx):
+            current_indices.append(event["part_idx"])
         
-        ldr_content = "\n".join(ldr_lines)
+        # Build LDraw
+        with ctx.timings.span('ldraw'):
+            parts_list = [artifacts.idx_to_part[i] for i in current_indices]
+            ldr_content = _build_ldr(parts_list)
         
         return {
             "success": True,
             "ldr_content": ldr_content,
             "parts_used": parts_list,
-            "num_parts": len(parts_list)
+            "num_parts": len(parts_list),
+            "model_version": artifacts.version,
+            "runtime": artifacts.runtime,
+            "rules_version": ctx.validator.theme_rules.version,
+            "seed": request.seed
         }
         
+    except GenerationError as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -185,10 +501,164 @@ async def generate_moc(request: MOCGenerationRequest):
             "error": str(e)
         }
 
+def _stream_moc_sync(request: MOCGenerationRequest, emit, cancel_event: threading.Event,
+                     timings: Optional[RequestTimings] = None):
+    """Streaming generation body: emit() one event per accepted part"""
+    
+    try:
+        ctx = _prepare_generation(request, timings)
+        artifacts = ctx.artifacts
+        
+        emit({
+            "type": "start",
+            "model_version": artifacts.version,
+            "seed": request.seed,
+            "header": LDR_HEADER[:2]
+        })
+        
+        if request.num_variants > 1 or request.beam_width:
+            # Beams only settle at the end - send the finished result in one event
+            emit(_with_timings(request, {"type": "done", **_generate_variants_sync(request, ctx)}, ctx.timings))
+            return
+        
+        parts_list = [request.seed_part]
+        emit({"type": "part", "step": 0, "part_num": request.seed_part,
+              "line": _ldr_line(0, request.seed_part), "score": None, "valid": True, "reason": "Seed part"})
+        
+        for event in _iter_greedy_steps(request, ctx, cancel_event):
+            parts_list.append(event["part_num"])
+            emit({
+                "type": "part",
+                "step": event["step"],
+                "part_num": event["part_num"],
+                "line": _ldr_line(event["step"], event["part_num"]),
+                "score": event["score"],
+                "valid": event["valid"],
+                "reason": event["reason"]
+            })
+        
+        if cancel_event.is_set():
+            print(f"🛑 Streaming generation cancelled after {len(parts_list) - 1} steps")
+            return
+        
+        emit(_with_timings(request, {
+            "type": "done",
+            "success": True,
+            "parts_used": parts_list,
+            "num_parts": len(parts_list),
+            "model_version": artifacts.version
+        }, ctx.timings))
+        
+    except GenerationError as e:
+        emit({"type": "error", "error": str(e)})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        emit({"type": "error", "error": str(e)})
+
+@app.post("/api/generate-moc/stream")
+async def generate_moc_stream(request: MOCGenerationRequest, http_request: Request):
+    """
+    Stream the MOC as NDJSON: a 'start' event, one 'part' event per accepted
+    part (with its LDraw line, score and validation reason) and a final
+    'done' or 'error' event. Closing the connection stops the generation.
+    """
+    _resolve_seed(request)
+    
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancel_event = threading.Event()
+    timings = RequestTimings()
+    await _prefetch_db_rows(request, timings)
+    
+    def emit(event: dict):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+    
+    try:
+        job = get_executor().start(_stream_moc_sync, request, emit, cancel_event, timings)
+    except ExecutorSaturated as e:
+        get_metrics().observe_request(timings, "generate-moc/stream", "rejected")
+        raise HTTPException(
+            status_code=503,
+            detail="Generation queue is full, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    async def body():
+        outcome = "cancelled"
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    if job.done() and events.empty():
+                        break
+                    if await http_request.is_disconnected():
+                        break
+                    continue
+                
+                yield json.dumps(event) + "\n"
+                
+                if event["type"] in ("done", "error"):
+                    outcome = "ok" if event["type"] == "done" else "error"
+                    break
+                if await http_request.is_disconnected():
+                    break
+        finally:
+            # Client gone (or stream finished) - worker stops at the next step
+            cancel_event.set()
+            get_metrics().observe_request(timings, "generate-moc/stream", outcome)
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "model": get_registry().get_stats(),
+        "theme_index": get_theme_index().get_stats(),
+        "executor": get_executor().get_stats(),
+        "encode_batcher": get_batcher().get_stats(),
+        "result_cache": get_result_cache().get_stats(),
+        "rule_store": get_rule_store().get_stats(),
+        "db": get_pool_stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: stage histograms, queue depth, cache hit ratios"""
+    executor = get_executor().get_stats()
+    batcher = get_batcher().get_stats()
+    gauges = {
+        "moc_executor_queue_depth": ("Generation jobs waiting for a worker", executor['queue_depth']),
+        "moc_executor_in_flight": ("Generation jobs running or queued", executor['in_flight']),
+        "moc_encode_batcher_pending": ("Encode jobs waiting for the batcher", batcher['pending']),
+        "moc_encode_batcher_avg_batch_size": ("Average graphs per encode batch", batcher['avg_batch_size']),
+        "moc_result_cache_hit_ratio": ("Result cache hit ratio since startup", get_result_cache().get_stats()['hit_rate']),
+        "moc_theme_index_hit_ratio": ("Theme candidate cache hit ratio since startup", get_theme_index().get_stats()['hit_rate']),
+    }
+    counters = {
+        "moc_executor_rejected_total": ("Requests rejected with 503 since startup", executor['rejected']),
+    }
+    for name, pool in get_pool_stats().items():
+        if isinstance(pool, dict):
+            gauges[f"moc_db_{name}_pool_checked_out"] = (f"{name} DB connections in use", pool['checked_out'] or 0)
+            counters[f"moc_db_{name}_pool_connections_opened_total"] = (f"{name} DB connections opened since startup", pool['connections_opened'])
+    
+    return PlainTextResponse(get_metrics().render(gauges, counters), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    from scripts.export_encoder import RUNTIMES
+    
+    parser = argparse.ArgumentParser(description="MOC generation API")
+    parser.add_argument("--runtime", choices=RUNTIMES, default=os.getenv("INFERENCE_RUNTIME", "eager"),
+                        help="Encoder runtime (export first with scripts/export_encoder.py)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    
+    # Read by get_registry() at startup
+    os.environ["INFERENCE_RUNTIME"] = args.runtime
+    uvicorn.run(app, host=args.host, port=args.port)
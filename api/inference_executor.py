@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Inference Executor - Bounded worker pool for blocking generation work
+Keeps torch inference, SQL and validator setup off the asyncio event loop
+and sheds load (503 + Retry-After) once the queue is full
+"""
+
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+import torch
+
+T = TypeVar("T")
+
+
+class ExecutorSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Fixed-size thread pool with an explicit queue-depth limit
+
+    torch releases the GIL inside its kernels, so worker threads run
+    inference in parallel. The intra-op thread pool is process-wide in
+    torch; it is sized to threads_per_worker so that
+    max_workers * threads_per_worker stays within the available cores
+    instead of every request fanning out over all of them.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        threads_per_worker: int = 1,
+        max_queue_depth: int = 16,
+        retry_after_seconds: int = 1
+    ):
+        self.max_workers = max_workers
+        self.threads_per_worker = threads_per_worker
+        self.max_queue_depth = max_queue_depth
+        self.retry_after_seconds = retry_after_seconds
+
+        torch.set_num_threads(threads_per_worker)
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._pending = 0  # running + queued
+
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._pending
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a free worker"""
+        return max(0, self._pending - self.max_workers)
+
+    def _acquire_slot(self):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue_depth:
+                self.rejected += 1
+                raise ExecutorSaturated(self.retry_after_seconds)
+            self._pending += 1
+
+    def _release_slot(self):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    def start(self, fn: Callable[..., T], *args, **kwargs) -> "asyncio.Future[T]":
+        """
+        Schedule fn in the pool without waiting for it (raises ExecutorSaturated)
+
+        The slot is held until fn actually returns, even if nobody awaits it.
+        """
+        self._acquire_slot()
+        try:
+            work = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release_slot()
+            raise
+        # Released on the pool future, so a cancelled awaiter doesn't free a busy worker
+        work.add_done_callback(lambda _: self._release_slot())
+        return asyncio.wrap_future(work)
+
+    async def submit(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run fn in the pool and await its result (raises ExecutorSaturated)"""
+        return await self.start(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def get_stats(self) -> Dict:
+        return {
+            'max_workers': self.max_workers,
+            'threads_per_worker': self.threads_per_worker,
+            'max_queue_depth': self.max_queue_depth,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+
+# Singleton instance for global access
+_global_executor: Optional[InferenceExecutor] = None
+
+
+def get_executor() -> InferenceExecutor:
+    """Get or create the process-wide executor (sized from env)"""
+    global _global_executor
+
+    if _global_executor is None:
+        cpu_count = os.cpu_count() or 1
+        max_workers = int(os.getenv("INFERENCE_WORKERS", str(min(4, cpu_count))))
+        threads_per_worker = int(os.getenv(
+            "TORCH_THREADS_PER_WORKER", str(max(1, cpu_count // max_workers))
+        ))
+        _global_executor = InferenceExecutor(
+            max_workers=max_workers,
+            threads_per_worker=threads_per_worker,
+            max_queue_depth=int(os.getenv("INFERENCE_MAX_QUEUE", "16")),
+            retry_after_seconds=int(os.getenv("INFERENCE_RETRY_AFTER", "1")),
+        )
+
+    return _global_executor
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Metrics - Per-stage latency spans and Prometheus text exposition
+Each request carries a RequestTimings that accumulates perf_counter spans
+per stage (model load, SQL candidate fetch, rule load, encode, scoring,
+LDraw assembly); on completion the totals are folded into fixed-bucket
+histograms served by /metrics
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+STAGES = ('model_load', 'sql_candidates', 'rules_load', 'encode', 'scoring', 'ldraw')
+
+# Seconds; covers sub-millisecond cache hits up to multi-second cold paths
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels (thread-safe)"""
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List] = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(s[0]), s[1], s[2]) for key, s in sorted(self._series.items())]
+
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+def _labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+
+class RequestTimings:
+    """
+    Stage durations of one request (seconds, summed over repeated spans)
+
+    Spans may be opened from the event loop and from the worker thread,
+    but never concurrently for the same stage.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage → milliseconds, plus the total since the request started"""
+        timings = {stage: round(s * 1000.0, 3) for stage, s in self.stages.items()}
+        timings['total'] = round((time.perf_counter() - self.started) * 1000.0, 3)
+        return timings
+
+
+class MetricsRegistry:
+    """Histograms for the generation service plus Prometheus rendering"""
+
+    def __init__(self):
+        self.stage_duration = Histogram(
+            "moc_stage_duration_seconds",
+            "Time spent per generation stage, per request"
+        )
+        self.request_duration = Histogram(
+            "moc_request_duration_seconds",
+            "End-to-end generate-moc request latency"
+        )
+
+    def observe_request(self, timings: RequestTimings, endpoint: str, outcome: str):
+        for stage, seconds in timings.stages.items():
+            self.stage_duration.observe(seconds, stage=stage)
+        self.request_duration.observe(
+            time.perf_counter() - timings.started, endpoint=endpoint, outcome=outcome
+        )
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None,
+               counters: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """
+        Prometheus text format (version 0.0.4)
+
+        Args:
+            gauges: name -> (help, value) point-in-time values to append
+            counters: name -> (help, value) totals since startup (names end in _total)
+        """
+        lines = self.stage_duration.render() + self.request_duration.render()
+        for kind, values in (("gauge", gauges), ("counter", counters)):
+            for name, (help_text, value) in sorted((values or {}).items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance for global access
+_global_metrics: Optional[MetricsRegistry] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get or create the process-wide metrics registry"""
+    global _global_metrics
+
+    if _global_metrics is None:
+        _global_metrics = MetricsRegistry()
+
+    return _global_metrics
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Result Cache - Deterministic generate-moc responses keyed by request content
+Generation is fully seeded, so an identical request (same model version,
+encoder runtime, theme rules version, inventory, seed part, theme, steps,
+search settings and seed) always yields the same MOC; completed results are kept in a bounded LRU, optionally
+mirrored to disk so they survive restarts.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def make_cache_key(
+    model_version: str,
+    inventory: Iterable[Tuple[str, int]],
+    seed_part: str,
+    theme_id: int,
+    num_steps: int,
+    seed: int,
+    **search_params
+) -> str:
+    """
+    Canonical hash of everything that determines the output
+
+    Inventory order and duplicate lines don't matter (quantities are summed).
+    """
+    totals: Dict[str, int] = {}
+    for part_num, quantity in inventory:
+        totals[part_num] = totals.get(part_num, 0) + int(quantity)
+
+    canonical = json.dumps({
+        'model_version': model_version,
+        'inventory': sorted(totals.items()),
+        'seed_part': seed_part,
+        'theme_id': theme_id,
+        'num_steps': num_steps,
+        'seed': seed,
+        'search': dict(sorted(search_params.items())),
+    }, sort_keys=True, separators=(',', ':'))
+
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU of completed responses
+
+    With disk_dir set, every entry is also written as <key>.json and memory
+    misses fall through to disk; the directory is pruned to max_disk_entries
+    (oldest first).
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_dir: Optional[str] = None,
+                 max_disk_entries: int = 100000):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        result = self._read_disk(key)
+        if result is not None:
+            self.disk_hits += 1
+            self._remember(key, result)
+            return result
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, result: dict):
+        self._remember(key, result)
+        self._write_disk(key, result)
+
+    def _remember(self, key: str, result: dict):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        if not self.disk_dir:
+            return None
+        path = os.path.join(self.disk_dir, f"{key}.json")
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_disk(self, key: str, result: dict):
+        if not self.disk_dir:
+            return
+        path = os.path.join(self.disk_dir, f"{key}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+
+        self._puts_since_prune += 1
+        if self._puts_since_prune >= 64:
+            self._puts_since_prune = 0
+            self._prune_disk()
+
+    def _prune_disk(self):
+        entries = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".json")]
+        excess = len(entries) - self.max_disk_entries
+        if excess <= 0:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'disk_dir': self.disk_dir,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+# Singleton instance for global access
+_global_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Get or create the process-wide result cache (sized from env)"""
+    global _global_cache
+
+    if _global_cache is None:
+        _global_cache = ResultCache(
+            max_entries=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+            disk_dir=os.getenv("RESULT_CACHE_DIR") or None,
+        )
+
+    return _global_cache
@@ -55,10 +55,12 @@ ingest_order = [
 ]
 
 def ingest_table(table_name, file_name, chunksize=5000):
+    """Ingest one CSV; returns the inventory ids touched (inventory_parts only)"""
     file_path = os.path.join(DATA_DIR, file_name)
+    touched_inventories = set()
     if not os.path.exists(file_path):
         print(f"⚠️ Skipping {table_name}: {file_name} not found.")
-        return
+        return touched_inventories
 
     print(f"🚀 Processing {table_name} from {file_name}...")
     
@@ -91,6 +93,8 @@ def ingest_table(table_name, file_name, chunksize=5000):
                 method='multi'  # standard insert compatible with postgres
             )
             total_rows += len(chunk)
+            if table_name == 'inventory_parts':
+                touched_inventories.update(chunk['inventory_id'].astype(int).tolist())
             print(f"   Inserted chunk {i+1} ({len(chunk)} rows). Total: {total_rows}")
                 
         print(f"✅ Successfully ingested {table_name}.")
@@ -98,12 +102,23 @@ def ingest_table(table_name, file_name, chunksize=5000):
     except Exception as e:
         print(f"❌ Error ingesting {table_name}: {e}")
 
+    return touched_inventories
+
 def main():
     print("Starting LEGO Data Ingestion...")
     print("Make sure you have run schema.sql in Supabase first to create tables!")
     
+    touched_inventories = set()
     for table, file_name in ingest_order:
-        ingest_table(table, file_name)
+        touched_inventories |= ingest_table(table, file_name)
+
+    # Keep the theme → part candidate index in sync (only touched themes)
+    if touched_inventories:
+        from scripts.theme_candidate_index import refresh_after_ingest
+        try:
+            refresh_after_ingest(touched_inventories)
+        except Exception as e:
+            print(f"⚠️ Could not refresh theme_part_index: {e}")
 
     print("\n🎉 Ingestion complete!")
 
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pairwise vs spatial-hash cantilever detection
+Builds synthetic models from 100 to 20k parts (stacked layers on the stud
+grid with a share of off-grid overhanging parts), checks both detectors
+report the same cantilevers, and times them. The pairwise reference is
+skipped above --max-pairwise parts (it is quadratic).
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from scripts.physics_validator import PhysicsValidator, Part
+
+IDENTITY = [1, 0, 0, 0, 1, 0, 0, 0, 1]
+
+
+def make_model(num_parts: int, seed: int):
+    """Parts on a square footprint in plate (8 LDU) layers, ~60% of stud cells filled per layer"""
+    rng = np.random.default_rng(seed)
+    layers = max(4, int(round(num_parts ** (1 / 3))))
+    width = max(4, int(np.sqrt(num_parts / (3 * layers) / 0.6)))
+
+    xs = 20.0 * rng.integers(0, width, size=num_parts)
+    zs = 20.0 * rng.integers(0, width, size=num_parts)
+    ys = -8.0 * rng.integers(0, layers * 3, size=num_parts)
+
+    # 5% hang off the side of the footprint
+    overhang = rng.random(num_parts) < 0.05
+    xs[overhang] += 20.0 * width + 10.0 * rng.integers(1, 16, size=int(overhang.sum()))
+
+    part_nums = rng.choice(['3001', '3003', '3020', '3023', '3024'], size=num_parts)
+    return [Part(str(p), 1, float(x), float(y), float(z), IDENTITY) for p, x, y, z in zip(part_nums, xs, ys, zs)]
+
+
+def same_cantilevers(a, b) -> bool:
+    if len(a) != len(b):
+        return False
+    return all(x['part_num'] == y['part_num'] and x['position'] == y['position'] and
+               x['severity'] == y['severity'] and abs(x['overhang_studs'] - y['overhang_studs']) < 1e-9
+               for x, y in zip(a, b))
+
+
+def best_of(fn, repeats: int):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cantilever detection benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000, 10000, 20000])
+    parser.add_argument("--max-pairwise", type=int, default=5000, help="Largest model checked with the O(n²) scan")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("🚀 Cantilever Detection Benchmark")
+    print("=" * 60)
+    print(f"   {'parts':>7} {'cantilevers':>12} {'pairwise ms':>12} {'hash ms':>10} {'speedup':>8}  parity")
+
+    validator = PhysicsValidator()
+    all_match = True
+    for size in args.sizes:
+        parts = make_model(size, args.seed)
+        found, hash_ms = best_of(lambda: validator.detect_cantilevers(parts), args.repeats)
+
+        if size <= args.max_pairwise:
+            expected, pair_ms = best_of(lambda: validator.detect_cantilevers_pairwise(parts), 1)
+            match = same_cantilevers(expected, found)
+            all_match &= match
+            print(f"   {size:>7} {len(found):>12} {pair_ms:>12.1f} {hash_ms:>10.1f} "
+                  f"{pair_ms / hash_ms:>7.0f}x  {'✅' if match else '❌'}")
+        else:
+            print(f"   {size:>7} {len(found):>12} {'-':>12} {hash_ms:>10.1f} {'-':>8}  -")
+
+    print(f"\n{'✅ Identical cantilevers' if all_match else '❌ Detectors disagree'} on every checked model")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Load test: fresh connection per query vs the shared async pool
+Fires the two per-request queries of /api/generate-moc (theme candidates +
+connectivity rules) from many concurrent coroutines against DATABASE_URL and
+reports latency plus how many physical connections each setup opened
+"""
+
+import time
+import asyncio
+import argparse
+
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool
+
+from scripts.db import (
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_STATEMENT_CACHE_SIZE,
+    create_async_db_engine, fetch_theme_candidates, fetch_connectivity_rules
+)
+from scripts.benchmark_utils import latency_stats, print_stats
+
+
+async def run(label, engine, theme_id, concurrency, num_requests):
+    opened = [0]
+    event.listen(engine.sync_engine, "connect", lambda *_: opened.__setitem__(0, opened[0] + 1))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one_request():
+        async with semaphore:
+            start = time.perf_counter()
+            await asyncio.gather(
+                fetch_theme_candidates(theme_id, 1000, engine=engine),
+                fetch_connectivity_rules(theme_id, engine=engine)
+            )
+            samples.append(time.perf_counter() - start)
+
+    await one_request()  # warm-up (first connect, statement preparation)
+    samples.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(num_requests)))
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+
+    stats = latency_stats(samples)
+    print_stats(label, stats)
+    print(f"   {'':<24} {num_requests / elapsed:8.1f} req/s   "
+          f"{opened[0]} connections opened for {2 * (num_requests + 1)} queries")
+    return stats
+
+
+async def main_async(args):
+    print("🚀 DB Pool Load Test")
+    print("=" * 60)
+    print(f"   Concurrency: {args.concurrency}, requests: {args.requests}, theme: {args.theme}")
+    print(f"   Pool: size {DB_POOL_SIZE} + overflow {DB_MAX_OVERFLOW}, "
+          f"statement cache {DB_STATEMENT_CACHE_SIZE}\n")
+
+    fresh = await run("connection per query", create_async_db_engine(poolclass=NullPool),
+                      args.theme, args.concurrency, args.requests)
+    pooled = await run("shared pool", create_async_db_engine(),
+                       args.theme, args.concurrency, args.requests)
+
+    print(f"\n⚡ p50 speedup: {fresh['p50_ms'] / pooled['p50_ms']:.1f}x   "
+          f"p99 speedup: {fresh['p99_ms'] / pooled['p99_ms']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the shared async DB pool")
+    parser.add_argument("--theme", type=int, default=158)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
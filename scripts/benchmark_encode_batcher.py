@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request encode vs cross-request micro-batching
+Many threads each encode a tiny graph and score its last node against
+theme candidates, the way concurrent /api/generate-moc requests do
+"""
+
+import time
+import argparse
+import threading
+
+import torch
+
+from api.encode_batcher import EncodeBatcher
+from scripts.gnn_model import LegoVGAE
+
+
+def _make_job(num_features: int, latent_table: torch.Tensor, num_candidates: int):
+    num_nodes = int(torch.randint(1, 8, (1,)))
+    x = torch.randn(num_nodes, num_features)
+    if num_nodes > 1:
+        rows = torch.randint(0, num_nodes, (num_nodes * 3,))
+        cols = torch.randint(0, num_nodes, (num_nodes * 3,))
+        mask = rows != cols
+        edge_index = torch.stack([rows[mask], cols[mask]], dim=0)
+    else:
+        edge_index = torch.empty((2, 0), dtype=torch.long)
+    candidates_z = latent_table[torch.randint(0, latent_table.shape[0], (num_candidates,))]
+    return x, edge_index, candidates_z
+
+
+def _direct(model, x, edge_index, candidates_z):
+    with torch.no_grad():
+        z = model.model.encode(x, edge_index)
+        return z, torch.sigmoid(candidates_z @ z[-1])
+
+
+def run(label, call, concurrency, calls_per_thread, jobs):
+    def worker(tid):
+        for i in range(calls_per_thread):
+            x, edge_index, candidates_z = jobs[(tid * calls_per_thread + i) % len(jobs)]
+            call(x, edge_index, candidates_z)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total = concurrency * calls_per_thread
+    print(f"   {label:<28} {total / elapsed:10.0f} encodes/sec  ({elapsed:.2f}s)")
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EncodeBatcher throughput benchmark")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 8, 32])
+    parser.add_argument("--calls", type=int, default=200, help="Calls per thread")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print("🚀 EncodeBatcher Benchmark")
+    print("=" * 60)
+
+    torch.manual_seed(0)
+    num_features = 81
+    model = LegoVGAE(num_features=num_features, latent_dim=16).eval()
+    latent_table = torch.randn(5000, 16)
+    jobs = [_make_job(num_features, latent_table, 100) for _ in range(256)]
+
+    batcher = EncodeBatcher(max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    # Batched results must match direct encoding
+    x, edge_index, candidates_z = jobs[0]
+    z_ref, p_ref = _direct(model, x, edge_index, candidates_z)
+    z_bat, p_bat = batcher.encode_and_score(model.model.encode, x, edge_index, candidates_z)
+    print(f"   Parity: z {torch.allclose(z_ref, z_bat, atol=1e-5)}, probs {torch.allclose(p_ref, p_bat, atol=1e-5)}")
+
+    for concurrency in args.concurrency:
+        print(f"\n⚡ Concurrency {concurrency}:")
+        direct = run("direct", lambda *a: _direct(model, *a), concurrency, args.calls, jobs)
+        batched = run("micro-batched", lambda *a: batcher.encode_and_score(model.model.encode, *a),
+                      concurrency, args.calls, jobs)
+        print(f"   Speedup: {batched / direct:.2f}x")
+
+    print(f"\n📊 Batcher stats: {batcher.get_stats()}")
+    batcher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
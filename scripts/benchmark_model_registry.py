@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request artifact loading vs resident ModelRegistry
+Replays the generate-moc inference path (minus SQL) on fake artifacts
+and reports p50/p99 request latency before and after
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import torch
+
+from scripts.gnn_model import LegoVGAE
+from scripts.model_registry import ModelRegistry
+from scripts.benchmark_utils import write_fake_artifacts, latency_stats, time_calls, print_stats
+
+
+def _run_generation(model, node_features, device, num_steps: int, num_candidates: int = 20):
+    """Same encode/score work as the API handler for one request"""
+    current_indices = [0]
+    num_parts = node_features.shape[0]
+
+    for step in range(num_steps):
+        x = node_features[current_indices].to(device)
+        num_nodes = len(current_indices)
+        if num_nodes > 1:
+            rows = torch.randint(0, num_nodes, (num_nodes * 3,))
+            cols = torch.randint(0, num_nodes, (num_nodes * 3,))
+            mask = rows != cols
+            edge_index = torch.stack([rows[mask], cols[mask]], dim=0).to(device)
+        else:
+            edge_index = torch.empty((2, 0), dtype=torch.long).to(device)
+
+        z = model.model.encode(x, edge_index)
+        candidates = torch.randint(0, num_parts, (num_candidates,)).tolist()
+        candidates_z = model.model.encode(
+            node_features[candidates].to(device),
+            torch.empty((2, 0), dtype=torch.long).to(device)
+        )
+        probs = torch.sigmoid((z[-1].unsqueeze(0) @ candidates_z.t()).squeeze())
+        current_indices.append(candidates[int(torch.argmax(probs))])
+
+    return current_indices
+
+
+def cold_request(paths, device, num_steps):
+    """Old behaviour: reload every artifact from disk on each request"""
+    with open(paths['part_to_idx'], "r") as f:
+        part_to_idx = json.load(f)
+    idx_to_part = {v: k for k, v in part_to_idx.items()}
+    node_features = torch.load(paths['node_features'], weights_only=False)
+    model = LegoVGAE(num_features=node_features.shape[1], latent_dim=16)
+    model.load_state_dict(torch.load(paths['model'], map_location=device, weights_only=False))
+    model.to(device)
+    model.eval()
+    return [idx_to_part[i] for i in _run_generation(model, node_features, device, num_steps)]
+
+
+def warm_request(registry, num_steps):
+    """New behaviour: use the resident snapshot"""
+    artifacts = registry.get()
+    indices = _run_generation(artifacts.model, artifacts.node_features, artifacts.device, num_steps)
+    return [artifacts.idx_to_part[i] for i in indices]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ModelRegistry latency benchmark")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--num-parts", type=int, default=20000)
+    parser.add_argument("--num-steps", type=int, default=5)
+    args = parser.parse_args()
+
+    print("🚀 ModelRegistry Benchmark")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_fake_artifacts(tmp, num_parts=args.num_parts)
+        device = torch.device('cpu')
+
+        registry = ModelRegistry(
+            part_to_idx_path=paths['part_to_idx'],
+            node_features_path=paths['node_features'],
+            model_path=paths['model'],
+            device=device
+        )
+        registry.load()
+
+        print(f"\n⚡ {args.requests} requests, {args.num_parts} parts, {args.num_steps} steps:")
+        cold = latency_stats(time_calls(lambda: cold_request(paths, device, args.num_steps), args.requests))
+        warm = latency_stats(time_calls(lambda: warm_request(registry, args.num_steps), args.requests))
+        print_stats("before (load per call)", cold)
+        print_stats("after (registry)", warm)
+        print(f"   Speedup p50: {cold['p50_ms'] / warm['p50_ms']:.1f}x   p99: {cold['p99_ms'] / warm['p99_ms']:.1f}x")
+
+        # Hot-reload: rewrite the weights and make sure the version changes
+        print("\n🔄 Hot-reload check:")
+        old_version = registry.get().version
+        time.sleep(0.01)
+        torch.save(LegoVGAE(num_features=registry.get().num_features).state_dict(), paths['model'])
+        os.utime(paths['model'])
+        reloaded = registry.reload_if_changed()
+        print(f"   Reloaded: {reloaded}  v{old_version} → v{registry.get().version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-rule INSERT ... ON CONFLICT loop vs staged bulk upsert
+Writes N synthetic connectivity rules into an empty theme (all inserts),
+then rewrites them with new frequencies (all conflicts), once per write
+path, checks both paths leave identical rows, and reports rules/second.
+Runs against DATABASE_URL when --url is given (use a local Postgres to
+measure COPY), otherwise against a SQLite stand-in database.
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from scripts.benchmark_utils import write_standin_database, CONNECTION_TYPES
+from scripts.rule_upsert import upsert_rules
+
+ROW_UPSERT_SQL = text("""
+    INSERT INTO connectivity_rules
+    (part_a, part_b, connection_type, contact_points, frequency, theme_id)
+    VALUES (:part_a, :part_b, :conn_type, :contact_points, :frequency, :theme_id)
+    ON CONFLICT (part_a, part_b, connection_type, theme_id)
+    DO UPDATE SET
+        frequency = EXCLUDED.frequency,
+        contact_points = EXCLUDED.contact_points
+""")
+
+
+def make_rules(num_rules: int, theme_id: int, seed: int):
+    """Distinct (part_a, part_b, type) rules with 1-4 clustered contact points each"""
+    rng = np.random.default_rng(seed)
+    num_parts = max(100, int(np.sqrt(num_rules)) * 2)
+    keys = set()
+    while len(keys) < num_rules:
+        a, b = rng.integers(num_parts, size=2)
+        keys.add((f"p{a}", f"p{b}", CONNECTION_TYPES[int(rng.integers(len(CONNECTION_TYPES)))]))
+
+    rules = []
+    for part_a, part_b, conn_type in sorted(keys):
+        points = [{'rel_pos': [20.0 * int(rng.integers(-3, 4)), 24.0 * int(rng.integers(-1, 2)), 0.0],
+                   'tolerance': float(rng.uniform(5, 15)), 'count': int(rng.integers(1, 20)),
+                   'm2': float(rng.uniform(0, 50))}
+                  for _ in range(int(rng.integers(1, 5)))]
+        rules.append({'part_a': part_a, 'part_b': part_b, 'conn_type': conn_type,
+                      'contact_points': json.dumps(points), 'frequency': int(rng.integers(1, 100)),
+                      'theme_id': theme_id})
+    return rules
+
+
+def write_rowwise(conn, rules):
+    for rule in rules:
+        conn.execute(ROW_UPSERT_SQL, rule)
+
+
+def write_bulk(conn, rules):
+    upsert_rules(conn, rules)
+
+
+def run(label, engine, write, rules, updated, theme_id):
+    """rules/sec for a fresh insert and a full rewrite; returns the rows left behind"""
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM connectivity_rules WHERE theme_id = :theme_id"), {'theme_id': theme_id})
+
+    rates = []
+    for batch in (rules, updated):
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            write(conn, batch)
+        rates.append(len(batch) / (time.perf_counter() - start))
+    print(f"   {label:<24} insert {rates[0]:>10,.0f} rules/s   update {rates[1]:>10,.0f} rules/s")
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT part_a, part_b, connection_type, contact_points, frequency
+            FROM connectivity_rules WHERE theme_id = :theme_id
+            ORDER BY part_a, part_b, connection_type
+        """), {'theme_id': theme_id}).fetchall()
+    return rates, [(r[0], r[1], r[2], r[3] if isinstance(r[3], (list, dict)) else json.loads(r[3]), r[4])
+                   for r in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk connectivity_rules upsert benchmark")
+    parser.add_argument("--rules", type=int, default=20000)
+    parser.add_argument("--url", action="store_true",
+                        help="Use DATABASE_URL (e.g. a local Postgres) instead of a SQLite stand-in")
+    parser.add_argument("--theme", type=int, default=999999, help="Scratch theme id (its rules are deleted)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("🚀 Connectivity Rules Upsert Benchmark")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            url = os.environ["DATABASE_URL"]
+        else:
+            url = write_standin_database(os.path.join(tmp, "rules.db"), [f"p{i}" for i in range(100)],
+                                         theme_ids=(158,), sets_per_theme=1, rules_per_theme=0)['url']
+        engine = create_engine(url)
+        print(f"   {engine.dialect.name} ({engine.dialect.driver}), {args.rules} rules\n")
+
+        rules = make_rules(args.rules, args.theme, args.seed)
+        updated = [dict(rule, frequency=rule['frequency'] + 1) for rule in rules]
+
+        row_rates, row_rows = run("per-rule statements", engine, write_rowwise, rules, updated, args.theme)
+        bulk_rates, bulk_rows = run("staged bulk upsert", engine, write_bulk, rules, updated, args.theme)
+
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM connectivity_rules WHERE theme_id = :theme_id"), {'theme_id': args.theme})
+        engine.dispose()
+
+    match = row_rows == bulk_rows and len(bulk_rows) == args.rules
+    print(f"\n{'✅' if match else '❌'} Parity: {len(bulk_rows)} rows, "
+          f"{'identical' if match else 'DIFFERENT'} after both paths")
+    print(f"⚡ Speedup: insert {bulk_rates[0] / row_rates[0]:.1f}x, update {bulk_rates[1] / row_rates[1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
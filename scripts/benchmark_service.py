@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Load test: /api/generate-moc end to end, fully offline
+Starts the FastAPI app in a uvicorn subprocess against a synthetic SQLite
+stand-in database and tiny fake model artifacts, drives it at several
+concurrency levels and writes RPS, latency percentiles and server CPU usage
+as JSON so runs can be compared over time
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from typing import Dict, List
+
+import numpy as np
+
+from scripts.benchmark_utils import write_fake_artifacts, write_standin_database, latency_stats
+
+
+def serve(port: int):
+    """Server side (subprocess): the real app plus a CPU-time probe"""
+    import uvicorn
+    from api.generate_moc_service import app
+
+    @app.get("/_bench/cpu")
+    def cpu_seconds():
+        t = os.times()
+        return {'cpu_s': t.user + t.system}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get_json(port: int, path: str) -> Dict:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request("GET", path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def _wait_ready(port: int, proc: subprocess.Popen, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            _get_json(port, "/health")
+            return
+        except (ConnectionError, OSError):
+            time.sleep(0.2)
+    raise TimeoutError("Server did not become ready")
+
+
+def make_payloads(db: Dict, count: int, num_steps: int, num_variants: int, seed: int) -> List[bytes]:
+    """Request bodies from the stand-in inventories (distinct seeds → no result cache hits)"""
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for i in range(count):
+        theme_id, inventory = db['inventories'][int(rng.integers(len(db['inventories'])))]
+        payloads.append(json.dumps({
+            'parts_inventory': [{'part_num': p, 'quantity': q} for p, q in inventory],
+            'seed_part': inventory[int(rng.integers(len(inventory)))][0],
+            'theme_id': theme_id,
+            'num_steps': num_steps,
+            'num_variants': num_variants,
+            'seed': seed * 1_000_000 + i,
+        }).encode())
+    return payloads
+
+
+def run_level(port: int, payloads: List[bytes], concurrency: int) -> Dict:
+    """Fire every payload with `concurrency` keep-alive clients"""
+    latencies, statuses = [], []
+    lock = threading.Lock()
+    next_idx = [0]
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        while True:
+            with lock:
+                i = next_idx[0]
+                next_idx[0] += 1
+            if i >= len(payloads):
+                break
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/api/generate-moc", body=payloads[i],
+                             headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                body = json.loads(response.read())
+                status = response.status if body.get("success", True) else "error"
+            except (OSError, http.client.HTTPException, ValueError):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+                status = "error"
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses.append(status)
+                if status == 200:
+                    latencies.append(elapsed)
+        conn.close()
+
+    cpu_before = _get_json(port, "/_bench/cpu")['cpu_s']
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - start
+    cpu_s = _get_json(port, "/_bench/cpu")['cpu_s'] - cpu_before
+
+    ok = statuses.count(200)
+    return {
+        'concurrency': concurrency,
+        'requests': len(payloads),
+        'ok': ok,
+        'rejected_503': statuses.count(503),
+        'errors': len(statuses) - ok - statuses.count(503),
+        'wall_s': round(wall_s, 3),
+        'rps': round(ok / wall_s, 2) if wall_s else 0.0,
+        'latency_ms': {k: round(v, 3) for k, v in latency_stats(latencies).items()} if latencies else None,
+        'server_cpu_s': round(cpu_s, 3),
+        'server_cpu_cores': round(cpu_s / wall_s, 3) if wall_s else 0.0,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for /api/generate-moc")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--num-parts", type=int, default=2000, help="Fake catalog size")
+    parser.add_argument("--num-steps", type=int, default=5)
+    parser.add_argument("--num-variants", type=int, default=1)
+    parser.add_argument("--rules-per-theme", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report here")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    print("🚀 generate-moc Load Test (offline)", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_fake_artifacts(tmp, num_parts=args.num_parts, seed=args.seed)
+        with open(paths['part_to_idx']) as f:
+            part_nums = list(json.load(f))
+        db = write_standin_database(os.path.join(tmp, "standin.db"), part_nums,
+                                    rules_per_theme=args.rules_per_theme, seed=args.seed)
+        print(f"   Stand-in DB: {db['url']}", file=sys.stderr)
+
+        port = _free_port()
+        env = dict(
+            os.environ,
+            DATABASE_URL=db['url'],
+            PART_TO_IDX_PATH=paths['part_to_idx'],
+            NODE_FEATURES_PATH=paths['node_features'],
+            MODEL_PATH=paths['model'],
+            MODEL_RELOAD_INTERVAL="0",
+        )
+        proc = subprocess.Popen([sys.executable, "-m", "scripts.benchmark_service", "--serve", str(port)],
+                                env=env, stdout=sys.stderr)
+        try:
+            _wait_ready(port, proc)
+            run_level(port, make_payloads(db, args.warmup, args.num_steps, args.num_variants, args.seed + 1), 1)
+
+            levels = []
+            for i, concurrency in enumerate(args.concurrency):
+                payloads = make_payloads(db, args.requests, args.num_steps, args.num_variants,
+                                         args.seed + 2 + i)
+                level = run_level(port, payloads, concurrency)
+                levels.append(level)
+                latency = level['latency_ms'] or {}
+                print(f"   c={concurrency:<4} {level['rps']:8.1f} req/s   "
+                      f"p50 {latency.get('p50_ms', 0):8.2f} ms   p99 {latency.get('p99_ms', 0):8.2f} ms   "
+                      f"cpu {level['server_cpu_cores']:.2f} cores   "
+                      f"503s {level['rejected_503']}", file=sys.stderr)
+
+            health = _get_json(port, "/health")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    import torch
+    report = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'git_commit': _git_commit(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('serve', 'output')},
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'server_env': {k: os.environ[k] for k in sorted(os.environ)
+                           if k.startswith(("INFERENCE_", "TORCH_", "ENCODE_", "DB_", "RESULT_"))},
+        },
+        'server': {'executor': health.get('executor'), 'encode_batcher': health.get('encode_batcher')},
+        'levels': levels,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: incremental StabilityState vs re-scoring from scratch
+Builds synthetic models part by part, scores every step both ways (the
+full calculate_stability_score only up to --max-full parts, it makes the
+loop quadratic), checks they agree, then removes a share of the parts and
+checks again, and times evaluate() on candidate parts of the final model.
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from scripts.physics_validator import PhysicsValidator, StabilityState
+from scripts.benchmark_cantilevers import make_model
+
+
+def same_score(a, b) -> bool:
+    return (a['cantilevers'] == b['cantilevers'] and a['warnings'] == b['warnings'] and
+            a['is_stable'] == b['is_stable'] and abs(a['score'] - b['score']) < 1e-6 and
+            abs(a['support_ratio'] - b['support_ratio']) < 1e-6 and
+            max(abs(x - y) for x, y in zip(a['com'], b['com'])) < 1e-3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental stability benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000, 20000])
+    parser.add_argument("--max-full", type=int, default=2000, help="Largest model re-scored from scratch per step")
+    parser.add_argument("--candidates", type=int, default=1000, help="evaluate() calls on the final model")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("🚀 Incremental Stability Benchmark")
+    print("=" * 60)
+    print(f"   {'parts':>7} {'full ms/step':>13} {'add+score ms':>13} {'speedup':>8} "
+          f"{'evaluate ms':>12}  parity")
+
+    validator = PhysicsValidator()
+    all_match = True
+    for size in args.sizes:
+        parts = make_model(size, args.seed)
+        check = size <= args.max_full
+        state = StabilityState(validator)
+
+        mismatches = 0
+        incremental_s = full_s = 0.0
+        for i, part in enumerate(parts):
+            start = time.perf_counter()
+            state.add(part)
+            result = state.score()
+            incremental_s += time.perf_counter() - start
+
+            if check:
+                start = time.perf_counter()
+                expected = validator.calculate_stability_score(parts[:i + 1])
+                full_s += time.perf_counter() - start
+                mismatches += not same_score(expected, result)
+
+        # Take 20% back out (backtracking) and compare against the remaining parts
+        rng = np.random.default_rng(args.seed)
+        for slot in rng.choice(size, size=size // 5, replace=False):
+            state.remove(int(slot))
+        if check:
+            mismatches += not same_score(validator.calculate_stability_score(state.parts()), state.score())
+
+        candidates = make_model(args.candidates, args.seed + 1)
+        start = time.perf_counter()
+        for candidate in candidates:
+            state.evaluate(candidate)
+        evaluate_ms = (time.perf_counter() - start) * 1000.0 / len(candidates)
+
+        all_match &= mismatches == 0
+        incremental_ms = incremental_s * 1000.0 / size
+        if check:
+            full_ms = full_s * 1000.0 / size
+            print(f"   {size:>7} {full_ms:>13.3f} {incremental_ms:>13.3f} {full_ms / incremental_ms:>7.0f}x "
+                  f"{evaluate_ms:>12.3f}  {'✅' if mismatches == 0 else f'❌ {mismatches}'}")
+        else:
+            print(f"   {size:>7} {'-':>13} {incremental_ms:>13.3f} {'-':>8} {evaluate_ms:>12.3f}  -")
+
+    print(f"\n{'✅ Incremental scores match' if all_match else '❌ Incremental scores differ'} "
+          f"on every checked step")
+
+
+if __name__ == "__main__":
+    main()
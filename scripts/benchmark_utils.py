@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the serving benchmarks
+Fake model artifacts, a synthetic SQLite stand-in for the Supabase tables
+(no live database or trained model needed) and latency stats
+"""
+
+import os
+import json
+import time
+import sqlite3
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+import torch
+
+from scripts.gnn_model import LegoVGAE
+
+
+def write_fake_artifacts(
+    out_dir: str,
+    num_parts: int = 2000,
+    num_features: int = 81,
+    latent_dim: int = 16,
+    seed: int = 0
+) -> Dict[str, str]:
+    """
+    Write part_to_idx.json, node_features.pt and an untrained VGAE state dict
+    with the same layout as the real ai_data/ and ai_models/ files
+
+    Returns:
+        Dict of artifact paths (keys match ModelRegistry.paths)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    torch.manual_seed(seed)
+
+    part_to_idx = {str(3000 + i): i for i in range(num_parts)}
+    node_features = torch.randn(num_parts, num_features)
+    model = LegoVGAE(num_features=num_features, latent_dim=latent_dim)
+
+    paths = {
+        'part_to_idx': os.path.join(out_dir, "part_to_idx.json"),
+        'node_features': os.path.join(out_dir, "node_features.pt"),
+        'model': os.path.join(out_dir, "vgae_model.pth"),
+    }
+
+    with open(paths['part_to_idx'], "w") as f:
+        json.dump(part_to_idx, f)
+    torch.save(node_features, paths['node_features'])
+    torch.save(model.state_dict(), paths['model'])
+
+    return paths
+
+
+STANDIN_SCHEMA = """
+    CREATE TABLE sets (set_num TEXT PRIMARY KEY, name TEXT NOT NULL, year INTEGER NOT NULL,
+                       theme_id INTEGER, num_parts INTEGER NOT NULL);
+    CREATE TABLE inventories (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, set_num TEXT);
+    CREATE TABLE inventory_parts (inventory_id INTEGER, part_num TEXT, color_id INTEGER,
+                                  quantity INTEGER NOT NULL, is_spare BOOLEAN NOT NULL,
+                                  PRIMARY KEY (inventory_id, part_num, color_id, is_spare));
+    CREATE TABLE connectivity_rules (id INTEGER PRIMARY KEY, part_a TEXT NOT NULL, part_b TEXT NOT NULL,
+                                     connection_type TEXT NOT NULL, contact_points JSON,
+                                     frequency INTEGER DEFAULT 1, theme_id INTEGER,
+                                     UNIQUE (part_a, part_b, connection_type, theme_id));
+    CREATE INDEX idx_connectivity_theme ON connectivity_rules(theme_id);
+    CREATE TABLE theme_part_index (theme_id INTEGER NOT NULL, part_num TEXT NOT NULL,
+                                   usage_count INTEGER NOT NULL, total_quantity INTEGER NOT NULL,
+                                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                   PRIMARY KEY (theme_id, part_num));
+"""
+
+CONNECTION_TYPES = ('stud', 'stacked', 'adjacent', 'distant')
+
+
+def write_standin_database(
+    db_path: str,
+    part_nums: Sequence[str],
+    theme_ids: Sequence[int] = (158, 1, 18, 52, 494),
+    sets_per_theme: int = 20,
+    parts_per_set: int = 40,
+    rules_per_theme: int = 2000,
+    seed: int = 0
+) -> Dict:
+    """
+    SQLite file with synthetic sets / inventories / inventory_parts /
+    connectivity_rules (same columns as Supabase) and a built theme_part_index
+
+    Each theme draws from its own slice of the catalog so candidate lists
+    differ per theme. Rule contact points sit on the 20 LDU grid the
+    generators place parts on, so a realistic share of checks pass.
+
+    Returns:
+        {'url': SQLAlchemy URL, 'theme_ids': [...],
+         'inventories': [(theme_id, [(part_num, quantity), ...]), ...]}
+    """
+    from scripts.theme_candidate_index import _AGGREGATE_SQL
+
+    rng = np.random.default_rng(seed)
+    part_nums = list(part_nums)
+    slice_size = max(parts_per_set, len(part_nums) // 2)
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(STANDIN_SCHEMA)
+
+    sets, inventories, inventory_parts, rules = [], [], [], {}
+    set_inventories = []
+    inventory_id = 0
+    for t, theme_id in enumerate(theme_ids):
+        offset = (t * len(part_nums)) // max(1, len(theme_ids))
+        theme_parts = [part_nums[(offset + i) % len(part_nums)] for i in range(slice_size)]
+        # Zipf-ish popularity: a few parts show up in most sets
+        weights = 1.0 / np.arange(1, slice_size + 1)
+        weights /= weights.sum()
+
+        for s in range(sets_per_theme):
+            inventory_id += 1
+            set_num = f"{theme_id}{s:03d}-1"
+            chosen = rng.choice(slice_size, size=parts_per_set, replace=False, p=weights)
+            quantities = rng.integers(1, 9, size=parts_per_set)
+            sets.append((set_num, f"Synthetic {theme_id}/{s}", 2020, theme_id, int(quantities.sum())))
+            inventories.append((inventory_id, 1, set_num))
+            inventory = [(theme_parts[i], int(q)) for i, q in zip(chosen, quantities)]
+            inventory_parts.extend((inventory_id, p, 0, q, False) for p, q in inventory)
+            set_inventories.append((theme_id, inventory))
+
+        for _ in range(rules_per_theme):
+            a, b = rng.choice(slice_size, size=2, p=weights)
+            conn_type = CONNECTION_TYPES[int(rng.integers(len(CONNECTION_TYPES)))]
+            contact_points = [
+                {'rel_pos': [20.0 * int(rng.integers(1, 6)), 0.0, 0.0],
+                 'tolerance': float(rng.uniform(5, 15))}
+                for _ in range(int(rng.integers(1, 4)))
+            ]
+            key = (theme_parts[a], theme_parts[b], conn_type, theme_id)
+            rules[key] = (json.dumps(contact_points), int(rng.integers(1, 50)))
+
+    conn.executemany("INSERT INTO sets VALUES (?, ?, ?, ?, ?)", sets)
+    conn.executemany("INSERT INTO inventories VALUES (?, ?, ?)", inventories)
+    conn.executemany("INSERT INTO inventory_parts VALUES (?, ?, ?, ?, ?)", inventory_parts)
+    conn.executemany(
+        "INSERT INTO connectivity_rules (part_a, part_b, connection_type, theme_id, contact_points, frequency) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [key + value for key, value in rules.items()]
+    )
+    conn.execute(
+        "INSERT INTO theme_part_index (theme_id, part_num, usage_count, total_quantity) "
+        + _AGGREGATE_SQL.format(theme_filter="")
+    )
+    conn.commit()
+    conn.close()
+
+    return {
+        'url': f"sqlite:///{os.path.abspath(db_path)}",
+        'theme_ids': list(theme_ids),
+        'inventories': set_inventories,
+    }
+
+
+def latency_stats(samples_s: List[float]) -> Dict[str, float]:
+    """Summarize latencies (seconds in, milliseconds out)"""
+    ms = np.asarray(samples_s, dtype=np.float64) * 1000.0
+    return {
+        'n': int(ms.size),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+
+def time_calls(fn: Callable[[], object], n: int, warmup: int = 3) -> List[float]:
+    """Call fn n times (after warmup) and return per-call latencies in seconds"""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def print_stats(label: str, stats: Dict[str, float]):
+    print(f"   {label:<24} p50 {stats['p50_ms']:8.3f} ms   p99 {stats['p99_ms']:8.3f} ms   (n={stats['n']})")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-pair validate_connection vs validate_connections_batch
+Validates N proposed connections drawn from a synthetic rule set (mostly
+pairs that have a rule, placed on the 20 LDU grid) both ways and checks
+that the batch mask matches the per-pair verdicts exactly, then times
+top-k neighbor lookups through the adjacency index vs a full rule scan
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+import tempfile
+
+import numpy as np
+
+from scripts.benchmark_utils import write_standin_database, latency_stats, time_calls, print_stats
+from scripts.rule_store import RuleStore
+from scripts.validate_connection import ConnectionValidator
+
+
+def make_pairs(rows, num_pairs: int, seed: int):
+    """Part pairs (80% with a rule, either direction) and grid / off-grid positions"""
+    rng = np.random.default_rng(seed)
+    all_parts = sorted({r[0] for r in rows} | {r[1] for r in rows})
+    parts_a, parts_b = [], []
+    for _ in range(num_pairs):
+        if rng.random() < 0.8:
+            row = rows[int(rng.integers(len(rows)))]
+            a, b = (row[0], row[1]) if rng.random() < 0.5 else (row[1], row[0])
+        else:
+            a, b = rng.choice(all_parts, size=2)
+        parts_a.append(str(a))
+        parts_b.append(str(b))
+
+    pos_a = np.zeros((num_pairs, 3))
+    pos_b = np.zeros((num_pairs, 3))
+    pos_b[:, 0] = 20.0 * rng.integers(0, 6, size=num_pairs) + rng.normal(0, 4, size=num_pairs)
+    return parts_a, parts_b, pos_a, pos_b
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch connection validation benchmark")
+    parser.add_argument("--pairs", type=int, default=10000)
+    parser.add_argument("--rules", type=int, default=20000, help="Rules in the benchmark theme")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("🚀 Connection Validation Benchmark")
+    print("=" * 60)
+
+    theme_id = 158
+    with tempfile.TemporaryDirectory() as tmp:
+        part_nums = [f"p{i}" for i in range(4000)]
+        db_path = os.path.join(tmp, "rules.db")
+        write_standin_database(db_path, part_nums, theme_ids=(theme_id,), sets_per_theme=1,
+                               rules_per_theme=args.rules, seed=args.seed)
+        conn = sqlite3.connect(db_path)
+        rows = [(a, b, t, json.loads(cp), f) for a, b, t, cp, f in conn.execute(
+            "SELECT part_a, part_b, connection_type, contact_points, frequency "
+            "FROM connectivity_rules WHERE theme_id = ?", (theme_id,))]
+        conn.close()
+
+    store = RuleStore(version_path=os.devnull)
+    store.put(theme_id, rows)
+    validator = ConnectionValidator(theme_id, store=store)
+    parts_a, parts_b, pos_a, pos_b = make_pairs(rows, args.pairs, args.seed)
+    print(f"   {len(validator.rules)} rules, {args.pairs} pairs\n")
+
+    def looped():
+        return np.array([validator.validate_connection(a, b, pa, pb)[0]
+                         for a, b, pa, pb in zip(parts_a, parts_b, pos_a, pos_b)])
+
+    def batched():
+        return validator.validate_connections_batch(parts_a, parts_b, pos_a, pos_b)[0]
+
+    expected, got = looped(), batched()
+    mismatches = int((expected != got).sum())
+    print(f"{'✅' if mismatches == 0 else '❌'} Parity: {mismatches} mismatches "
+          f"({int(expected.sum())}/{args.pairs} valid)\n")
+
+    loop_stats = latency_stats(time_calls(looped, args.repeats, warmup=1))
+    batch_stats = latency_stats(time_calls(batched, args.repeats, warmup=1))
+    print_stats("per-pair loop", loop_stats)
+    print_stats("batch", batch_stats)
+    print(f"\n⚡ Speedup p50 {loop_stats['p50_ms'] / batch_stats['p50_ms']:.1f}x  "
+          f"({args.pairs / (batch_stats['p50_ms'] / 1000.0):,.0f} pairs/sec batched)")
+
+    # Neighbor lookups: full rule scan (previous get_valid_neighbors) vs adjacency index slice
+    def scan_neighbors(part_num, max_results=10):
+        found = []
+        for (part_a, part_b, conn_type), data in validator.rules_cache.items():
+            if part_a == part_num or part_b == part_num:
+                other = part_b if part_a == part_num else part_a
+                found.append({'part': other, 'type': conn_type, 'frequency': data['frequency']})
+        found.sort(key=lambda x: x['frequency'], reverse=True)
+        return found[:max_results]
+
+    query_parts = parts_a[:200]
+    scan_stats = latency_stats(time_calls(lambda: [scan_neighbors(p) for p in query_parts], args.repeats, warmup=1))
+    index_stats = latency_stats(time_calls(lambda: [validator.get_valid_neighbors(p) for p in query_parts],
+                                           args.repeats, warmup=1))
+    print(f"\n🔎 Top-10 neighbors for {len(query_parts)} parts:")
+    print_stats("rule scan", scan_stats)
+    print_stats("adjacency index", index_stats)
+    print(f"   Speedup p50 {scan_stats['p50_ms'] / index_stats['p50_ms']:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
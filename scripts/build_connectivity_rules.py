@@ -2,18 +2,43 @@
 """
 Build Connectivity Rules - Extract physical connection patterns from construction data
 Analyzes sequential steps to learn which parts connect and how
+Runs are incremental: only steps added or rewritten since the last run are
+read, and their statistics are merged into the stored rules
+(tables: scripts/create_connectivity_ledger.sql)
 """
 
 import numpy as np
 import json
-from collections import defaultdict
-from sqlalchemy import create_engine, text
-from dotenv import load_dotenv
+import hashlib
+import argparse
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+from sqlalchemy import text, bindparam, JSON
 import os
+import time
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+from scripts.db import get_engine
+from scripts.rule_store import bump_rules_version, get_rule_store, RuleKey
+from scripts.rules_snapshot import export_theme_snapshots
+from scripts.rule_upsert import upsert_rules
+from scripts.running_stats import Moments, merge_moments, remove_moments
+
+# Contact point clustering: at most this many points per rule; offsets closer
+# than CLUSTER_CELL_LDU (half a stud) are treated as the same placement
+MAX_CONTACT_POINTS = int(os.getenv("MAX_CONTACT_POINTS", "4"))
+CLUSTER_CELL_LDU = 10.0
+CLUSTER_ITERATIONS = 5
+TOLERANCE_SLACK_LDU = 10.0  # Allow some variation
+
+# Re-read steps this far behind the watermark (rows committed late by long
+# transactions); the ledger digest skips the ones already processed
+WATERMARK_LAG_SECONDS = float(os.getenv("WATERMARK_LAG_SECONDS", "300"))
+
+# Steps are streamed in chunks of whole sets and reduced by a process pool
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+EXTRACT_CHUNK_STEPS = int(os.getenv("EXTRACT_CHUNK_STEPS", "500"))
 
 def classify_connection_type(part_a: str, part_b: str, distance: float) -> str:
     """Classify connection type based on part types and distance"""
@@ -39,115 +64,523 @@ def classify_connection_type(part_a: str, part_b: str, distance: float) -> str:
         return 'distant'  # Structural support, not direct connection
 
 
-def extract_connectivity_rules(theme_id: int = 158):
-    """Extract connectivity rules from construction_steps data"""
+Clusters = Tuple[np.ndarray, np.ndarray, np.ndarray]  # (counts [K], means [K, 3], M2 [K])
+Cells = Dict[Tuple[int, int, int], Moments]  # grid cell -> (count, mean, M2) of the offsets binned there
+
+
+def cell_moments(positions, cell: float = CLUSTER_CELL_LDU) -> Cells:
+    """Bin observed relative positions on a cell-sized grid: (count, mean, M2) per occupied cell"""
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    keys, cell_of, counts = np.unique(np.floor(positions / cell).astype(np.int64), axis=0,
+                                      return_inverse=True, return_counts=True)
+    cell_of = cell_of.ravel()
+    means = np.stack([np.bincount(cell_of, weights=positions[:, d], minlength=len(keys)) for d in range(3)], axis=1)
+    means /= counts[:, None]
+    m2 = np.bincount(cell_of, weights=((positions - means[cell_of]) ** 2).sum(axis=1), minlength=len(keys))
+    return {tuple(int(v) for v in key): (float(n), mean, float(q)) for key, n, mean, q in zip(keys, counts, means, m2)}
+
+
+def _merge_into(target: Cells, partial: Cells) -> Cells:
+    for key, (n, mean, q) in partial.items():
+        target[key] = merge_moments(*target[key], n, mean, q) if key in target else (n, mean, q)
+    return target
+
+
+def merge_cells(base: Cells, partial: Cells) -> Cells:
+    """Cell-wise moment merge (the same cells whatever the merge order, up to float rounding)"""
+    return _merge_into(dict(base), partial)
+
+
+def retract_cells(base: Cells, partial: Cells) -> Cells:
+    """Take previously merged cells back out; emptied cells are dropped"""
+    remaining = dict(base)
+    for key, (n, mean, q) in partial.items():
+        if key not in remaining:
+            continue
+        left = remove_moments(*remaining[key], n, mean, q)
+        if left[0] < 0.5:
+            del remaining[key]
+        else:
+            remaining[key] = left
+    return remaining
+
+
+def cluster_cells(cells: Cells, max_clusters: int = MAX_CONTACT_POINTS,
+                  cell: float = CLUSTER_CELL_LDU) -> Clusters:
+    """
+    Cluster binned offsets into up to max_clusters groups
     
-    print(f"🔍 Extracting connectivity rules for theme {theme_id}...")
+    Only the cell moments are used, so a key's clusters depend on its
+    observations, not on how they were chunked or merged. The means of the
+    most populated cells seed the clusters (skipping cells within one cell
+    of a chosen seed, so one mode split across cell borders seeds once), a
+    few count-weighted k-means steps over the cell means refine them,
+    centers that converge onto the same mode are merged, and each cluster's
+    moments are the exact merge of its cells.
+    """
+    if not cells:
+        return np.zeros(0), np.zeros((0, 3)), np.zeros(0)
+    
+    keys = sorted(cells)
+    counts = np.array([cells[k][0] for k in keys], dtype=np.float64)
+    means = np.array([cells[k][1] for k in keys], dtype=np.float64).reshape(-1, 3)
+    
+    seeds = []
+    for c in np.argsort(-counts, kind='stable'):
+        if len(seeds) == max(1, max_clusters):
+            break
+        if all(np.linalg.norm(means[c] - means[s]) >= cell for s in seeds):
+            seeds.append(c)
+    centers = means[seeds]
+    
+    for _ in range(CLUSTER_ITERATIONS):
+        # [C, K] squared distances, nearest center per cell
+        labels = ((means[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        sizes = np.bincount(labels, weights=counts, minlength=len(centers))
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, means * counts[:, None])
+        keep = sizes > 0
+        centers = sums[keep] / sizes[keep, None]
+        
+        # Merge centers that ended up on the same mode
+        close = np.linalg.norm(centers[:, None, :] - centers[None, :, :], axis=2) < cell
+        first = close.argmax(axis=1)  # lowest index of each center's group
+        centers = centers[np.unique(first)]
+    
+    labels = ((means[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    clusters = []
+    for k in range(len(centers)):
+        members = [keys[c] for c in np.flatnonzero(labels == k)]
+        if not members:
+            continue
+        moments = cells[members[0]]
+        for key in members[1:]:
+            moments = merge_moments(*moments, *cells[key])
+        clusters.append(moments)
     
-    # Get all construction steps for Star Wars sets
-    sql = text("""
-        SELECT set_num, step_number, graph_snapshot, spatial_data
-        FROM construction_steps
-        WHERE set_num LIKE 'poc_%'
-        ORDER BY set_num, step_number
-    """)
+    return (np.array([c[0] for c in clusters], dtype=np.float64),
+            np.array([c[1] for c in clusters], dtype=np.float64).reshape(-1, 3),
+            np.array([c[2] for c in clusters], dtype=np.float64))
+
+
+def cluster_moments(positions, max_clusters: int = MAX_CONTACT_POINTS,
+                    cell: float = CLUSTER_CELL_LDU) -> Clusters:
+    """Cluster observed relative positions into up to max_clusters groups"""
+    return cluster_cells(cell_moments(positions, cell), max_clusters, cell)
+
+
+def contact_points_from_clusters(clusters: Clusters) -> list:
+    """
+    contact_points JSON: cluster mean as rel_pos, RMS spread plus slack as
+    tolerance, most observed first; count and m2 are kept so the clusters
+    can be recovered from the JSON alone
+    """
+    sizes, centers, m2 = clusters
+    contact_points = []
+    for k in np.argsort(-sizes, kind='stable'):
+        if sizes[k] <= 0:
+            continue
+        contact_points.append({
+            'rel_pos': centers[k].tolist(),
+            'tolerance': float(np.sqrt(m2[k] / sizes[k]) + TOLERANCE_SLACK_LDU),
+            'count': int(round(sizes[k])),
+            'm2': float(m2[k])
+        })
+    return contact_points
+
+
+def cluster_contact_points(positions, max_clusters: int = MAX_CONTACT_POINTS,
+                           cell: float = CLUSTER_CELL_LDU) -> list:
+    """Cluster observed relative positions into up to max_clusters contact points"""
+    return contact_points_from_clusters(cluster_moments(positions, max_clusters, cell))
+
+
+def clusters_from_contact_points(contact_points: list, frequency: int) -> Clusters:
+    """
+    Clusters back from stored contact points
     
-    connectivity_data = defaultdict(lambda: {
-        'count': 0,
-        'positions': [],
-        'distances': []
-    })
+    Rules written before the statistics were stored have no count / m2:
+    the frequency is split evenly and the spread is recovered from the
+    tolerance.
+    """
+    contact_points = contact_points or []
+    if not contact_points:
+        return np.zeros(0), np.zeros((0, 3)), np.zeros(0)
     
-    with engine.connect() as conn:
-        results = conn.execute(sql).fetchall()
+    default_count = max(1.0, (frequency or 0) / len(contact_points))
+    sizes = np.array([float(cp.get('count', default_count)) for cp in contact_points])
+    centers = np.array([cp['rel_pos'] for cp in contact_points], dtype=np.float64).reshape(-1, 3)
+    m2 = np.array([
+        float(cp['m2']) if 'm2' in cp else max(cp['tolerance'] - TOLERANCE_SLACK_LDU, 0.0) ** 2 * n
+        for cp, n in zip(contact_points, sizes)
+    ])
+    return sizes, centers, m2
+
+
+def cells_from_clusters(clusters: Clusters, cell: float = CLUSTER_CELL_LDU) -> Cells:
+    """Cells of data kept only as clusters (legacy rules / ledger entries): each binned by its mean"""
+    cells: Cells = {}
+    for n, mean, q in zip(*clusters):
+        if n <= 0:
+            continue
+        key = tuple(int(v) for v in np.floor(np.asarray(mean) / cell))
+        _merge_into(cells, {key: (float(n), np.asarray(mean, dtype=np.float64), float(q))})
+    return cells
+
+
+def step_digest(graph, spatial) -> str:
+    """Content hash of a construction step (detects in-place rewrites)"""
+    payload = json.dumps([graph, spatial], sort_keys=True, separators=(',', ':'))
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def step_observations(graph, spatial) -> Dict[RuleKey, list]:
+    """Relative positions per (part_a, part_b, type) observed in one step (both directions)"""
+    observations = defaultdict(list)
+    if not graph or not spatial:
+        return observations
     
-    print(f"   Found {len(results)} steps to analyze")
+    nodes = graph.get('nodes', [])
+    edges = graph.get('edges', [])
     
-    for row in results:
-        graph = row[2]  # Already a dict from PostgreSQL JSONB
-        spatial = row[3]
+    # Analyze each edge (connection)
+    for edge in edges:
+        i, j = edge
         
-        if not graph or not spatial:
+        if i >= len(nodes) or j >= len(nodes):
             continue
         
-        nodes = graph.get('nodes', [])
-        edges = graph.get('edges', [])
+        part_a = nodes[i]['part_num']
+        part_b = nodes[j]['part_num']
         
-        # Analyze each edge (connection)
-        for edge in edges:
-            i, j = edge
-            
-            if i >= len(nodes) or j >= len(nodes):
+        # Get positions
+        pos_a = np.array(spatial.get(str(i), {}).get('pos', [0, 0, 0]), dtype=np.float64)
+        pos_b = np.array(spatial.get(str(j), {}).get('pos', [0, 0, 0]), dtype=np.float64)
+        
+        # Relative position of the second part as seen from the first
+        rel_pos = pos_b - pos_a
+        distance = np.linalg.norm(rel_pos)
+        
+        # Classify connection type
+        conn_type = classify_connection_type(part_a, part_b, distance)
+        
+        # Store connection data (bidirectional, offset flipped for the reverse key)
+        observations[(part_a, part_b, conn_type)].append(rel_pos.tolist())
+        observations[(part_b, part_a, conn_type)].append((-rel_pos).tolist())
+    
+    return observations
+
+
+def _cells_json(cells: Cells) -> list:
+    """[[[cx, cy, cz], count, mean, m2], ...] in cell order"""
+    return [[list(key), float(n), np.asarray(mean).tolist(), float(q)] for key, (n, mean, q) in sorted(cells.items())]
+
+
+def _cells_from_json(entries) -> Cells:
+    if isinstance(entries, str):
+        entries = json.loads(entries)
+    cells = {}
+    for entry in entries or []:
+        if len(entry) == 3:
+            # Ledger entries written before cell moments: [count, mean, m2] per cluster
+            _merge_into(cells, cells_from_clusters(([entry[0]], [entry[1]], [entry[2]])))
+            continue
+        key, n, mean, q = entry
+        cells[tuple(key)] = (float(n), np.array(mean, dtype=np.float64), float(q))
+    return cells
+
+
+def _encode_partials(partials: Dict[RuleKey, Cells]) -> str:
+    """Ledger JSON: [[part_a, part_b, type, [[[cx, cy, cz], count, mean, m2], ...]], ...]"""
+    return json.dumps([
+        [part_a, part_b, conn_type, _cells_json(cells)]
+        for (part_a, part_b, conn_type), cells in partials.items()
+    ])
+
+
+def _decode_partials(entries) -> Dict[RuleKey, Cells]:
+    if isinstance(entries, str):
+        entries = json.loads(entries)
+    return {(part_a, part_b, conn_type): _cells_from_json(cells)
+            for part_a, part_b, conn_type, cells in entries or []}
+
+
+STEPS_SQL = """
+    SELECT id, set_num, graph_snapshot, spatial_data, updated_at
+    FROM construction_steps
+    WHERE set_num LIKE 'poc_%' {since}
+    ORDER BY set_num, step_number
+"""
+
+LEDGER_SQL = text("""
+    SELECT step_id, digest, partials
+    FROM connectivity_step_ledger
+    WHERE theme_id = :theme_id AND step_id IN :step_ids
+""").bindparams(bindparam('step_ids', expanding=True)).columns(partials=JSON)
+
+RULES_SQL = text("""
+    SELECT part_a, part_b, connection_type, contact_points, frequency
+    FROM connectivity_rules
+    WHERE theme_id = :theme_id
+""").columns(contact_points=JSON)
+
+RULE_CELLS_SQL = text("""
+    SELECT part_a, part_b, connection_type, cells
+    FROM connectivity_rule_cells
+    WHERE theme_id = :theme_id
+""").columns(cells=JSON)
+
+LEDGER_UPSERT_SQL = text("""
+    INSERT INTO connectivity_step_ledger (step_id, theme_id, digest, partials)
+    VALUES (:step_id, :theme_id, :digest, :partials)
+    ON CONFLICT (step_id, theme_id)
+    DO UPDATE SET digest = EXCLUDED.digest, partials = EXCLUDED.partials,
+                  processed_at = CURRENT_TIMESTAMP
+""")
+
+RULE_CELLS_UPSERT_SQL = text("""
+    INSERT INTO connectivity_rule_cells (part_a, part_b, connection_type, theme_id, cells)
+    VALUES (:part_a, :part_b, :conn_type, :theme_id, :cells)
+    ON CONFLICT (part_a, part_b, connection_type, theme_id)
+    DO UPDATE SET cells = EXCLUDED.cells
+""")
+
+RULE_CELLS_DELETE_SQL = text("""
+    DELETE FROM connectivity_rule_cells
+    WHERE part_a = :part_a AND part_b = :part_b
+      AND connection_type = :conn_type AND theme_id = :theme_id
+""")
+
+
+def _fold(aggregates: Dict[RuleKey, Cells], key: RuleKey, cells: Cells):
+    """Merge cells into the running aggregate of a key (bounded: one entry per occupied cell)"""
+    _merge_into(aggregates.setdefault(key, {}), cells)
+
+
+def process_step_chunk(steps: list, ledger: Dict[int, tuple]) -> Tuple[list, Dict, Dict]:
+    """
+    Worker body: partial moments of one chunk of whole sets
+    
+    Args:
+        steps: [(step_id, graph_snapshot, spatial_data), ...]
+        ledger: step_id -> (digest, partials) already recorded for these steps
+    
+    Returns:
+        (ledger rows of the new / changed steps,
+         merged new cells per key, merged cells to retract per key)
+    """
+    ledger_rows, aggregates, retractions = [], {}, {}
+    for step_id, graph, spatial in steps:
+        digest = step_digest(graph, spatial)
+        previous = ledger.get(step_id)
+        if previous is not None:
+            if previous[0] == digest:
                 continue
+            for key, cells in _decode_partials(previous[1]).items():
+                _fold(retractions, key, cells)
+        
+        partials = {key: cell_moments(positions)
+                    for key, positions in step_observations(graph, spatial).items()}
+        for key, cells in partials.items():
+            _fold(aggregates, key, cells)
+        ledger_rows.append({'step_id': step_id, 'digest': digest, 'partials': _encode_partials(partials),
+                            'changed': previous is not None})
+    return ledger_rows, aggregates, retractions
+
+
+def _set_chunks(rows, chunk_size: int):
+    """Group streamed steps (ordered by set) into chunks that never split a set"""
+    chunk, current_set = [], None
+    for row in rows:
+        if len(chunk) >= chunk_size and row[1] != current_set:
+            yield chunk
+            chunk = []
+        current_set = row[1]
+        chunk.append(row)
+    if chunk:
+        yield chunk
+
+
+def extract_connectivity_rules(theme_id: int = 158, full: bool = False,
+                               workers: int = EXTRACT_WORKERS, chunk_size: int = EXTRACT_CHUNK_STEPS):
+    """
+    Fold new or changed construction steps into the theme's connectivity rules
+    
+    Steps are read from the theme's watermark (latest updated_at already
+    processed, minus WATERMARK_LAG_SECONDS for late commits) on, streamed
+    through a server-side cursor in chunks of whole sets, and reduced by a
+    process pool to per-key cell moments (count, mean, M2 per occupied grid
+    cell), merged in chunk order. A per-step ledger keeps each
+    processed step's digest and cell moments: unchanged steps are skipped,
+    rewritten steps have their old cells retracted before the new ones are
+    merged. Each touched key's cells (connectivity_rule_cells) are then
+    re-clustered into contact points, so the rules do not depend on
+    chunking or run history, and written with absolute frequencies, so
+    reruns never double-count.
+    
+    Args:
+        theme_id: Theme the poc_% steps are extracted for
+        full: Drop the ledger and rules of the theme and rebuild from every step
+        workers: Extraction processes (0 = in this process)
+        chunk_size: Steps per work unit (rounded up to whole sets)
+    """
+    
+    print(f"🔍 Extracting connectivity rules for theme {theme_id}...")
+    
+    with get_engine().begin() as conn:
+        watermark = conn.execute(
+            text("SELECT watermark FROM connectivity_extraction_state WHERE theme_id = :theme_id"),
+            {'theme_id': theme_id}
+        ).scalar()
+        
+        # Without a watermark the stored rules (if any) came from full re-extractions
+        # of the same steps, so they are rebuilt rather than merged into
+        if full or watermark is None:
+            for table in ('connectivity_step_ledger', 'connectivity_rule_cells', 'connectivity_rules',
+                          'connectivity_extraction_state'):
+                conn.execute(text(f"DELETE FROM {table} WHERE theme_id = :theme_id"), {'theme_id': theme_id})
+            watermark = None
+        
+        if watermark is None:
+            steps_sql, params = STEPS_SQL.format(since=""), {}
+        else:
+            if isinstance(watermark, str):
+                watermark = datetime.fromisoformat(watermark)
+            steps_sql = STEPS_SQL.format(since="AND updated_at > :since")
+            params = {'since': watermark - timedelta(seconds=WATERMARK_LAG_SECONDS)}
+        
+        new_partials: Dict[RuleKey, Cells] = {}  # merged worker aggregates
+        old_partials: Dict[RuleKey, Cells] = {}  # ledger partials of rewritten steps
+        stats = {'steps': 0, 'folded': 0, 'changed': 0}
+        new_watermark = watermark
+        
+        def collect(result):
+            ledger_rows, aggregates, retractions = result
+            for key, cells in aggregates.items():
+                _fold(new_partials, key, cells)
+            for key, cells in retractions.items():
+                _fold(old_partials, key, cells)
+            if ledger_rows:
+                conn.execute(LEDGER_UPSERT_SQL, [
+                    {'step_id': row['step_id'], 'theme_id': theme_id, 'digest': row['digest'],
+                     'partials': row['partials']}
+                    for row in ledger_rows
+                ])
+            stats['folded'] += len(ledger_rows)
+            stats['changed'] += sum(row['changed'] for row in ledger_rows)
+        
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        in_flight = deque()
+        try:
+            stream = conn.execute(
+                text(steps_sql).columns(graph_snapshot=JSON, spatial_data=JSON), params,
+                execution_options={'stream_results': True, 'yield_per': chunk_size}
+            )
+            for chunk in _set_chunks(stream, chunk_size):
+                stats['steps'] += len(chunk)
+                for row in chunk:
+                    updated_at = datetime.fromisoformat(row[4]) if isinstance(row[4], str) else row[4]
+                    new_watermark = updated_at if new_watermark is None else max(new_watermark, updated_at)
+                
+                # Ledger entries of this chunk: digests to skip, partials to retract if rewritten
+                ledger = {
+                    step_id: (digest, partials)
+                    for step_id, digest, partials in conn.execute(
+                        LEDGER_SQL, {'theme_id': theme_id, 'step_ids': [row[0] for row in chunk]})
+                }
+                
+                steps = [(row[0], row[2], row[3]) for row in chunk]
+                if pool is None:
+                    collect(process_step_chunk(steps, ledger))
+                    continue
+                
+                # Bounded (at most 2 chunks per worker queued) and folded in submission
+                # order, so pool and in-process runs merge identically
+                in_flight.append(pool.submit(process_step_chunk, steps, ledger))
+                while len(in_flight) >= 2 * workers:
+                    collect(in_flight.popleft().result())
             
-            part_a = nodes[i]['part_num']
-            part_b = nodes[j]['part_num']
-            
-            # Get positions
-            pos_a = spatial.get(str(i), {}).get('pos', [0, 0, 0])
-            pos_b = spatial.get(str(j), {}).get('pos', [0, 0, 0])
-            
-            # Calculate distance
-            distance = np.linalg.norm(np.array(pos_a) - np.array(pos_b))
-            
-            # Calculate relative position vector
-            rel_pos = (np.array(pos_b) - np.array(pos_a)).tolist()
-            
-            # Classify connection type
-            conn_type = classify_connection_type(part_a, part_b, distance)
-            
-            # Store connection data (bidirectional)
-            for (p1, p2) in [(part_a, part_b), (part_b, part_a)]:
-                key = (p1, p2, conn_type)
-                connectivity_data[key]['count'] += 1
-                connectivity_data[key]['positions'].append(rel_pos)
-                connectivity_data[key]['distances'].append(distance)
-    
-    print(f"   Extracted {len(connectivity_data)} unique connection patterns")
-    
-    # Save to database
-    print("   Saving to connectivity_rules table...")
-    
-    with engine.connect() as conn:
-        for (part_a, part_b, conn_type), data in connectivity_data.items():
-            # Calculate statistics
-            avg_dist = np.mean(data['distances'])
-            std_dist = np.std(data['distances'])
-            
-            # Representative contact point (average relative position)
-            avg_pos = np.mean(data['positions'], axis=0).tolist()
-            
-            contact_points = [{
-                'rel_pos': avg_pos,
-                'tolerance': float(std_dist + 10)  # Allow some variation
-            }]
-            
-            sql_insert = text("""
-                INSERT INTO connectivity_rules 
-                (part_a, part_b, connection_type, contact_points, frequency, theme_id)
-                VALUES (:part_a, :part_b, :conn_type, :contact_points, :frequency, :theme_id)
-                ON CONFLICT (part_a, part_b, connection_type, theme_id) 
-                DO UPDATE SET
-                    frequency = connectivity_rules.frequency + EXCLUDED.frequency,
-                    contact_points = EXCLUDED.contact_points
-            """)
+            while in_flight:
+                collect(in_flight.popleft().result())
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        
+        print(f"   {stats['steps']} steps since watermark {watermark}: {stats['folded']} folded in "
+              f"({stats['changed']} changed), {stats['steps'] - stats['folded']} unchanged")
+        
+        touched = set(new_partials) | set(old_partials)
+        existing = {
+            (row[0], row[1], row[2]): _cells_from_json(row[3])
+            for row in conn.execute(RULE_CELLS_SQL, {'theme_id': theme_id})
+            if (row[0], row[1], row[2]) in touched
+        }
+        # Rules written before cell moments were kept: recover cells from their contact points
+        existing.update({
+            (row[0], row[1], row[2]): cells_from_clusters(clusters_from_contact_points(row[3], row[4]))
+            for row in conn.execute(RULES_SQL, {'theme_id': theme_id})
+            if (row[0], row[1], row[2]) in touched and (row[0], row[1], row[2]) not in existing
+        })
+        
+        rules, cell_rows = [], []
+        for key in sorted(touched):
+            cells = existing.get(key, {})
+            if key in old_partials:
+                cells = retract_cells(cells, old_partials[key])
+            if key in new_partials:
+                cells = merge_cells(cells, new_partials[key])
             
-            conn.execute(sql_insert, {
-                'part_a': part_a,
-                'part_b': part_b,
-                'conn_type': conn_type,
-                'contact_points': json.dumps(contact_points),  # Serialize to JSON
-                'frequency': data['count'],
+            frequency = int(round(sum(n for n, _, _ in cells.values())))
+            rules.append({
+                'part_a': key[0],
+                'part_b': key[1],
+                'conn_type': key[2],
+                'contact_points': json.dumps(contact_points_from_clusters(cluster_cells(cells))
+                                             if frequency > 0 else []),
+                'frequency': max(frequency, 0),  # 0 = every observation retracted, delete the rule
                 'theme_id': theme_id
             })
+            cell_rows.append({'part_a': key[0], 'part_b': key[1], 'conn_type': key[2], 'theme_id': theme_id,
+                              'cells': json.dumps(_cells_json(cells)), 'frequency': frequency})
         
-        conn.commit()
+        # Save to database (absolute values: the merge above already includes the old rows)
+        print("   Saving to connectivity_rules table...")
+        start = time.perf_counter()
+        upserted, deleted = upsert_rules(conn, rules)
+        elapsed = time.perf_counter() - start
+        if rules:
+            print(f"   Wrote {len(rules)} rules in {elapsed:.2f}s ({len(rules) / max(elapsed, 1e-9):,.0f} rules/s)")
+        
+        kept = [row for row in cell_rows if row['frequency'] > 0]
+        if kept:
+            conn.execute(RULE_CELLS_UPSERT_SQL, kept)
+        if len(kept) < len(cell_rows):
+            conn.execute(RULE_CELLS_DELETE_SQL, [row for row in cell_rows if row['frequency'] <= 0])
+        if new_watermark is not None:
+            conn.execute(text("""
+                INSERT INTO connectivity_extraction_state (theme_id, watermark, steps_processed)
+                VALUES (:theme_id, :watermark, :steps)
+                ON CONFLICT (theme_id)
+                DO UPDATE SET watermark = EXCLUDED.watermark,
+                              steps_processed = connectivity_extraction_state.steps_processed + EXCLUDED.steps_processed,
+                              updated_at = CURRENT_TIMESTAMP
+            """), {'theme_id': theme_id, 'watermark': new_watermark, 'steps': stats['folded']})
+    
+    print(f"✅ Saved {upserted} connectivity rules ({deleted} removed)")
+    if not rules:
+        return
+    
+    # Snapshot first, then bump: services that see the new version find a matching snapshot
+    version = f"{time.time():.6f}"
+    export_theme_snapshots([theme_id], version)
     
-    print(f"✅ Saved {len(connectivity_data)} connectivity rules")
+    # Running services drop their cached copy of this theme on the next check
+    bump_rules_version([theme_id], version=version)
+    get_rule_store().invalidate([theme_id])
     
     # Show sample rules
     print("\n📊 Sample connectivity rules:")
-    with engine.connect() as conn:
+    with get_engine().connect() as conn:
         sample_sql = text("""
             SELECT part_a, part_b, connection_type, frequency
             FROM connectivity_rules
@@ -162,5 +595,17 @@ def extract_connectivity_rules(theme_id: int = 158):
             print(f"   {s[0]} ↔ {s[1]} ({s[2]}): {s[3]}x")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Extract connectivity rules from construction steps")
+    parser.add_argument("--theme", type=int, default=158)
+    parser.add_argument("--full", action="store_true", help="Rebuild the theme from every step")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS, help="Extraction processes (0 = inline)")
+    parser.add_argument("--chunk-size", type=int, default=EXTRACT_CHUNK_STEPS, help="Steps per work unit")
+    args = parser.parse_args()
+    
+    extract_connectivity_rules(theme_id=args.theme, full=args.full,
+                               workers=args.workers, chunk_size=args.chunk_size)
+
+
 if __name__ == "__main__":
-    extract_connectivity_rules(theme_id=158)
+    main()
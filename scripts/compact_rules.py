@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Compact Rules - Array-backed connectivity rules
+Part numbers are interned to int32 IDs (the position in a sorted,
+fixed-width bytes vocabulary, so IDs are found by binary search and the
+vocabulary can be memory-mapped like the rest), connection types are a small enum and every rule's contact points
+live in one float32 array addressed through CSR offsets. A rule is found
+by binary search over packed (part_a, part_b, type) keys. The per-part
+adjacency index (both rule directions, most frequent first) uses the same
+CSR layout, so top-k neighbor queries are slices.
+"""
+
+import sys
+import time
+import argparse
+from enum import IntEnum
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class ConnectionType(IntEnum):
+    STUD = 0
+    STACKED = 1
+    ADJACENT = 2
+    DISTANT = 3
+    TECHNIC_PIN = 4
+    TECHNIC_BEAM = 5
+
+
+CONNECTION_TYPE_NAMES = tuple(t.name.lower() for t in ConnectionType)
+CONNECTION_TYPE_IDS = {name: i for i, name in enumerate(CONNECTION_TYPE_NAMES)}
+NUM_CONNECTION_TYPES = len(CONNECTION_TYPE_NAMES)
+
+
+def _pack(part_a: np.ndarray, part_b: np.ndarray, conn_type: np.ndarray, num_parts: int) -> np.ndarray:
+    return (part_a.astype(np.int64) * num_parts + part_b) * NUM_CONNECTION_TYPES + conn_type
+
+
+def _csr_offsets(group: np.ndarray, num_groups: int) -> np.ndarray:
+    """Offsets of each group in an array sorted by group id"""
+    return np.searchsorted(group, np.arange(num_groups + 1)).astype(np.int64)
+
+
+@dataclass
+class CompactRules:
+    """Rules of one theme in flat arrays (read-only once built)"""
+    part_nums: np.ndarray         # bytes [num_parts] part id -> part number (sorted, utf-8)
+    keys: np.ndarray              # int64 [R] packed (part_a, part_b, type), ascending
+    part_a: np.ndarray            # int32 [R]
+    part_b: np.ndarray            # int32 [R]
+    conn_type: np.ndarray         # uint8 [R] ConnectionType
+    frequency: np.ndarray         # int32 [R]
+    offsets: np.ndarray           # int64 [R + 1] rule -> contact point range
+    contact_pos: np.ndarray       # float32 [P, 3]
+    contact_tol: np.ndarray       # float32 [P]
+    # Adjacency CSR, per part: (neighbor, type) entries and distinct neighbors
+    nbr_offsets: np.ndarray       # int64 [num_parts + 1]
+    nbr_part: np.ndarray          # int32
+    nbr_type: np.ndarray          # uint8
+    nbr_frequency: np.ndarray     # int32
+    distinct_offsets: np.ndarray  # int64 [num_parts + 1]
+    distinct_part: np.ndarray     # int32
+
+    @classmethod
+    def from_rows(cls, rows) -> 'CompactRules':
+        """
+        Build from connectivity_rules rows (part_a, part_b, type, contact_points, frequency)
+
+        Rows with a connection type outside ConnectionType are skipped (the
+        validator can never classify a connection as one); for duplicate keys
+        the last row wins, as with the dict.
+        """
+        rows = [row for row in rows if row[2] in CONNECTION_TYPE_IDS]
+        vocabulary = sorted({row[0] for row in rows} | {row[1] for row in rows})
+        part_ids = {part: i for i, part in enumerate(vocabulary)}
+        num_parts = len(vocabulary)
+
+        part_a = np.fromiter((part_ids[row[0]] for row in rows), dtype=np.int32, count=len(rows))
+        part_b = np.fromiter((part_ids[row[1]] for row in rows), dtype=np.int32, count=len(rows))
+        conn_type = np.fromiter((CONNECTION_TYPE_IDS[row[2]] for row in rows), dtype=np.uint8, count=len(rows))
+        frequency = np.fromiter((row[4] or 0 for row in rows), dtype=np.int32, count=len(rows))
+        keys = _pack(part_a, part_b, conn_type, num_parts)
+
+        # Sort by key; of equal keys keep the last row
+        order = np.argsort(keys, kind='stable')
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = keys[order][1:] != keys[order][:-1]
+        order = order[last]
+
+        counts = np.zeros(len(order) + 1, dtype=np.int64)
+        positions, tolerances = [], []
+        for i, r in enumerate(order):
+            points = rows[r][3] or []
+            counts[i + 1] = len(points)
+            for cp in points:
+                positions.append(cp['rel_pos'])
+                tolerances.append(cp['tolerance'])
+
+        compact = cls(
+            part_nums=np.array([p.encode() for p in vocabulary], dtype=bytes),
+            keys=keys[order],
+            part_a=part_a[order],
+            part_b=part_b[order],
+            conn_type=conn_type[order],
+            frequency=frequency[order],
+            offsets=np.cumsum(counts),
+            contact_pos=np.asarray(positions, dtype=np.float32).reshape(-1, 3),
+            contact_tol=np.asarray(tolerances, dtype=np.float32),
+            nbr_offsets=np.zeros(num_parts + 1, dtype=np.int64),
+            nbr_part=np.zeros(0, dtype=np.int32),
+            nbr_type=np.zeros(0, dtype=np.uint8),
+            nbr_frequency=np.zeros(0, dtype=np.int32),
+            distinct_offsets=np.zeros(num_parts + 1, dtype=np.int64),
+            distinct_part=np.zeros(0, dtype=np.int32),
+        )
+        compact._build_adjacency()
+        return compact
+
+    def _build_adjacency(self):
+        """
+        Neighbor entries of every part, most frequent first
+
+        A rule (a, b, type) makes b a neighbor of a and a a neighbor of b;
+        when both directions were recorded their frequencies are summed.
+        Ties are broken by neighbor part number, then type.
+        """
+        num_parts = len(self.part_nums)
+        loop = self.part_a == self.part_b
+        src = np.concatenate([self.part_a, self.part_b[~loop]])
+        dst = np.concatenate([self.part_b, self.part_a[~loop]])
+        types = np.concatenate([self.conn_type, self.conn_type[~loop]])
+        freqs = np.concatenate([self.frequency, self.frequency[~loop]]).astype(np.int64)
+
+        merged, inverse = np.unique(_pack(src, dst, types, num_parts), return_inverse=True)
+        freqs = np.bincount(inverse.ravel(), weights=freqs, minlength=len(merged)).astype(np.int64)
+        types = (merged % NUM_CONNECTION_TYPES).astype(np.uint8)
+        dst = (merged // NUM_CONNECTION_TYPES % max(1, num_parts)).astype(np.int32)
+        src = (merged // NUM_CONNECTION_TYPES // max(1, num_parts)).astype(np.int32)
+
+        order = np.lexsort((types, dst, -freqs, src))
+        src, dst, types, freqs = src[order], dst[order], types[order], freqs[order]
+        self.nbr_offsets = _csr_offsets(src, num_parts)
+        self.nbr_part = dst
+        self.nbr_type = types
+        self.nbr_frequency = freqs.astype(np.int32)
+
+        # First (= most frequent) entry of each (part, neighbor) pair, in ranked order
+        _, first = np.unique(src.astype(np.int64) * max(1, num_parts) + dst, return_index=True)
+        first.sort()
+        self.distinct_offsets = _csr_offsets(src[first], num_parts)
+        self.distinct_part = dst[first]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _ids(self, parts: Sequence[str]) -> np.ndarray:
+        """Part IDs by binary search over the vocabulary, -1 for unknown parts"""
+        if not len(parts) or not len(self.part_nums):
+            return np.full(len(parts), -1, dtype=np.int64)
+        encoded = np.char.encode(np.asarray(parts, dtype=str))
+        pos = np.minimum(np.searchsorted(self.part_nums, encoded), len(self.part_nums) - 1)
+        return np.where(self.part_nums[pos] == encoded, pos, -1).astype(np.int64)
+
+    def part_id(self, part_num: str) -> int:
+        """ID of one part, -1 if it has no rules"""
+        encoded = part_num.encode()
+        pos = int(self.part_nums.searchsorted(encoded))
+        return pos if pos < len(self.part_nums) and self.part_nums[pos] == encoded else -1
+
+    def part_num(self, part_id: int) -> str:
+        return self.part_nums[part_id].decode()
+
+    def lookup(self, parts_a: Sequence[str], parts_b: Sequence[str], conn_types: np.ndarray) -> np.ndarray:
+        """Rule row of each (part_a, part_b, type), trying the reverse direction too; -1 if none"""
+        ids_a, ids_b = self._ids(parts_a), self._ids(parts_b)
+        conn_types = np.asarray(conn_types, dtype=np.int64)
+        known = (ids_a >= 0) & (ids_b >= 0)
+        rows = np.full(len(ids_a), -1, dtype=np.int64)
+        for first, second in ((ids_a, ids_b), (ids_b, ids_a)):
+            todo = known & (rows < 0)
+            if not todo.any() or not len(self.keys):
+                break
+            wanted = _pack(first[todo], second[todo], conn_types[todo], len(self.part_nums))
+            pos = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+            rows[todo] = np.where(self.keys[pos] == wanted, pos, -1)
+        return rows
+
+    def find(self, part_a: str, part_b: str, conn_type: int) -> int:
+        """Single-pair lookup (see lookup)"""
+        id_a, id_b = self.part_id(part_a), self.part_id(part_b)
+        if id_a < 0 or id_b < 0 or not len(self.keys):
+            return -1
+        num_parts = len(self.part_nums)
+        for first, second in ((id_a, id_b), (id_b, id_a)):
+            wanted = (first * num_parts + second) * NUM_CONNECTION_TYPES + int(conn_type)
+            pos = int(self.keys.searchsorted(wanted))
+            if pos < len(self.keys) and self.keys[pos] == wanted:
+                return pos
+        return -1
+
+    def points(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(rel_pos [K, 3], tolerance [K]) of one rule"""
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.contact_pos[start:end], self.contact_tol[start:end]
+
+    def neighbors(self, part_num: str, max_results: int = 10) -> List[Dict]:
+        """Top (neighbor, type) entries of a part as {'part', 'type', 'frequency'}"""
+        part_id = self.part_id(part_num)
+        if part_id < 0:
+            return []
+        start = self.nbr_offsets[part_id]
+        end = min(self.nbr_offsets[part_id + 1], start + max_results)
+        return [
+            {'part': self.part_num(p), 'type': CONNECTION_TYPE_NAMES[t], 'frequency': int(f)}
+            for p, t, f in zip(self.nbr_part[start:end], self.nbr_type[start:end],
+                               self.nbr_frequency[start:end])
+        ]
+
+    def neighbor_parts(self, part_num: str, max_results: int = 10) -> List[str]:
+        """Top distinct neighbor part numbers of a part"""
+        part_id = self.part_id(part_num)
+        if part_id < 0:
+            return []
+        start = self.distinct_offsets[part_id]
+        end = min(self.distinct_offsets[part_id + 1], start + max_results)
+        return [self.part_num(p) for p in self.distinct_part[start:end]]
+
+    def to_dict(self) -> Dict[Tuple[str, str, str], Dict]:
+        """Classic {(part_a, part_b, type): {'contact_points', 'frequency'}} view"""
+        rules = {}
+        for row in range(len(self.keys)):
+            positions, tolerances = self.points(row)
+            rules[(self.part_num(self.part_a[row]), self.part_num(self.part_b[row]),
+                   CONNECTION_TYPE_NAMES[self.conn_type[row]])] = {
+                'contact_points': [{'rel_pos': p.tolist(), 'tolerance': float(t)}
+                                   for p, t in zip(positions, tolerances)],
+                'frequency': int(self.frequency[row])
+            }
+        return rules
+
+    def nbytes(self) -> int:
+        """Footprint of all arrays (vocabulary included)"""
+        return sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray))
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """sys.getsizeof over nested dicts / lists / tuples, counting shared objects once"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def rules_dict(rows) -> Dict[Tuple[str, str, str], Dict]:
+    """The dict representation the validator used to keep (for comparison)"""
+    return {(row[0], row[1], row[2]): {'contact_points': row[3] or [], 'frequency': row[4]} for row in rows}
+
+
+def synthetic_rows(num_rules: int, num_parts: int, seed: int = 0) -> List[Tuple]:
+    """Rows shaped like connectivity_rules (1-3 grid contact points each, Zipf-ish parts)"""
+    rng = np.random.default_rng(seed)
+    part_nums = [str(3000 + i) for i in range(num_parts)]
+    weights = 1.0 / np.arange(1, num_parts + 1)
+    weights /= weights.sum()
+    pairs = rng.choice(num_parts, size=(num_rules, 2), p=weights)
+    types = rng.integers(0, 4, size=num_rules)
+
+    rows = {}
+    for (a, b), t in zip(pairs, types):
+        contact_points = [
+            {'rel_pos': [20.0 * int(rng.integers(1, 6)), 0.0, 0.0], 'tolerance': float(rng.uniform(5, 15))}
+            for _ in range(int(rng.integers(1, 4)))
+        ]
+        rows[(part_nums[a], part_nums[b], CONNECTION_TYPE_NAMES[t])] = (contact_points, int(rng.integers(1, 50)))
+    return [key + value for key, value in rows.items()]
+
+
+def _timed(build):
+    start = time.perf_counter()
+    result = build()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory report: dict vs compact connectivity rules")
+    parser.add_argument("--rules", type=int, nargs="+", default=[20000, 100000, 500000])
+    parser.add_argument("--parts", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("🚀 Connectivity Rules Memory Report")
+    print("=" * 60)
+    print(f"   {'rules':>8} {'dict MB':>10} {'compact MB':>11} {'ratio':>7} {'dict build':>11} {'compact build':>14}")
+
+    for num_rules in args.rules:
+        rows = synthetic_rows(num_rules, args.parts, args.seed)
+        as_dict, dict_s = _timed(lambda: rules_dict(rows))
+        compact, compact_s = _timed(lambda: CompactRules.from_rows(rows))
+        dict_bytes, compact_bytes = deep_sizeof(as_dict), compact.nbytes()
+
+        print(f"   {len(compact):>8} {dict_bytes / 1e6:>10.1f} {compact_bytes / 1e6:>11.1f} "
+              f"{dict_bytes / compact_bytes:>6.1f}x {dict_s:>10.2f}s {compact_s:>13.2f}s")
+
+    print("\n   dict = deep sys.getsizeof of the {(a, b, type): {...}} cache incl. contact point dicts")
+    print("   compact = numpy arrays incl. part vocabulary and adjacency index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+-- Incremental connectivity rule extraction (scripts/build_connectivity_rules.py)
+
+-- 1. Change tracking on construction_steps (watermark column)
+ALTER TABLE construction_steps ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS idx_construction_steps_updated ON construction_steps(updated_at, id);
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS construction_steps_touch ON construction_steps;
+CREATE TRIGGER construction_steps_touch
+    BEFORE UPDATE ON construction_steps
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- 2. Per-theme watermark (latest construction_steps.updated_at folded in)
+CREATE TABLE IF NOT EXISTS connectivity_extraction_state (
+    theme_id INT PRIMARY KEY,
+    watermark TIMESTAMP NOT NULL,
+    steps_processed BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- 3. Per-step ledger: content digest + the partial cluster moments the step contributed
+CREATE TABLE IF NOT EXISTS connectivity_step_ledger (
+    step_id INT NOT NULL,
+    theme_id INT NOT NULL,
+    digest VARCHAR NOT NULL,
+    partials JSONB NOT NULL, -- [[part_a, part_b, type, [[[cx,cy,cz], count, [x,y,z], m2], ...]], ...]
+    processed_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (step_id, theme_id)
+);
+
+-- 4. Per-rule cell moments (all steps merged): contact points are re-clustered from these
+CREATE TABLE IF NOT EXISTS connectivity_rule_cells (
+    part_a VARCHAR NOT NULL,
+    part_b VARCHAR NOT NULL,
+    connection_type VARCHAR NOT NULL,
+    theme_id INT NOT NULL,
+    cells JSONB NOT NULL, -- [[[cx,cy,cz], count, [x,y,z], m2], ...] on the CLUSTER_CELL_LDU grid
+    PRIMARY KEY (part_a, part_b, connection_type, theme_id)
+);
+
+COMMENT ON TABLE connectivity_extraction_state IS 'Watermark of construction steps folded into connectivity_rules';
+COMMENT ON TABLE connectivity_step_ledger IS 'Per-step contribution to connectivity_rules (for skipping and retracting)';
+COMMENT ON TABLE connectivity_rule_cells IS 'Merged cell moments behind each connectivity rule''s contact points';
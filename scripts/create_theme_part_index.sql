@@ -0,0 +1,18 @@
+-- Theme → Part Candidate Index
+-- Precomputed usage counts per (theme, part) from inventory_parts, so the
+-- MOC generators never aggregate over every inventory on a request.
+-- Maintained by scripts/theme_candidate_index.py (full or per-theme rebuild).
+
+CREATE TABLE IF NOT EXISTS theme_part_index (
+    theme_id INT NOT NULL,
+    part_num VARCHAR NOT NULL,
+    usage_count INT NOT NULL,      -- inventory_parts rows (part appears in N inventory/color combos)
+    total_quantity INT NOT NULL,   -- sum of quantities across those rows
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (theme_id, part_num)
+);
+
+-- Top-N candidates per theme is an index range scan
+CREATE INDEX IF NOT EXISTS idx_theme_part_index_usage ON theme_part_index(theme_id, usage_count DESC);
+
+COMMENT ON TABLE theme_part_index IS 'Materialized theme to part usage counts for MOC candidate lookup';
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Database - Shared, tuned connection pools for the generation hot path
+One sync engine and one async (asyncpg) engine per process instead of a
+create_engine(DATABASE_URL) per module with default pooling. The hot
+queries are module-level constants, so every call reuses the same
+SQLAlchemy compiled statement and asyncpg's per-connection prepared
+statement cache.
+"""
+
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from sqlalchemy import JSON, create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Pool tuning (per engine, per process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Prepared statements cached per asyncpg connection; set to 0 behind a
+# transaction-mode pooler (pgbouncer / Supabase port 6543), which can't keep them
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
+# Hot queries
+THEME_CANDIDATES_SQL = text("""
+    SELECT part_num, usage_count
+    FROM theme_part_index
+    WHERE theme_id = :theme_id
+    ORDER BY usage_count DESC, part_num
+    LIMIT :limit
+""")
+
+# contact_points is typed so both drivers hand back decoded JSON
+CONNECTIVITY_RULES_SQL = text("""
+    SELECT part_a, part_b, connection_type, contact_points, frequency
+    FROM connectivity_rules
+    WHERE theme_id = :theme_id
+""").columns(contact_points=JSON)
+
+_ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def to_async_url(url: str):
+    """Same database through its async driver (asyncpg / aiosqlite)"""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+
+    # asyncpg takes ssl as a connect argument, not libpq's sslmode
+    query = dict(parsed.query)
+    connect_args = {}
+    sslmode = query.pop('sslmode', None)
+    if driver == 'postgresql+asyncpg' and sslmode and sslmode != 'disable':
+        connect_args['ssl'] = sslmode
+
+    return parsed.set(drivername=driver, query=query), connect_args
+
+
+def _pool_kwargs(url) -> Dict:
+    if make_url(str(url)).get_backend_name() == 'sqlite':
+        return {}  # SQLite picks its own pool class
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+
+class _PoolCounters:
+    """Physical connections opened vs. checkouts served (reuse = checkouts / opened)"""
+
+    def __init__(self, engine: Engine):
+        self.connections_opened = 0
+        self.checkouts = 0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+
+    def _on_connect(self, *_):
+        self.connections_opened += 1
+
+    def _on_checkout(self, *_):
+        self.checkouts += 1
+
+    def get_stats(self, engine: Engine) -> Dict:
+        pool = engine.pool
+        return {
+            'pool': pool.__class__.__name__,
+            'size': pool.size() if hasattr(pool, 'size') else None,
+            'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+            'connections_opened': self.connections_opened,
+            'checkouts': self.checkouts,
+            'reuse_ratio': self.checkouts / self.connections_opened if self.connections_opened else 0.0,
+        }
+
+
+# Singleton instances for global access
+_global_engine: Optional[Engine] = None
+_global_async_engine: Optional["AsyncEngine"] = None
+_counters: Dict[str, _PoolCounters] = {}
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """Get or create the process-wide sync engine"""
+    global _global_engine
+
+    if _global_engine is None:
+        with _engine_lock:
+            if _global_engine is None:
+                engine = create_engine(DATABASE_URL, **_pool_kwargs(DATABASE_URL))
+                _counters['sync'] = _PoolCounters(engine)
+                _global_engine = engine
+
+    return _global_engine
+
+
+def create_async_db_engine(url: str = None, **overrides) -> "AsyncEngine":
+    """New async engine with the shared pool settings (overridable, e.g. poolclass)"""
+    # Imported lazily: the sync-only scripts don't need greenlet / asyncpg
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_url, connect_args = to_async_url(url or DATABASE_URL)
+    kwargs = _pool_kwargs(async_url)
+    if async_url.drivername == 'postgresql+asyncpg':
+        connect_args['statement_cache_size'] = DB_STATEMENT_CACHE_SIZE
+        kwargs['connect_args'] = connect_args
+        # SQLAlchemy's own prepared-statement LRU on top of asyncpg's
+        async_url = async_url.update_query_dict(
+            {'prepared_statement_cache_size': str(DB_STATEMENT_CACHE_SIZE)}
+        )
+    kwargs.update(overrides)
+    if overrides.get('poolclass') is not None:
+        for key in ('pool_size', 'max_overflow', 'pool_timeout'):
+            kwargs.pop(key, None)
+    return create_async_engine(async_url, **kwargs)
+
+
+def get_async_engine() -> "AsyncEngine":
+    """Get or create the process-wide async engine (raises if the driver is missing)"""
+    global _global_async_engine
+
+    if _global_async_engine is None:
+        with _engine_lock:
+            if _global_async_engine is None:
+                engine = create_async_db_engine()
+                _counters['async'] = _PoolCounters(engine.sync_engine)
+                _global_async_engine = engine
+
+    return _global_async_engine
+
+
+async def dispose_async_engine():
+    """Close pooled async connections (call from the owning event loop on shutdown)"""
+    global _global_async_engine
+
+    if _global_async_engine is not None:
+        await _global_async_engine.dispose()
+        _global_async_engine = None
+        _counters.pop('async', None)
+
+
+async def fetch_theme_candidates(theme_id: int, limit: int,
+                                 engine: Optional["AsyncEngine"] = None) -> List[Tuple[str, int]]:
+    """Top indexed parts for a theme as [(part_num, usage_count), ...]"""
+    engine = engine or get_async_engine()
+    async with engine.connect() as conn:
+        result = await conn.execute(THEME_CANDIDATES_SQL, {'theme_id': theme_id, 'limit': limit})
+        return [(str(r[0]), int(r[1])) for r in result.fetchall()]
+
+
+async def fetch_connectivity_rules(theme_id: int, engine: Optional["AsyncEngine"] = None) -> list:
+    """connectivity_rules rows for a theme (RuleStore.put input)"""
+    engine = engine or get_async_engine()
+    async with engine.connect() as conn:
+        result = await conn.execute(CONNECTIVITY_RULES_SQL, {'theme_id': theme_id})
+        return result.fetchall()
+
+
+def get_pool_stats() -> Dict:
+    stats = {'pool_size': DB_POOL_SIZE, 'max_overflow': DB_MAX_OVERFLOW,
+             'statement_cache_size': DB_STATEMENT_CACHE_SIZE}
+    if _global_engine is not None:
+        stats['sync'] = _counters['sync'].get_stats(_global_engine)
+    if _global_async_engine is not None:
+        stats['async'] = _counters['async'].get_stats(_global_async_engine.sync_engine)
+    return stats
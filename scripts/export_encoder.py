@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Export Encoder - Optimized CPU inference artifact for the VGAE encoder
+At inference VGAE.encode returns mu, so the exported module only runs
+conv1 and conv_mu (conv_logstd is dropped). The GCN layers are rewritten as
+plain nn.Linear + index_add_ message passing, so the module is TorchScript
+friendly and its linear layers can be dynamically quantized to int8.
+The artifact is tagged with the model version it was exported from.
+"""
+
+import os
+import copy
+import json
+import time
+import argparse
+import tempfile
+from typing import Optional, Tuple
+
+import torch
+
+from scripts.gnn_model import LegoVGAE
+
+RUNTIMES = ('eager', 'torchscript', 'torchscript-int8')
+
+
+def _linear(conv) -> torch.nn.Linear:
+    """nn.Linear copy of a GCNConv's weight (GCNConv adds its bias after aggregation)"""
+    weight = conv.lin.weight.detach()
+    lin = torch.nn.Linear(weight.shape[1], weight.shape[0], bias=False)
+    lin.weight.data.copy_(weight)
+    return lin
+
+
+class InferenceEncoder(torch.nn.Module):
+    """
+    mu-only GCN encoder with the same normalization as GCNConv
+    (self-loops added, symmetric deg^-1/2 weights, shared by both layers)
+    """
+
+    def __init__(self, model: LegoVGAE):
+        super().__init__()
+        encoder = model.encoder
+        self.lin1 = _linear(encoder.conv1)
+        self.bias1 = torch.nn.Parameter(encoder.conv1.bias.detach().clone())
+        self.lin_mu = _linear(encoder.conv_mu)
+        self.bias_mu = torch.nn.Parameter(encoder.conv_mu.bias.detach().clone())
+
+    def _gcn_norm(self, edge_index: torch.Tensor, num_nodes: int,
+                  dtype: torch.dtype) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        keep = edge_index[0] != edge_index[1]
+        loops = torch.arange(num_nodes, device=edge_index.device)
+        row = torch.cat([edge_index[0][keep], loops])
+        col = torch.cat([edge_index[1][keep], loops])
+
+        deg = torch.zeros(num_nodes, dtype=dtype, device=edge_index.device)
+        deg.index_add_(0, col, torch.ones(col.shape[0], dtype=dtype, device=edge_index.device))
+        deg_inv_sqrt = deg.pow(-0.5)  # every node has its self-loop, so deg >= 1
+        return row, col, deg_inv_sqrt[row] * deg_inv_sqrt[col]
+
+    def _propagate(self, h: torch.Tensor, row: torch.Tensor, col: torch.Tensor,
+                   norm: torch.Tensor) -> torch.Tensor:
+        return torch.zeros_like(h).index_add_(0, col, h[row] * norm.unsqueeze(1))
+
+    def forward(self, x: torch.Tensor, edge_index: torch.Tensor) -> torch.Tensor:
+        row, col, norm = self._gcn_norm(edge_index, x.shape[0], x.dtype)
+        h = (self._propagate(self.lin1(x), row, col, norm) + self.bias1).relu()
+        return self._propagate(self.lin_mu(h), row, col, norm) + self.bias_mu
+
+
+def encoder_paths(model_path: str, runtime: str) -> Tuple[str, str]:
+    """Artifact and metadata paths that live next to the model weights"""
+    base, _ = os.path.splitext(model_path)
+    suffix = "encoder.int8" if runtime == 'torchscript-int8' else "encoder"
+    return f"{base}.{suffix}.ts", f"{base}.{suffix}.json"
+
+
+def build_encoder(model: LegoVGAE, runtime: str) -> torch.nn.Module:
+    """Scripted CPU encoder for the given runtime (int8 = dynamic quantized linears)"""
+    encoder = InferenceEncoder(copy.deepcopy(model).cpu()).eval()
+    if runtime == 'torchscript-int8':
+        encoder = torch.ao.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+    return torch.jit.script(encoder)
+
+
+def export_encoder(model: LegoVGAE, model_path: str, version: str, runtime: str) -> str:
+    """Script (and optionally quantize) the encoder and save it atomically"""
+    artifact_path, meta_path = encoder_paths(model_path, runtime)
+    scripted = build_encoder(model, runtime)
+
+    tmp_path = artifact_path + ".tmp"
+    torch.jit.save(scripted, tmp_path)
+    os.replace(tmp_path, artifact_path)
+
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump({
+            'model_version': version,
+            'runtime': runtime,
+            'created_at': time.time(),
+        }, f, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    return artifact_path
+
+
+def load_encoder(model_path: str, version: str, runtime: str,
+                 device: torch.device) -> Optional[torch.jit.ScriptModule]:
+    """
+    Load the exported encoder if it was built from this exact model version
+
+    Returns:
+        ScriptModule (x, edge_index) -> z, or None if missing/stale/unsupported
+    """
+    artifact_path, meta_path = encoder_paths(model_path, runtime)
+
+    if not (os.path.exists(artifact_path) and os.path.exists(meta_path)):
+        return None
+
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+
+    if meta.get('model_version') != version:
+        print(f"⚠️ Encoder {artifact_path} is stale (built for v{meta.get('model_version')}, model is v{version})")
+        return None
+
+    if runtime == 'torchscript-int8' and device.type != 'cpu':
+        print(f"⚠️ Quantized encoder only runs on CPU, not {device}")
+        return None
+
+    encoder = torch.jit.load(artifact_path, map_location=device)
+    encoder.eval()
+    return encoder
+
+
+def _random_graph(num_features: int, node_features: torch.Tensor, generator: torch.Generator):
+    """Small graph shaped like a generation step (1-8 catalog parts, random edges)"""
+    num_nodes = int(torch.randint(1, 9, (1,), generator=generator))
+    x = node_features[torch.randint(0, node_features.shape[0], (num_nodes,), generator=generator)]
+    if num_nodes > 1:
+        rows = torch.randint(0, num_nodes, (num_nodes * 3,), generator=generator)
+        cols = torch.randint(0, num_nodes, (num_nodes * 3,), generator=generator)
+        mask = rows != cols
+        edge_index = torch.stack([rows[mask], cols[mask]], dim=0)
+    else:
+        edge_index = torch.empty((2, 0), dtype=torch.long)
+    return x, edge_index
+
+
+@torch.no_grad()
+def check_parity(model: LegoVGAE, encoders, node_features: torch.Tensor, num_graphs: int = 200):
+    """Max abs latent error and min cosine similarity vs eager, per runtime"""
+    from scripts.latent_table import compute_latent_table
+
+    reference = torch.from_numpy(compute_latent_table(model.model.encode, node_features))
+    generator = torch.Generator().manual_seed(0)
+    graphs = [_random_graph(node_features.shape[1], node_features, generator) for _ in range(num_graphs)]
+    graph_refs = [model.model.encode(x, e) for x, e in graphs]
+
+    results = {}
+    for runtime, encoder in encoders.items():
+        table = torch.from_numpy(compute_latent_table(encoder, node_features))
+        errors = [float((table - reference).abs().max())]
+        cosines = [float(torch.nn.functional.cosine_similarity(table, reference, dim=1).min())]
+        for (x, e), ref in zip(graphs, graph_refs):
+            z = encoder(x, e)
+            errors.append(float((z - ref).abs().max()))
+            cosines.append(float(torch.nn.functional.cosine_similarity(z, ref, dim=1).min()))
+        results[runtime] = {'max_abs_error': max(errors), 'min_cosine': min(cosines)}
+    return results
+
+
+def main():
+    from scripts.model_registry import ModelRegistry, DEFAULT_MODEL_PATH
+    from scripts.benchmark_utils import write_fake_artifacts, latency_stats, time_calls, print_stats
+
+    parser = argparse.ArgumentParser(description="Export the VGAE encoder for CPU inference")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--quantize", action="store_true", help="Also export the dynamic int8 encoder")
+    parser.add_argument("--fake-parts", type=int, help="Export from fake artifacts of this size (demo / CI)")
+    parser.add_argument("--calls", type=int, default=500, help="Single-graph calls per runtime")
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)  # match the per-worker setting of the service
+    tmp = None
+    if args.fake_parts:
+        tmp = tempfile.TemporaryDirectory()
+        paths = write_fake_artifacts(tmp.name, num_parts=args.fake_parts)
+        registry = ModelRegistry(paths['part_to_idx'], paths['node_features'], paths['model'],
+                                 device=torch.device('cpu'))
+        model_path = paths['model']
+    else:
+        registry = ModelRegistry(model_path=args.model_path, device=torch.device('cpu'))
+        model_path = args.model_path
+
+    print("🚀 Encoder Export")
+    print("=" * 60)
+
+    artifacts = registry.get()
+    runtimes = ['torchscript'] + (['torchscript-int8'] if args.quantize else [])
+    encoders = {}
+    for runtime in runtimes:
+        path = export_encoder(artifacts.model, model_path, artifacts.version, runtime)
+        encoders[runtime] = load_encoder(model_path, artifacts.version, runtime, torch.device('cpu'))
+        print(f"✅ {runtime:<18} → {path} ({os.path.getsize(path) / 1e3:.0f} KB)")
+
+    print("\n🔬 Latent parity vs eager (full catalog + 200 step-sized graphs):")
+    for runtime, result in check_parity(artifacts.model, encoders, artifacts.node_features).items():
+        ok = result['max_abs_error'] < 1e-4 if runtime == 'torchscript' else result['min_cosine'] > 0.99
+        print(f"   {'✅' if ok else '❌'} {runtime:<18} max |Δz| {result['max_abs_error']:.2e}   "
+              f"min cosine {result['min_cosine']:.5f}")
+
+    print(f"\n⚡ Single-graph encode latency ({args.calls} calls, 1 thread):")
+    generator = torch.Generator().manual_seed(1)
+    x, edge_index = _random_graph(artifacts.num_features, artifacts.node_features, generator)
+    candidates = {'eager': artifacts.model.model.encode, **encoders}
+    baseline = None
+    with torch.no_grad():
+        for runtime, encoder in candidates.items():
+            stats = latency_stats(time_calls(lambda: encoder(x, edge_index), args.calls, warmup=20))
+            baseline = baseline or stats
+            print_stats(runtime, stats)
+            print(f"   {'':<24} speedup p50 {baseline['p50_ms'] / stats['p50_ms']:.2f}x")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
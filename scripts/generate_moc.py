@@ -1,19 +1,15 @@
 import torch
-import json
 import os
 import random
 import numpy as np
-from scripts.gnn_model import LegoVGAE
-from torch_geometric.data import Data
-from sqlalchemy import create_engine, text
-from dotenv import load_dotenv
+from scripts.model_registry import ModelRegistry
 from scripts.validate_connection import ConnectionValidator
+from scripts.theme_candidate_index import get_index as get_theme_index
+from scripts.moc_search import generate_variants, validator_mask
+from scripts.export_encoder import RUNTIMES
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
-
-def generate_moc(seed_part_num, theme_id=1, num_steps=5):
+def generate_moc(seed_part_num, theme_id=1, num_steps=5, num_variants=1, beam_width=None,
+                 mode="beam", seed=None, runtime="eager"):
     print(f"🔮 Generating MOC from Seed: {seed_part_num} (Theme: {theme_id})")
     
     # 1. Load Resources
@@ -24,16 +20,13 @@ def generate_moc(seed_part_num, theme_id=1, num_steps=5):
         print("❌ Model not found. Train first.")
         return
 
-    node_features = torch.load("ai_data/node_features.pt", weights_only=False).to(device)
-    with open("ai_data/part_to_idx.json", "r") as f:
-        part_to_idx = json.load(f)
-    idx_to_part = {v: k for k, v in part_to_idx.items()}
-    
-    # 2. Load Model
-    num_features = node_features.shape[1]
-    model = LegoVGAE(num_features=num_features, latent_dim=16).to(device)
-    model.load_state_dict(torch.load("ai_models/vgae_prototype.pth", weights_only=False))
-    model.eval()
+    # 2. Load Model + precomputed latent table (scripts/latent_table.py); without
+    # a current table the catalog is encoded with the selected runtime (eager fallback)
+    registry = ModelRegistry(model_path="ai_models/vgae_prototype.pth", device=device, runtime=runtime)
+    artifacts = registry.get()
+    part_to_idx = artifacts.part_to_idx
+    idx_to_part = artifacts.idx_to_part
+    latent_table = artifacts.latent_table
     
     # 3. Initialize Graph
     if str(seed_part_num) not in part_to_idx:
@@ -44,105 +37,94 @@ def generate_moc(seed_part_num, theme_id=1, num_steps=5):
     
     # Helper: Get Top Parts for Theme
     def get_theme_candidates(tid, limit=50):
-        # Cache or simple query
-        sql = text("""
-            SELECT p.part_num, COUNT(*) as usage
-            FROM parts p
-            JOIN inventory_parts ip ON p.part_num = ip.part_num
-            JOIN inventories i ON ip.inventory_id = i.id
-            JOIN sets s ON i.set_num = s.set_num
-            WHERE s.theme_id = :tid
-            GROUP BY p.part_num
-            ORDER BY usage DESC
-            LIMIT :limit
-        """)
-        with engine.connect() as conn:
-            res = conn.execute(sql, {"tid": tid, "limit": limit}).fetchall()
+        # Materialized theme_part_index, cached in memory (DB fallback on miss)
+        part_nums = get_theme_index().get_part_nums(tid, limit=limit)
         
         # Valid parts only (must be in our mapping)
-        valid_indices = []
-        for r in res:
-            p_str = str(r[0])
-            if p_str in part_to_idx:
-                valid_indices.append(part_to_idx[p_str])
-        return valid_indices
+        return [part_to_idx[p] for p in part_nums if p in part_to_idx]
 
     print(f"   Fetching candidates for Theme {theme_id}...")
     theme_candidates = get_theme_candidates(theme_id, limit=100)
     
     if not theme_candidates:
         print("⚠️ No theme candidates found, using random fallback.")
-        theme_candidates = random.sample(list(part_to_idx.values()), 50)
+        theme_candidates = random.Random(seed).sample(list(part_to_idx.values()), 50)
     
     # Initialize validator
     validator = ConnectionValidator(theme_id=theme_id)
 
-    # 4. Generation Loop
+    # LDraw exporter (used by both greedy and batched modes)
+    def export_ldraw(indices, filename="ai_output.ldr"):
+        print(f"   Exporting to {filename}...")
+        with open(filename, "w") as f:
+            f.write("0 MOC Generated by LEGO Nexus AI\n")
+            
+            x, y, z = 0, 0, 0
+            spacing = 200 # LDraw units
+            
+            for i, idx in enumerate(indices):
+                part = idx_to_part[idx]
+                # LDraw format: 1 <Colour> <x> <y> <z> <Matrix> <File>
+                # Color 4 (Red) or 15 (White) or 72 (Dark Bluish Gray) depending on theme?
+                # Random valid color or default
+                color = 15 # White
+                
+                # Grid layout (5 per row)
+                row = i // 5
+                col = i % 5
+                cur_x = col * spacing
+                cur_z = row * spacing
+                
+                # Check if it has .dat extension, if not add it
+                if not part.endswith('.dat'):
+                    part_file = f"{part}.dat"
+                else:
+                    part_file = part
+                    
+                line = f"1 {color} {cur_x} 0 {cur_z} 1 0 0 0 1 0 0 0 1 {part_file}\n"
+                f.write(line)
+        print("✅ Export complete.")
+
+    # 4a. Batched multi-variant generation (beam search / parallel sampling)
+    if num_variants > 1 or beam_width:
+        print(f"   Generating {num_variants} variants ({mode}, beam width {beam_width or num_variants}, seed {seed})...")
+        variants = generate_variants(
+            latent_table,
+            current_indices[0],
+            torch.tensor(theme_candidates, dtype=torch.long),
+            num_steps=num_steps,
+            num_variants=num_variants,
+            beam_width=beam_width,
+            mode=mode,
+            seed=seed,
+            mask_fn=validator_mask(validator, idx_to_part)
+        )
+        for v, variant in enumerate(variants):
+            print(f"   Variant {v + 1}: score {variant.score:.4f} → {[idx_to_part[i] for i in variant.indices]}")
+            export_ldraw(variant.indices, f"moc_theme_{theme_id}_{seed_part_num}_v{v + 1}.ldr")
+        return variants
+
+    # 4b. Greedy Generation Loop
     print(f"   Starting generation ({num_steps} steps)...")
     
+    # Isolated latents for every theme candidate: scoring is one matmul per step
+    candidates_t = torch.tensor(theme_candidates, dtype=torch.long, device=device)
+    candidates_z = latent_table[candidates_t]
+    
     for step in range(num_steps):
-        # A. Create Candidate Pool from Theme
-        if len(theme_candidates) > 20:
-             candidates = random.sample(theme_candidates, 20)
-        else:
-             candidates = theme_candidates
-        
-        if not candidates: break
-        
-        # B. Form a temporary graph with [Current Nodes] + [Candidate]
-        # We want to score edges between (Any Current Node) <-> (Candidate)
-        
-        # Actually, efficient way:
-        # 1. Get Latent Z for ALL nodes (if possible) or just relevant ones.
-        # Since GNN needs message passing, we need the *structure* to get Z.
-        # But prediction is: Z_u * Z_v.
-        # If we assume the "Potential" graph is fully connected (testing all pairs),
-        # we can just run GCN on a "Hypothetical" graph connecting Current to Candidates?
-        
-        # Let's simplify:
-        # Assume Candidate is connected to at least one existing node.
-        # We construct a batch of edges to test: (Last Added Node) -> (Candidate)
-        
+        # Score (Last Added Node) -> (Every Theme Candidate) with the
+        # inner-product decoder: sigmoid(z_last . z_cand)
         last_node_idx = current_indices[-1]
+        last_z = latent_table[last_node_idx]
         
-        # Batch inference
-        # We need Z for Last Node and Z for Candidates.
-        # To get Z, we need to pass them through GNN.
-        # GNN input: X (features).
-        # Edge Index: We can assume they are isolated or connected to "virtual" context.
-        # Approximation: Use raw features X as proxies for Z if GNN is shallow, OR run GNN on the *pair*.
-        
-        # Protocol:
-        # Create a graph with [Last Node, Candidate_1, Candidate_2 ... Candidate_20]
-        # Edges: Last Node <-> All Candidates (Star graph)
-        # Run GNN -> Get Z.
-        # Decode Edge(Last, Candidate_i) -> Score.
-        
-        test_indices = [last_node_idx] + candidates
-        x_batch = node_features[test_indices]
-        
-        # Edges: 0 (Last) connected to 1..20
-        source = torch.zeros(len(candidates), dtype=torch.long)
-        target = torch.arange(1, len(candidates) + 1, dtype=torch.long)
-        edge_index = torch.stack([source, target], dim=0)
-        edge_index = torch.cat([edge_index, edge_index.flip(0)], dim=1).to(device) # Undirected
-        
-        z = model.model.encode(x_batch, edge_index)
-        
-        # Decode probabilities for edges (0, 1), (0, 2)...
-        # decoder(z, edge_index) gives score for ALL edges in edge_index
-        # We just want the forward direction (0->i)
-        
-        # Slice edge_index for query edges
-        query_edges = torch.stack([source, target], dim=0).to(device)
-        probs = model.model.decoder(z, query_edges, sigmoid=True)
+        probs = torch.sigmoid(candidates_z @ last_z)
         
         # Find best candidate
         best_idx = torch.argmax(probs).item()
         best_score = probs[best_idx].item()
         
         # Map back to global index
-        selected_candidate_global_idx = candidates[best_idx]
+        selected_candidate_global_idx = theme_candidates[best_idx]
         selected_part = idx_to_part[selected_candidate_global_idx]
         
         # PHYSICAL VALIDATION: Check if connection is geometrically valid
@@ -162,8 +144,8 @@ def generate_moc(seed_part_num, theme_id=1, num_steps=5):
             print(f"   Step {step+1}: ❌ Rejected {selected_part} - {reason}")
             # Try next best candidate
             if len(probs) > 1:
-                best_idx = torch.argsort(probs, descending=True)[1].item()
-                selected_candidate_global_idx = candidates[best_idx]
+                best_idx = torch.topk(probs, 2).indices[1].item()
+                selected_candidate_global_idx = theme_candidates[best_idx]
                 selected_part = idx_to_part[selected_candidate_global_idx]
                 print(f"   Step {step+1}: Trying alternative: {selected_part}")
         
@@ -172,37 +154,6 @@ def generate_moc(seed_part_num, theme_id=1, num_steps=5):
         current_indices.append(selected_candidate_global_idx)
 
     # 5. Export to LDraw
-    def export_ldraw(indices, filename="ai_output.ldr"):
-        print(f"   Exporting to {filename}...")
-        with open(filename, "w") as f:
-            f.write("0 MOC Generated by LEGO Nexus AI\n")
-            
-            x, y, z = 0, 0, 0
-            spacing = 200 # LDraw units
-            
-            for i, idx in enumerate(indices):
-                part = idx_to_part[idx]
-                # LDraw format: 1 <Colour> <x> <y> <z> <Matrix> <File>
-                # Color 4 (Red) or 15 (White) or 72 (Dark Bluish Gray) depending on theme?
-                # Random valid color or default
-                color = 15 # White
-                
-                # Grid layout (5 per row)
-                row = i // 5
-                col = i % 5
-                cur_x = col * spacing
-                cur_z = row * spacing
-                
-                # Check if it has .dat extension, if not add it
-                if not part.endswith('.dat'):
-                    part_file = f"{part}.dat"
-                else:
-                    part_file = part
-                    
-                line = f"1 {color} {cur_x} 0 {cur_z} 1 0 0 0 1 0 0 0 1 {part_file}\n"
-                f.write(line)
-        print("✅ Export complete.")
-
     export_ldraw(current_indices, f"moc_theme_{theme_id}_{seed_part_num}.ldr")
 
     print("\n✅ Final MOC Inventory:")
@@ -210,6 +161,26 @@ def generate_moc(seed_part_num, theme_id=1, num_steps=5):
         print(f" - {idx_to_part[idx]}")
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Generate a MOC from a seed part")
+    parser.add_argument("--seed-part", help="Seed part number (omit to run the two demo generations)")
+    parser.add_argument("--theme", type=int, default=158)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--num-variants", type=int, default=1)
+    parser.add_argument("--beam-width", type=int, default=None)
+    parser.add_argument("--mode", choices=["beam", "sample"], default="beam")
+    parser.add_argument("--seed", type=int, default=None, help="RNG seed (sample mode)")
+    parser.add_argument("--runtime", choices=RUNTIMES, default="eager",
+                        help="Encoder runtime (export first with scripts/export_encoder.py)")
+    args = parser.parse_args()
+    
+    if args.seed_part:
+        generate_moc(args.seed_part, theme_id=args.theme, num_steps=args.steps,
+                     num_variants=args.num_variants, beam_width=args.beam_width,
+                     mode=args.mode, seed=args.seed, runtime=args.runtime)
+        raise SystemExit(0)
+    
     # Test 1: Star Wars (Theme 158) with a Plate
     print("\n--- TEST 1: Star Wars (Plate 3020) ---")
     generate_moc('3020', theme_id=158, num_steps=5)
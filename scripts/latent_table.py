@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Latent Table - Offline encoding of every part into a dense latent matrix
+With an empty edge_index the GCN encoder only sees each node's own features
+(self-loop), so a part's isolated latent never changes between requests.
+We encode the whole catalog once, store it as a memory-mappable .npy next to
+the model weights and tag it with the model version it was built from.
+"""
+
+import os
+import json
+import time
+import argparse
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+
+
+def latent_table_paths(model_path: str) -> Tuple[str, str]:
+    """Table and metadata paths that live next to the model weights"""
+    base, _ = os.path.splitext(model_path)
+    return f"{base}.latents.npy", f"{base}.latents.json"
+
+
+@torch.no_grad()
+def compute_latent_table(encoder, node_features: torch.Tensor, batch_size: int = 65536) -> np.ndarray:
+    """
+    Encode every part in isolation (no edges)
+
+    Args:
+        encoder: (x, edge_index) -> z, e.g. model.model.encode or an exported encoder
+
+    Returns:
+        float32 array [num_parts, latent_dim]
+    """
+    device = node_features.device
+    empty_edges = torch.empty((2, 0), dtype=torch.long, device=device)
+    chunks = []
+
+    for start in range(0, node_features.shape[0], batch_size):
+        x = node_features[start:start + batch_size]
+        chunks.append(encoder(x, empty_edges).float().cpu())
+
+    return torch.cat(chunks, dim=0).numpy().astype(np.float32, copy=False)
+
+
+def save_latent_table(table: np.ndarray, model_path: str, version: str) -> str:
+    """Write table + version metadata (atomic rename so readers never see half a file)"""
+    table_path, meta_path = latent_table_paths(model_path)
+
+    tmp_path = table_path + ".tmp.npy"
+    np.save(tmp_path, np.ascontiguousarray(table, dtype=np.float32))
+    os.replace(tmp_path, table_path)
+
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump({
+            'model_version': version,
+            'num_parts': int(table.shape[0]),
+            'latent_dim': int(table.shape[1]),
+            'created_at': time.time(),
+        }, f, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    return table_path
+
+
+def load_latent_table(model_path: str, version: str, num_parts: int) -> Optional[np.ndarray]:
+    """
+    Memory-map the table if it was built from this exact model version
+
+    Returns:
+        Copy-on-write memmap [num_parts, latent_dim], or None if missing/stale
+    """
+    table_path, meta_path = latent_table_paths(model_path)
+
+    if not (os.path.exists(table_path) and os.path.exists(meta_path)):
+        return None
+
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+
+    if meta.get('model_version') != version or meta.get('num_parts') != num_parts:
+        print(f"⚠️ Latent table {table_path} is stale (built for v{meta.get('model_version')}, model is v{version})")
+        return None
+
+    # mmap_mode='c': pages are shared between worker processes, never written back
+    return np.load(table_path, mmap_mode='c')
+
+
+def main():
+    from scripts.model_registry import ModelRegistry, DEFAULT_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Precompute isolated part latents for candidate scoring")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+
+    print(f"🧮 Building latent table for {args.model_path}...")
+
+    # Loading the artifacts already encodes the catalog (or reuses a current table)
+    start_time = time.time()
+    registry = ModelRegistry(model_path=args.model_path, device=torch.device('cpu'))
+    artifacts = registry.get()
+    table = artifacts.latent_table.cpu().numpy()
+    table_path = save_latent_table(table, args.model_path, artifacts.version)
+    elapsed = time.time() - start_time
+
+    print(f"✅ Encoded {table.shape[0]} parts → {table_path} ({table.nbytes / 1e6:.1f} MB, {elapsed:.2f}s)")
+    print(f"   Model version: v{artifacts.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+MOC Search - Batched multi-variant generation over the latent table
+Keeps B partial MOCs (beams or independent samples) as one [B, steps] tensor
+and scores every beam against every theme candidate per step with a single
+matmul, instead of one greedy Python loop per MOC.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+# mask_fn(step, last_indices [B], candidates [C]) -> bool [B, C] (True = allowed)
+MaskFn = Callable[[int, torch.Tensor, torch.Tensor], Optional[torch.Tensor]]
+
+
+@dataclass
+class MOCVariant:
+    """One generated MOC: global part indices (seed first) and its log-score"""
+    indices: List[int]
+    score: float
+
+
+def build_remaining_vector(
+    inventory: Iterable[Tuple[str, int]],
+    part_to_idx: Dict[str, int],
+    num_parts: int,
+    device: Optional[torch.device] = None
+) -> Optional[torch.Tensor]:
+    """
+    Remaining quantity per part, aligned with part_to_idx
+
+    Returns:
+        int32 [num_parts] (0 for parts not owned), or None if the inventory is
+        empty (generation is then unconstrained)
+    """
+    indices, quantities = [], []
+    for part_num, quantity in inventory:
+        idx = part_to_idx.get(str(part_num))
+        if idx is not None and quantity > 0:
+            indices.append(idx)
+            quantities.append(int(quantity))
+
+    if not indices:
+        return None
+
+    remaining = torch.zeros(num_parts, dtype=torch.int32, device=device)
+    remaining.index_add_(
+        0,
+        torch.tensor(indices, dtype=torch.long, device=device),
+        torch.tensor(quantities, dtype=torch.int32, device=device)
+    )
+    return remaining
+
+
+def _apply_mask(log_probs: torch.Tensor, mask: Optional[torch.Tensor]) -> torch.Tensor:
+    """Drop disallowed candidates; rows with no allowed finite entry are left untouched"""
+    if mask is None:
+        return log_probs
+    allowed = mask & torch.isfinite(log_probs)
+    any_allowed = allowed.any(dim=1, keepdim=True)
+    keep = allowed | ~any_allowed
+    return log_probs.masked_fill(~keep, float('-inf'))
+
+
+@torch.no_grad()
+def generate_variants(
+    latent_table: torch.Tensor,
+    seed_idx: int,
+    candidates: torch.Tensor,
+    num_steps: int,
+    num_variants: int = 1,
+    beam_width: Optional[int] = None,
+    mode: str = "beam",
+    temperature: float = 1.0,
+    seed: Optional[int] = None,
+    mask_fn: Optional[MaskFn] = None,
+    remaining: Optional[torch.Tensor] = None
+) -> List[MOCVariant]:
+    """
+    Generate several MOCs at once
+
+    Args:
+        latent_table: [num_parts, latent_dim] isolated part latents
+        seed_idx: Global index of the seed part
+        candidates: [C] global indices of theme candidates
+        num_steps: Parts to add after the seed
+        num_variants: MOCs to return
+        beam_width: Beams kept per step in "beam" mode (>= num_variants)
+        mode: "beam" (deterministic top-B search) or "sample"
+              (num_variants independent rollouts sampled from the scores)
+        temperature: Softmax temperature for "sample" mode
+        seed: RNG seed for "sample" mode (same seed → same output)
+        mask_fn: Optional per-step validity mask over [B, C]
+        remaining: Optional owned quantity per part (build_remaining_vector);
+                   the seed consumes one, every placed part consumes one and
+                   exhausted candidates are masked out (hard constraint)
+
+    Returns:
+        Variants sorted by score (best first); fewer than num_variants when
+        the inventory leaves fewer distinct MOCs
+    """
+    device = latent_table.device
+    candidates = candidates.to(device)
+    candidates_z = latent_table[candidates]                     # [C, D]
+    num_candidates = candidates.shape[0]
+
+    if mode == "beam":
+        width = max(num_variants, beam_width or num_variants)
+    elif mode == "sample":
+        width = num_variants
+    else:
+        raise ValueError(f"Unknown generation mode: {mode}")
+
+    generator = torch.Generator(device='cpu')
+    if seed is not None:
+        generator.manual_seed(seed)
+    else:
+        generator.seed()
+
+    # All beams start from the seed; only one copy is live until step 0 expands
+    sequences = torch.full((width, 1), seed_idx, dtype=torch.long, device=device)
+    beam_scores = torch.zeros(width, device=device)
+    if mode == "beam":
+        beam_scores[1:] = float('-inf')
+
+    # Per-beam remaining quantity of each candidate [B, C]
+    beam_remaining = None
+    if remaining is not None:
+        cand_remaining = remaining[candidates].clone()
+        cand_remaining[candidates == seed_idx] -= 1
+        beam_remaining = cand_remaining.unsqueeze(0).repeat(width, 1)
+
+    for step in range(num_steps):
+        last_z = latent_table[sequences[:, -1]]                 # [B, D]
+        log_probs = F.logsigmoid(last_z @ candidates_z.t())     # [B, C]
+
+        # Inventory first (hard), so the validator's keep-the-row fallback
+        # only ever falls back to parts that are still owned
+        if beam_remaining is not None:
+            log_probs = log_probs.masked_fill(beam_remaining <= 0, float('-inf'))
+            if not torch.isfinite(log_probs).any():
+                break  # Inventory exhausted for every beam
+
+        if mask_fn is not None:
+            log_probs = _apply_mask(log_probs, mask_fn(step, sequences[:, -1], candidates))
+
+        if mode == "beam":
+            total = beam_scores.unsqueeze(1) + log_probs        # [B, C]
+            # Only finite (beam, candidate) pairs may become beams; fewer than
+            # width of them shrinks the beam set instead of padding it with -inf
+            k = min(width, int(torch.isfinite(total).sum()))
+            if k == 0:
+                break
+            top_scores, flat_idx = torch.topk(total.flatten(), k)
+            beam_idx = flat_idx // num_candidates
+            cand_idx = flat_idx % num_candidates
+            sequences = torch.cat([sequences[beam_idx], candidates[cand_idx].unsqueeze(1)], dim=1)
+            beam_scores = top_scores
+            if beam_remaining is not None:
+                beam_remaining = beam_remaining[beam_idx]
+        else:
+            # Exhausted rollouts keep sampling uniformly but their score is -inf
+            exhausted = ~torch.isfinite(log_probs).any(dim=1, keepdim=True)
+            weights = torch.softmax(log_probs.masked_fill(exhausted, 0.0) / temperature, dim=1).cpu()
+            cand_idx = torch.multinomial(weights, 1, generator=generator).squeeze(1).to(device)
+            rows = torch.arange(width, device=device)
+            beam_scores = beam_scores + log_probs[rows, cand_idx]
+            sequences = torch.cat([sequences, candidates[cand_idx].unsqueeze(1)], dim=1)
+
+        if beam_remaining is not None:
+            beam_remaining[torch.arange(len(cand_idx), device=device), cand_idx] -= 1
+
+    # Beams that never got a finite score and exhausted rollouts are dropped
+    order = torch.argsort(beam_scores, descending=True)[:num_variants]
+    order = order[torch.isfinite(beam_scores[order])]
+    sequences = sequences[order].tolist()
+    scores = beam_scores[order].tolist()
+
+    return [MOCVariant(indices=seq, score=score) for seq, score in zip(sequences, scores)]
+
+
+def validator_mask(validator, idx_to_part: Dict[int, str]) -> MaskFn:
+    """
+    Mask function backed by ConnectionValidator (same step-based placeholder
+    positions as the greedy generators). Rows are computed once per distinct
+    last part, so B beams sharing a last part cost one row.
+    """
+    def mask_fn(step: int, last_indices: torch.Tensor, candidates: torch.Tensor) -> torch.Tensor:
+        cand_parts = [idx_to_part[c] for c in candidates.tolist()]
+        pos_a = np.array([0, 0, 0])
+        pos_b = np.array([20 * (step + 1), 0, 0])
+
+        rows_by_part: Dict[int, np.ndarray] = {}
+        rows = []
+        for last in last_indices.tolist():
+            if last not in rows_by_part:
+                rows_by_part[last] = validator.validate_connections_batch(
+                    idx_to_part[last], cand_parts, pos_a, pos_b
+                )[0]
+            rows.append(rows_by_part[last])
+
+        return torch.from_numpy(np.stack(rows)).to(last_indices.device)
+
+    return mask_fn
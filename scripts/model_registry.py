@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Model Registry - Process-wide cache for GNN inference artifacts
+Loads part_to_idx.json, node_features.pt, the VGAE weights and the
+precomputed latent table once, keeps them resident on the inference device
+and hot-swaps them when the files on disk change (versioned by file fingerprint)
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+import torch
+
+from scripts.gnn_model import LegoVGAE
+from scripts.latent_table import compute_latent_table, load_latent_table
+from scripts.export_encoder import RUNTIMES, load_encoder
+
+DEFAULT_PART_TO_IDX_PATH = "ai_data/part_to_idx.json"
+DEFAULT_NODE_FEATURES_PATH = "ai_data/node_features.pt"
+DEFAULT_MODEL_PATH = "ai_models/vgae_model.pth"
+
+
+def get_inference_device() -> torch.device:
+    """Pick the inference device (MPS on Apple Silicon, CPU otherwise)"""
+    return torch.device('mps' if torch.backends.mps.is_available() else 'cpu')
+
+
+@dataclass
+class ModelArtifacts:
+    """Immutable snapshot of everything a generation request needs"""
+    version: str
+    device: torch.device
+    part_to_idx: Dict[str, int]
+    idx_to_part: Dict[int, str]
+    node_features: torch.Tensor
+    model: LegoVGAE
+    encoder: Callable[[torch.Tensor, torch.Tensor], torch.Tensor]  # (x, edge_index) -> z
+    runtime: str                # runtime actually serving encoder ('eager' on fallback)
+    latent_table: torch.Tensor  # [num_parts, latent_dim] isolated encodings
+    paths: Dict[str, str] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+    @property
+    def num_features(self) -> int:
+        return self.node_features.shape[1]
+
+
+class ModelRegistry:
+    """
+    Holds the current ModelArtifacts for the whole process
+
+    Requests grab a reference to the current snapshot with get() and keep
+    using it until they finish; a reload builds the new snapshot off to the
+    side and swaps the reference atomically, so in-flight requests are
+    never dropped or mixed across model versions.
+    """
+
+    def __init__(
+        self,
+        part_to_idx_path: str = DEFAULT_PART_TO_IDX_PATH,
+        node_features_path: str = DEFAULT_NODE_FEATURES_PATH,
+        model_path: str = DEFAULT_MODEL_PATH,
+        latent_dim: int = 16,
+        device: Optional[torch.device] = None,
+        runtime: str = "eager"
+    ):
+        if runtime not in RUNTIMES:
+            raise ValueError(f"Unknown inference runtime: {runtime} (expected one of {RUNTIMES})")
+        self.paths = {
+            'part_to_idx': part_to_idx_path,
+            'node_features': node_features_path,
+            'model': model_path,
+        }
+        self.latent_dim = latent_dim
+        self.device = device or get_inference_device()
+        self.runtime = runtime
+
+        self._artifacts: Optional[ModelArtifacts] = None
+        self._fingerprint: Optional[str] = None
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watcher = threading.Event()
+
+        self.reload_count = 0
+        self.last_reload_error: Optional[str] = None
+
+    def _compute_fingerprint(self) -> str:
+        """Version string derived from size + mtime of every artifact file"""
+        h = hashlib.sha1()
+        for name in sorted(self.paths):
+            st = os.stat(self.paths[name])
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+        return h.hexdigest()[:12]
+
+    def _load_artifacts(self, version: str) -> ModelArtifacts:
+        """Read every artifact from disk and move it to the inference device"""
+        with open(self.paths['part_to_idx'], "r") as f:
+            part_to_idx = json.load(f)
+        idx_to_part = {v: k for k, v in part_to_idx.items()}
+
+        node_features = torch.load(
+            self.paths['node_features'], map_location=self.device, weights_only=False
+        ).to(self.device)
+
+        model = LegoVGAE(num_features=node_features.shape[1], latent_dim=self.latent_dim)
+        model.load_state_dict(
+            torch.load(self.paths['model'], map_location=self.device, weights_only=False)
+        )
+        model.to(self.device)
+        model.eval()
+
+        encoder, runtime = self._load_encoder(model, version)
+
+        table = load_latent_table(self.paths['model'], version, node_features.shape[0])
+        if table is None:
+            print("⚠️ No latent table for this model version, encoding catalog in-process "
+                  "(run scripts/latent_table.py after deploys)")
+            table = compute_latent_table(encoder, node_features)
+        latent_table = torch.from_numpy(table).to(self.device)
+
+        return ModelArtifacts(
+            version=version,
+            device=self.device,
+            part_to_idx=part_to_idx,
+            idx_to_part=idx_to_part,
+            node_features=node_features,
+            model=model,
+            encoder=encoder,
+            runtime=runtime,
+            latent_table=latent_table,
+            paths=dict(self.paths),
+            loaded_at=time.time()
+        )
+
+    def _load_encoder(self, model: LegoVGAE, version: str):
+        """Exported encoder for the configured runtime, or eager encode as fallback"""
+        if self.runtime == 'eager':
+            return model.model.encode, 'eager'
+
+        encoder = load_encoder(self.paths['model'], version, self.runtime, self.device)
+        if encoder is None:
+            print(f"⚠️ No {self.runtime} encoder for this model version, using eager "
+                  "(run scripts/export_encoder.py after deploys)")
+            return model.model.encode, 'eager'
+        return encoder, self.runtime
+
+    def load(self) -> ModelArtifacts:
+        """Load artifacts unconditionally (used at startup)"""
+        with self._reload_lock:
+            version = self._compute_fingerprint()
+            start_time = time.time()
+            artifacts = self._load_artifacts(version)
+            self._artifacts = artifacts
+            self._fingerprint = version
+            self.reload_count += 1
+            elapsed = time.time() - start_time
+
+        print(f"🧠 Loaded model artifacts v{version} on {self.device} ({artifacts.runtime}) in {elapsed:.2f}s")
+        return artifacts
+
+    def get(self) -> ModelArtifacts:
+        """Return the current snapshot, loading it on first use"""
+        artifacts = self._artifacts
+        if artifacts is None:
+            artifacts = self.load()
+        return artifacts
+
+    def reload_if_changed(self) -> bool:
+        """
+        Swap in new artifacts if any file changed on disk
+
+        Returns:
+            True if a new version was loaded
+        """
+        try:
+            version = self._compute_fingerprint()
+        except FileNotFoundError as e:
+            # Deploy in progress (files being replaced) - keep serving
+            self.last_reload_error = str(e)
+            return False
+
+        if version == self._fingerprint:
+            return False
+
+        with self._reload_lock:
+            if version == self._fingerprint:
+                return False
+            try:
+                artifacts = self._load_artifacts(version)
+            except Exception as e:
+                # Half-written files: keep the old snapshot, retry next poll
+                self.last_reload_error = str(e)
+                print(f"⚠️ Model reload to v{version} failed: {e}")
+                return False
+
+            old_version = self._fingerprint
+            self._artifacts = artifacts
+            self._fingerprint = version
+            self.reload_count += 1
+            self.last_reload_error = None
+
+        print(f"🔄 Hot-reloaded model artifacts v{old_version} → v{version}")
+        return True
+
+    def start_watcher(self, interval: float = 10.0):
+        """Poll the artifact files in a daemon thread and hot-reload on change"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        self._stop_watcher.clear()
+
+        def _watch():
+            while not self._stop_watcher.wait(interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=_watch, name="model-registry-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop_watcher.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=1.0)
+            self._watcher = None
+
+    def get_stats(self) -> Dict:
+        artifacts = self._artifacts
+        return {
+            'version': artifacts.version if artifacts else None,
+            'device': str(self.device),
+            'runtime': artifacts.runtime if artifacts else self.runtime,
+            'num_parts': len(artifacts.part_to_idx) if artifacts else 0,
+            'loaded_at': artifacts.loaded_at if artifacts else None,
+            'reload_count': self.reload_count,
+            'last_reload_error': self.last_reload_error,
+        }
+
+
+# Singleton instance for global access
+_global_registry: Optional[ModelRegistry] = None
+
+
+def get_registry() -> ModelRegistry:
+    """Get or create the process-wide registry (paths and runtime overridable via env)"""
+    global _global_registry
+
+    if _global_registry is None:
+        _global_registry = ModelRegistry(
+            part_to_idx_path=os.getenv("PART_TO_IDX_PATH", DEFAULT_PART_TO_IDX_PATH),
+            node_features_path=os.getenv("NODE_FEATURES_PATH", DEFAULT_NODE_FEATURES_PATH),
+            model_path=os.getenv("MODEL_PATH", DEFAULT_MODEL_PATH),
+            runtime=os.getenv("INFERENCE_RUNTIME", "eager"),
+        )
+
+    return _global_registry
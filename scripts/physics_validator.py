@@ -4,8 +4,11 @@ Module 4: Physics Validation Engine
 Ensures generated MOCs are structurally sound and physically buildable
 """
 
+import bisect
+import threading
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
+import dataclasses
 from dataclasses import dataclass
 
 
@@ -21,6 +24,95 @@ class Part:
     mass: float = 1.0  # Relative mass (1 = standard brick)
 
 
+# Part mass database (relative to 1x1 brick); unknown parts weigh DEFAULT_PART_MASS
+PART_MASSES = {
+    '3001': 1.0,   # 2x4 brick
+    '3003': 0.75,  # 2x2 brick
+    '3004': 1.5,   # 1x2 brick
+    '3005': 0.5,   # 1x1 brick
+    '3020': 0.3,   # 2x4 plate
+    '3023': 0.2,   # 1x2 plate
+    '3024': 0.15,  # 1x1 plate
+    '3062b': 0.4,  # 1x1 round brick
+    '4070': 0.1,   # 1x1 headlight brick
+    '32316': 0.3,  # technic beam
+    '32523': 0.2,  # technic pin
+}
+DEFAULT_PART_MASS = 0.5
+
+# Process-wide part number interning (PartArray.part_ids index into _part_nums)
+_part_nums: List[str] = []
+_part_ids: Dict[str, int] = {}
+_intern_lock = threading.Lock()
+
+IDENTITY_ROTATION = np.eye(3, dtype=np.float32)
+
+
+def intern_part(part_num: str) -> int:
+    """Int ID of a part number (assigned on first use, stable for the process)"""
+    part_id = _part_ids.get(part_num)
+    if part_id is None:
+        with _intern_lock:
+            part_id = _part_ids.get(part_num)
+            if part_id is None:
+                part_id = len(_part_nums)
+                _part_nums.append(part_num)
+                _part_ids[part_num] = part_id
+    return part_id
+
+
+def part_num_of(part_id: int) -> str:
+    return _part_nums[int(part_id)]
+
+
+@dataclass
+class PartArray:
+    """Struct-of-arrays parts: row i of every array is part i"""
+    part_ids: np.ndarray    # [N] int32, interned part numbers (intern_part)
+    colors: np.ndarray      # [N] int32
+    positions: np.ndarray   # [N, 3] float32 (x, y, z) in LDraw units, +Y is down
+    rotations: np.ndarray   # [N, 3, 3] float32
+    masses: Optional[np.ndarray] = None  # [N] float32, relative (1 = standard brick); None → validator's mass table
+    
+    def __len__(self) -> int:
+        return len(self.part_ids)
+    
+    @classmethod
+    def from_parts(cls, parts: List[Part], masses: Optional[np.ndarray] = None) -> "PartArray":
+        """Pack Part objects (masses: per-part override, else left to the validator's mass table)"""
+        n = len(parts)
+        try:
+            rotations = np.array([p.rotation for p in parts], dtype=np.float32).reshape(n, 3, 3)
+        except ValueError:
+            # Some parts were built without a (full) rotation: those get the identity
+            rotations = np.stack([np.reshape(p.rotation, (3, 3)) if np.size(p.rotation) == 9 else IDENTITY_ROTATION
+                                  for p in parts]).astype(np.float32) if n else np.empty((0, 3, 3), np.float32)
+        
+        return cls(
+            part_ids=np.fromiter((intern_part(p.part_num) for p in parts), dtype=np.int32, count=n),
+            colors=np.fromiter((p.color for p in parts), dtype=np.int32, count=n),
+            positions=np.array([(p.x, p.y, p.z) for p in parts], dtype=np.float32).reshape(n, 3),
+            rotations=rotations,
+            masses=None if masses is None else np.asarray(masses, dtype=np.float32)
+        )
+    
+    @property
+    def part_nums(self) -> List[str]:
+        return [_part_nums[i] for i in self.part_ids]
+    
+    def to_parts(self) -> List[Part]:
+        """Unpack into Part objects (PART_MASSES for unset masses)"""
+        masses = self.masses
+        if masses is None:
+            masses = [PART_MASSES.get(p, DEFAULT_PART_MASS) for p in self.part_nums]
+        return [
+            Part(part_num, int(color), float(x), float(y), float(z),
+                 [float(v) for v in rotation.ravel()], float(mass))
+            for part_num, color, (x, y, z), rotation, mass
+            in zip(self.part_nums, self.colors, self.positions, self.rotations, masses)
+        ]
+
+
 class PhysicsValidator:
     """
     Validates physical plausibility of LEGO constructions
@@ -34,29 +126,42 @@ class PhysicsValidator:
     
     def __init__(self):
         # Part mass database (relative to 1x1 brick)
-        self.part_masses = {
-            '3001': 1.0,   # 2x4 brick
-            '3003': 0.75,  # 2x2 brick  
-            '3004': 1.5,   # 1x2 brick
-            '3005': 0.5,   # 1x1 brick
-            '3020': 0.3,   # 2x4 plate
-            '3023': 0.2,   # 1x2 plate
-            '3024': 0.15,  # 1x1 plate
-            '3062b': 0.4,  # 1x1 round brick
-            '4070': 0.1,   # 1x1 headlight brick
-            '32316': 0.3,  # technic beam
-            '32523': 0.2,  # technic pin
-        }
+        self.part_masses = dict(PART_MASSES)
         
         # Stability thresholds
         self.max_cantilever_ratio = 3.0  # Max overhang: 3 studs without support
         self.min_support_ratio = 0.3     # Min 30% of mass must be supported
+        
+        # Support search: parts 5-30 LDU lower (+Y is down in LDraw), within 1 stud (20 LDU)
+        self.support_band = (5.0, 30.0)
+        self.support_radius = 20.0
+        self.layer_height = 24.0         # Y layer of the spatial hash (one brick)
+        
+        # get_part_mass by interned part ID, grown as new part numbers show up
+        self._mass_table = np.zeros(0, dtype=np.float32)
     
     def get_part_mass(self, part_num: str) -> float:
         """Get mass of a part (default to 0.5 if unknown)"""
-        return self.part_masses.get(part_num, 0.5)
+        return self.part_masses.get(part_num, DEFAULT_PART_MASS)
+    
+    def get_part_masses(self, part_ids: np.ndarray) -> np.ndarray:
+        """get_part_mass of interned part IDs, as one table gather"""
+        if len(self._mass_table) < len(_part_nums):
+            new = [self.get_part_mass(p) for p in _part_nums[len(self._mass_table):]]
+            self._mass_table = np.concatenate([self._mass_table, np.asarray(new, dtype=np.float32)])
+        return self._mass_table[part_ids]
+    
+    def as_part_array(self, parts: Union[List[Part], PartArray]) -> PartArray:
+        """
+        Adapter for the List[Part] API: Part lists and arrays without masses
+        get the validator's mass table, explicit PartArray masses are kept
+        """
+        array = parts if isinstance(parts, PartArray) else PartArray.from_parts(parts)
+        if array.masses is None:
+            array = dataclasses.replace(array, masses=self.get_part_masses(array.part_ids))
+        return array
     
-    def calculate_center_of_mass(self, parts: List[Part]) -> Tuple[float, float, float]:
+    def calculate_center_of_mass(self, parts: Union[List[Part], PartArray]) -> Tuple[float, float, float]:
         """
         Calculate 3D center of mass
         
@@ -64,36 +169,117 @@ class PhysicsValidator:
             (com_x, com_y, com_z) in LDraw units
         """
         
-        if not parts:
+        array = self.as_part_array(parts)
+        if len(array) == 0:
             return (0.0, 0.0, 0.0)
         
-        total_mass = 0.0
-        weighted_x = 0.0
-        weighted_y = 0.0
-        weighted_z = 0.0
-        
-        for part in parts:
-            mass = self.get_part_mass(part.part_num)
-            total_mass += mass
-            weighted_x += part.x * mass
-            weighted_y += part.y * mass
-            weighted_z += part.z * mass
-        
+        masses = array.masses.astype(np.float64)
+        total_mass = masses.sum()
         if total_mass == 0:
             return (0.0, 0.0, 0.0)
         
-        com = (
-            weighted_x / total_mass,
-            weighted_y / total_mass,
-            weighted_z / total_mass
-        )
-        
-        return com
+        com = masses @ array.positions.astype(np.float64) / total_mass
+        return (float(com[0]), float(com[1]), float(com[2]))
     
-    def detect_cantilevers(self, parts: List[Part]) -> List[Dict]:
+    def detect_cantilevers(self, parts: Union[List[Part], PartArray]) -> List[Dict]:
         """
         Detect unsupported cantilever sections
         
+        Parts are hashed by stud cell (x, z) and Y layer, so each part only
+        checks the 3x3 cells of the layers directly below it for support.
+        Same results as detect_cantilevers_pairwise.
+        
+        Returns:
+            List of cantilever warnings with severity
+        """
+        
+        if len(parts) < 2:
+            return []
+        
+        if isinstance(parts, PartArray):
+            xs, ys, zs = parts.positions.astype(np.float64).T
+        else:
+            xs = np.array([p.x for p in parts], dtype=np.float64)
+            ys = np.array([p.y for p in parts], dtype=np.float64)
+            zs = np.array([p.z for p in parts], dtype=np.float64)
+        band_min, band_max = self.support_band
+        
+        # Hash key per part: (stud cell x, stud cell z, Y layer), packed with a
+        # 1-cell margin so neighbor keys are plain offsets
+        cells = np.stack([
+            np.floor(xs / self.support_radius),
+            np.floor(zs / self.support_radius),
+            np.floor(ys / self.layer_height)
+        ]).astype(np.int64)
+        cells -= cells.min(axis=1, keepdims=True) - 1
+        dims = cells.max(axis=1) + 3  # margin for the -1 / +2 offsets
+        keys = (cells[0] * dims[1] + cells[1]) * dims[2] + cells[2]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        
+        # Supporting parts sit 0-2 layers lower (band_max > layer_height), within +-1 cell
+        max_layers = int(np.ceil(band_max / self.layer_height))
+        supported = np.zeros(len(parts), dtype=bool)
+        for cx in (-1, 0, 1):
+            for cz in (-1, 0, 1):
+                for ly in range(0, max_layers + 1):
+                    neighbor = keys + (cx * dims[1] + cz) * dims[2] + ly
+                    lo = np.searchsorted(sorted_keys, neighbor, side='left')
+                    counts = np.searchsorted(sorted_keys, neighbor, side='right') - lo
+                    if not counts.any():
+                        continue
+                    
+                    # Expand each part's bucket into (part, candidate) pairs
+                    src = np.repeat(np.arange(len(parts)), counts)
+                    starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+                    dst = order[np.arange(len(src)) + starts]
+                    
+                    dy = ys[src] - ys[dst]
+                    dist2 = (xs[src] - xs[dst]) ** 2 + (zs[src] - zs[dst]) ** 2
+                    hit = (-band_max < dy) & (dy < -band_min) & (dist2 < self.support_radius ** 2)
+                    supported[src[hit]] = True
+        
+        # Overhang of unsupported parts: farthest part in the band below them.
+        # Parts at the same height share that band, so they are done together
+        overhang = np.zeros(len(parts))
+        y_order = np.argsort(ys, kind='stable')
+        y_sorted = ys[y_order]
+        unsupported = np.flatnonzero(~supported)
+        for y in np.unique(ys[unsupported]):
+            lo = np.searchsorted(y_sorted, y + band_min, side='left')
+            hi = np.searchsorted(y_sorted, y + band_max, side='right')
+            below = y_order[lo:hi]
+            dy = y - ys[below]
+            below = below[(-band_max < dy) & (dy < -band_min)]
+            if len(below) == 0:
+                continue  # Nothing below: base parts
+            
+            group = unsupported[ys[unsupported] == y]
+            for chunk in np.array_split(group, max(1, len(group) * len(below) // 1_000_000)):
+                dist2 = (xs[chunk, None] - xs[below]) ** 2 + (zs[chunk, None] - zs[below]) ** 2
+                overhang[chunk] = np.sqrt(dist2.max(axis=1))
+        
+        cantilevers = []
+        for i in y_order:
+            studs_overhang = float(overhang[i]) / 20.0
+            if studs_overhang > self.max_cantilever_ratio:
+                if isinstance(parts, PartArray):
+                    part_num, position = part_num_of(parts.part_ids[i]), (float(xs[i]), float(ys[i]), float(zs[i]))
+                else:
+                    part_num, position = parts[i].part_num, (parts[i].x, parts[i].y, parts[i].z)
+                cantilevers.append({
+                    'part_num': part_num,
+                    'position': position,
+                    'overhang_studs': studs_overhang,
+                    'severity': 'high' if studs_overhang > 5 else 'medium'
+                })
+        
+        return cantilevers
+    
+    def detect_cantilevers_pairwise(self, parts: List[Part]) -> List[Dict]:
+        """
+        Reference O(n²) cantilever scan (every part against every other part)
+        
         Returns:
             List of cantilever warnings with severity
         """
@@ -102,34 +288,35 @@ class PhysicsValidator:
             return []
         
         cantilevers = []
+        band_min, band_max = self.support_band
         
         # Sort parts by Y coordinate (height)
         sorted_parts = sorted(parts, key=lambda p: p.y)
         
-        for i, part in enumerate(sorted_parts):
+        for part in sorted_parts:
             # Check if part has support below
             has_support = False
             overhang_distance = 0.0
             
-            # Look for supporting parts below (within ±20 LDU in Y)
-            for support_part in sorted_parts[:i]:
+            # Look for supporting parts below
+            for support_part in sorted_parts:
                 dy = part.y - support_part.y
                 
                 # Must be below (higher Y in LDraw = lower in reality)
-                if -30 < dy < -5:
+                if -band_max < dy < -band_min:
                     # Check horizontal distance
                     dx = abs(part.x - support_part.x)
                     dz = abs(part.z - support_part.z)
-                    horizontal_dist = (dx**2 + dz**2) ** 0.5
+                    horizontal_dist2 = dx**2 + dz**2
                     
-                    if horizontal_dist < 20:  # Within 1 stud (20 LDU)
+                    if horizontal_dist2 < self.support_radius ** 2:  # Within 1 stud (20 LDU)
                         has_support = True
                         break
                     else:
-                        overhang_distance = max(overhang_distance, horizontal_dist)
+                        overhang_distance = max(overhang_distance, horizontal_dist2 ** 0.5)
             
-            # Flag if unsupported overhang
-            if not has_support and i > 0:  # Don't flag base parts
+            # Flag if unsupported overhang (base parts have nothing below: no overhang)
+            if not has_support:
                 studs_overhang = overhang_distance / 20.0
                 
                 if studs_overhang > self.max_cantilever_ratio:
@@ -142,7 +329,7 @@ class PhysicsValidator:
         
         return cantilevers
     
-    def calculate_stability_score(self, parts: List[Part]) -> Dict:
+    def calculate_stability_score(self, parts: Union[List[Part], PartArray]) -> Dict:
         """
         Calculate overall structural stability score
         
@@ -157,7 +344,8 @@ class PhysicsValidator:
             }
         """
         
-        if not parts:
+        array = self.as_part_array(parts)
+        if len(array) == 0:
             return {
                 'score': 0.0,
                 'com': (0, 0, 0),
@@ -170,25 +358,24 @@ class PhysicsValidator:
         warnings = []
         
         # 1. Center of mass
-        com = self.calculate_center_of_mass(parts)
+        com = self.calculate_center_of_mass(array)
         
         # 2. Check CoM is within base footprint
-        base_parts = sorted(parts, key=lambda p: p.y)[:3]  # Bottom 3 parts
-        base_x_min = min(p.x for p in base_parts)
-        base_x_max = max(p.x for p in base_parts)
-        base_z_min = min(p.z for p in base_parts)
-        base_z_max = max(p.z for p in base_parts)
-        
-        com_in_base = (
-            base_x_min <= com[0] <= base_x_max and
-            base_z_min <= com[2] <= base_z_max
+        base = np.argsort(array.positions[:, 1], kind='stable')[:3]  # Bottom 3 parts
+        base_xyz = array.positions[base].astype(np.float64)  # compare in float64, like the CoM
+        base_min = base_xyz.min(axis=0)
+        base_max = base_xyz.max(axis=0)
+        
+        com_in_base = bool(
+            base_min[0] <= com[0] <= base_max[0] and
+            base_min[2] <= com[2] <= base_max[2]
         )
         
         if not com_in_base:
             warnings.append("Center of mass outside base footprint")
         
         # 3. Cantilever detection
-        cantilevers = self.detect_cantilevers(parts)
+        cantilevers = self.detect_cantilevers(array)
         
         if cantilevers:
             high_severity = sum(1 for c in cantilevers if c['severity'] == 'high')
@@ -196,8 +383,8 @@ class PhysicsValidator:
                 warnings.append(f"{high_severity} high-severity cantilevers detected")
         
         # 4. Support ratio (mass over base)
-        base_mass = sum(self.get_part_mass(p.part_num) for p in base_parts)
-        total_mass = sum(self.get_part_mass(p.part_num) for p in parts)
+        base_mass = float(array.masses[base].sum(dtype=np.float64))
+        total_mass = float(array.masses.sum(dtype=np.float64))
         support_ratio = base_mass / total_mass if total_mass > 0 else 0
         
         if support_ratio < self.min_support_ratio:
@@ -266,6 +453,227 @@ class PhysicsValidator:
         return True
 
 
+class StabilityState:
+    """
+    Running calculate_stability_score of a model built part by part
+    
+    add() / remove() keep the mass total and moment sum (CoM), the parts
+    ordered by height (bottom-3 base footprint and support ratio), and a
+    Y-layer index of the parts. Each part's supporter count and overhang
+    (farthest part in the band below) only depend on the layers within the
+    support band, so a change touches those layers and nothing else.
+    score() is O(1); evaluate() scores a candidate part without keeping it.
+    """
+    
+    def __init__(self, validator: Optional[PhysicsValidator] = None, capacity: int = 64):
+        self.validator = validator or PhysicsValidator()
+        
+        # Per-slot arrays (slots are assigned in insertion order, never reused)
+        self._xyz = np.zeros((capacity, 3))
+        self._mass = np.zeros(capacity)
+        self._supporters = np.zeros(capacity, dtype=np.int32)
+        self._overhang = np.zeros(capacity)
+        self._parts: Dict[int, Part] = {}
+        self._next_slot = 0
+        
+        # Y-layer index: exact height -> slots, plus the sorted distinct heights
+        self._layers: Dict[float, List[int]] = {}
+        self._heights: List[float] = []
+        self._by_height: List[Tuple[float, int]] = []  # (y, slot), sorted
+        
+        self._mass_sum = 0.0
+        self._moment = np.zeros(3)
+        self._cantilevers = 0
+        self._high_cantilevers = 0
+    
+    def __len__(self) -> int:
+        return len(self._parts)
+    
+    def parts(self) -> List[Part]:
+        """Current parts in insertion order"""
+        return [self._parts[slot] for slot in sorted(self._parts)]
+    
+    def _grow(self):
+        capacity = 2 * len(self._mass)
+        self._xyz = np.resize(self._xyz, (capacity, 3))
+        self._mass = np.resize(self._mass, capacity)
+        self._supporters = np.resize(self._supporters, capacity)
+        self._overhang = np.resize(self._overhang, capacity)
+    
+    def _band(self, y: float, below: bool) -> np.ndarray:
+        """Slots of the parts in the support band below (or above) height y"""
+        band_min, band_max = self.validator.support_band
+        if below:
+            lo, hi = y + band_min, y + band_max
+        else:
+            lo, hi = y - band_max, y - band_min
+        start = bisect.bisect_left(self._heights, lo)
+        end = bisect.bisect_right(self._heights, hi)
+        
+        slots = []
+        for h in self._heights[start:end]:
+            dy = y - h if below else h - y  # upper part's y - lower part's y
+            if -band_max < dy < -band_min:
+                slots.extend(self._layers[h])
+        return np.array(slots, dtype=np.int64)
+    
+    def _severities(self, slots: np.ndarray) -> np.ndarray:
+        """0 = fine, 1 = medium, 2 = high cantilever (same rule as detect_cantilevers)"""
+        studs = self._overhang[slots] / 20.0
+        severity = np.where(studs > self.validator.max_cantilever_ratio, np.where(studs > 5, 2, 1), 0)
+        severity[self._supporters[slots] > 0] = 0
+        return severity
+    
+    def _count(self, severity: np.ndarray, sign: int):
+        self._cantilevers += sign * int((severity > 0).sum())
+        self._high_cantilevers += sign * int((severity == 2).sum())
+    
+    def _recompute_overhang(self, slots: np.ndarray):
+        """Overhang from scratch (parts at one height share the band below)"""
+        ys = self._xyz[slots, 1]
+        for y in np.unique(ys):
+            group = slots[ys == y]
+            below = self._band(float(y), below=True)
+            if len(below) == 0:
+                self._overhang[group] = 0.0
+                continue
+            dist2 = ((self._xyz[group, None, 0] - self._xyz[below, 0]) ** 2 +
+                     (self._xyz[group, None, 2] - self._xyz[below, 2]) ** 2)
+            self._overhang[group] = np.sqrt(dist2.max(axis=1))
+    
+    def add(self, part: Part) -> int:
+        """Add a part; returns its slot (for remove)"""
+        if self._next_slot == len(self._mass):
+            self._grow()
+        slot = self._next_slot
+        self._next_slot += 1
+        
+        # Same precision as PartArray, so scores match calculate_stability_score
+        x, y, z = (float(v) for v in np.array([part.x, part.y, part.z], dtype=np.float32))
+        mass = float(np.float32(self.validator.get_part_mass(part.part_num)))
+        radius2 = self.validator.support_radius ** 2
+        self._xyz[slot] = (x, y, z)
+        self._mass[slot] = mass
+        
+        # Own support and overhang from the band below
+        below = self._band(y, below=True)
+        if len(below):
+            dist2 = (self._xyz[below, 0] - x) ** 2 + (self._xyz[below, 2] - z) ** 2
+            self._supporters[slot] = int((dist2 < radius2).sum())
+            self._overhang[slot] = float(np.sqrt(dist2.max()))
+        else:
+            self._supporters[slot] = 0
+            self._overhang[slot] = 0.0
+        self._count(self._severities(np.array([slot])), +1)
+        
+        # Parts above may gain a supporter or a longer overhang
+        above = self._band(y, below=False)
+        if len(above):
+            dist2 = (self._xyz[above, 0] - x) ** 2 + (self._xyz[above, 2] - z) ** 2
+            self._count(self._severities(above), -1)
+            self._supporters[above] += dist2 < radius2
+            self._overhang[above] = np.maximum(self._overhang[above], np.sqrt(dist2))
+            self._count(self._severities(above), +1)
+        
+        if y not in self._layers:
+            self._layers[y] = []
+            bisect.insort(self._heights, y)
+        self._layers[y].append(slot)
+        bisect.insort(self._by_height, (y, slot))
+        
+        self._parts[slot] = part
+        self._mass_sum += mass
+        self._moment += mass * self._xyz[slot]
+        return slot
+    
+    def remove(self, slot: int):
+        """Remove the part added under slot"""
+        part = self._parts.pop(slot)
+        x, y, z = self._xyz[slot]
+        y = float(y)
+        
+        self._count(self._severities(np.array([slot])), -1)
+        self._layers[y].remove(slot)
+        if not self._layers[y]:
+            del self._layers[y]
+            self._heights.pop(bisect.bisect_left(self._heights, y))
+        self._by_height.pop(bisect.bisect_left(self._by_height, (y, slot)))
+        
+        # Parts above lose it as supporter; those it was the farthest part for are recomputed
+        above = self._band(y, below=False)
+        if len(above):
+            dist2 = (self._xyz[above, 0] - x) ** 2 + (self._xyz[above, 2] - z) ** 2
+            self._count(self._severities(above), -1)
+            self._supporters[above] -= dist2 < self.validator.support_radius ** 2
+            stale = above[self._overhang[above] <= np.sqrt(dist2)]
+            if len(stale):
+                self._recompute_overhang(stale)
+            self._count(self._severities(above), +1)
+        
+        self._mass_sum -= self._mass[slot]
+        self._moment -= self._mass[slot] * self._xyz[slot]
+        if slot == self._next_slot - 1:
+            self._next_slot -= 1  # evaluate() leaves no holes
+        return part
+    
+    def evaluate(self, part: Part) -> Dict:
+        """calculate_stability_score of the current parts plus part (state unchanged)"""
+        slot = self.add(part)
+        try:
+            return self.score()
+        finally:
+            self.remove(slot)
+    
+    def score(self) -> Dict:
+        """Same result as calculate_stability_score(self.parts())"""
+        validator = self.validator
+        if not self._parts:
+            return {
+                'score': 0.0,
+                'com': (0, 0, 0),
+                'cantilevers': 0,
+                'support_ratio': 0.0,
+                'is_stable': False,
+                'warnings': ['No parts']
+            }
+        
+        warnings = []
+        total_mass = self._mass_sum
+        com = tuple(float(c) for c in self._moment / total_mass) if total_mass != 0 else (0.0, 0.0, 0.0)
+        
+        base = [slot for _, slot in self._by_height[:3]]  # Bottom 3 parts
+        base_xyz = self._xyz[base]
+        base_min, base_max = base_xyz.min(axis=0), base_xyz.max(axis=0)
+        com_in_base = bool(
+            base_min[0] <= com[0] <= base_max[0] and
+            base_min[2] <= com[2] <= base_max[2]
+        )
+        if not com_in_base:
+            warnings.append("Center of mass outside base footprint")
+        
+        if self._high_cantilevers > 0:
+            warnings.append(f"{self._high_cantilevers} high-severity cantilevers detected")
+        
+        support_ratio = float(self._mass[base].sum()) / total_mass if total_mass > 0 else 0
+        if support_ratio < validator.min_support_ratio:
+            warnings.append(f"Insufficient base support ({support_ratio*100:.1f}%)")
+        
+        score = (
+            0.4 * (1.0 if com_in_base else 0.0) +
+            0.3 * max(0, 1.0 - self._cantilevers / 3.0) +
+            0.3 * min(1.0, support_ratio / validator.min_support_ratio)
+        )
+        
+        return {
+            'score': score,
+            'com': com,
+            'cantilevers': self._cantilevers,
+            'support_ratio': support_ratio,
+            'is_stable': score >= 0.6 and len(warnings) == 0,
+            'warnings': warnings
+        }
+
+
 def main():
     """Test physics validator"""
     
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Rule Store - Process-wide connectivity rules, sharded by theme
+Each theme's rules are loaded once, on first use, and every
+ConnectionValidator of that theme shares the same read-only ThemeRules
+instead of running its own SELECT and rebuilding a dict. A theme is mapped
+from its on-disk snapshot (rules_snapshot.py) when one exists for the
+current version; the DB query is the fallback. Writers
+(build_connectivity_rules.py) bump a per-theme version in a marker file so
+other processes drop stale shards on their next check.
+"""
+
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+from scripts.db import get_engine, CONNECTIVITY_RULES_SQL
+from scripts.compact_rules import CompactRules
+from scripts.rules_snapshot import load_snapshot, snapshot_path, snapshot_dir
+
+DEFAULT_VERSION_PATH = "ai_data/connectivity_rules.version.json"
+
+RuleKey = Tuple[str, str, str]  # (part_a, part_b, connection_type)
+
+
+@dataclass
+class ThemeRules:
+    """All rules of one theme (shared between validators - never mutate)"""
+    theme_id: int
+    compact: CompactRules       # interned IDs, CSR contact points, adjacency index
+    version: Optional[str]      # marker version the shard was loaded under
+    loaded_at: float
+    nbytes: int                 # footprint of compact
+    source: str = 'db'          # 'db' or 'snapshot' (arrays mapped from disk, shared)
+    _rules: Optional[Dict[RuleKey, Dict]] = field(default=None, init=False, repr=False)
+
+    @property
+    def rules(self) -> Dict[RuleKey, Dict]:
+        """key -> {'contact_points': [...], 'frequency': int}, built on first access only"""
+        if self._rules is None:
+            self._rules = self.compact.to_dict()
+        return self._rules
+
+
+def build_theme_rules(theme_id: int, rows, version: Optional[str] = None) -> ThemeRules:
+    """ThemeRules from connectivity_rules rows (part_a, part_b, type, contact_points, frequency)"""
+    compact = CompactRules.from_rows(rows)
+    return ThemeRules(
+        theme_id=theme_id,
+        compact=compact,
+        version=version,
+        loaded_at=time.time(),
+        nbytes=compact.nbytes()
+    )
+
+
+def rules_version_path() -> str:
+    return os.getenv("RULES_VERSION_PATH", DEFAULT_VERSION_PATH)
+
+
+def read_rules_versions(path: Optional[str] = None) -> Dict[int, str]:
+    """Per-theme rule versions from the marker file ({} if never written)"""
+    path = path or rules_version_path()
+    try:
+        with open(path, "r") as f:
+            return {int(k): v for k, v in json.load(f).items()}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def bump_rules_version(theme_ids: Iterable[int], path: Optional[str] = None,
+                       version: Optional[str] = None) -> str:
+    """Mark the given themes' rules as changed (atomic rewrite of the marker)"""
+    path = path or rules_version_path()
+    versions = read_rules_versions(path)
+    version = version or f"{time.time():.6f}"
+    for theme_id in theme_ids:
+        versions[int(theme_id)] = version
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump({str(k): v for k, v in sorted(versions.items())}, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return version
+
+
+class RuleStore:
+    """
+    Lazy theme → ThemeRules cache shared by every validator in the process
+
+    get() is a dict hit once a theme is loaded; the marker file is stat'ed
+    at most every check_interval seconds and only re-read when it changed.
+    """
+
+    def __init__(self, version_path: Optional[str] = None, check_interval: float = 5.0,
+                 snapshot_dir: Optional[str] = None):
+        self.version_path = version_path or rules_version_path()
+        self.check_interval = check_interval
+        self.snapshot_dir = snapshot_dir
+
+        self._themes: Dict[int, ThemeRules] = {}
+        self._lock = threading.Lock()
+        self._versions: Dict[int, str] = {}
+        self._marker_mtime: Optional[int] = None
+        self._next_check = 0.0
+
+        self.loads = 0
+        self.snapshot_loads = 0
+        self.hits = 0
+        self.invalidations = 0
+
+    def get(self, theme_id: int) -> ThemeRules:
+        """Rules for a theme, loading them (snapshot, else DB) on first use"""
+        self._check_versions()
+
+        theme_rules = self._themes.get(theme_id)
+        if theme_rules is not None:
+            self.hits += 1
+            return theme_rules
+
+        with self._lock:
+            # Another thread may have loaded it while we waited
+            theme_rules = self._themes.get(theme_id)
+            if theme_rules is not None:
+                return theme_rules
+
+            theme_rules = self._read_snapshot(theme_id)
+            if theme_rules is not None:
+                self._themes[theme_id] = theme_rules
+                return theme_rules
+
+            version = self._versions.get(theme_id)
+            print(f"📚 Loading connectivity rules for theme {theme_id}...")
+            with get_engine().connect() as conn:
+                rows = conn.execute(CONNECTIVITY_RULES_SQL, {'theme_id': theme_id}).fetchall()
+
+            theme_rules = build_theme_rules(theme_id, rows, version)
+            self._themes[theme_id] = theme_rules
+            self.loads += 1
+            print(f"✅ Loaded {len(theme_rules.compact)} rules "
+                  f"({theme_rules.nbytes / 1e6:.1f} MB)")
+            return theme_rules
+
+    def load_snapshot(self, theme_id: int) -> bool:
+        """Map the theme's snapshot if it is current (True if the theme is loaded afterwards)"""
+        self._check_versions()
+        if theme_id in self._themes:
+            return True
+        theme_rules = self._read_snapshot(theme_id)
+        if theme_rules is None:
+            return False
+        with self._lock:
+            self._themes.setdefault(theme_id, theme_rules)
+        return True
+
+    def _read_snapshot(self, theme_id: int) -> Optional[ThemeRules]:
+        """Map the snapshot of a theme; None if missing, unreadable or stale"""
+        path = snapshot_path(theme_id, self.snapshot_dir)
+        try:
+            loaded = load_snapshot(path)
+        except (ValueError, OSError) as e:
+            print(f"⚠️ Ignoring rules snapshot {path}: {e}")
+            return None
+        if loaded is None:
+            return None
+
+        compact, header = loaded
+        version = self._versions.get(theme_id)
+        if header.get('version') != version:
+            print(f"⚠️ Rules snapshot {path} is stale (v{header.get('version')}, current v{version})")
+            return None
+
+        self.snapshot_loads += 1
+        print(f"🗺️ Mapped {len(compact)} connectivity rules for theme {theme_id} from {path}")
+        return ThemeRules(
+            theme_id=theme_id,
+            compact=compact,
+            version=version,
+            loaded_at=time.time(),
+            nbytes=compact.nbytes(),
+            source='snapshot'
+        )
+
+    def version(self, theme_id: int) -> Optional[str]:
+        """Current marker version of a theme's rules (None if never bumped)"""
+        self._check_versions()
+        return self._versions.get(theme_id)
+
+    def is_loaded(self, theme_id: int) -> bool:
+        self._check_versions()
+        return theme_id in self._themes
+
+    def put(self, theme_id: int, rows) -> ThemeRules:
+        """Install rows fetched elsewhere (the API loads them through the async pool)"""
+        theme_rules = build_theme_rules(theme_id, rows, self._versions.get(theme_id))
+        with self._lock:
+            self._themes[theme_id] = theme_rules
+            self.loads += 1
+        return theme_rules
+
+    def invalidate(self, theme_ids: Optional[Iterable[int]] = None):
+        """Drop loaded themes so the next get() reloads them"""
+        with self._lock:
+            if theme_ids is None:
+                dropped = len(self._themes)
+                self._themes.clear()
+            else:
+                dropped = sum(self._themes.pop(t, None) is not None for t in theme_ids)
+            self.invalidations += dropped
+
+    def _check_versions(self):
+        """Drop shards whose theme was rewritten by another process"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+
+        try:
+            mtime = os.stat(self.version_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._marker_mtime:
+            return
+
+        versions = read_rules_versions(self.version_path)
+        stale = [t for t, rules in self._themes.items() if versions.get(t) != rules.version]
+        self._versions = versions
+        self._marker_mtime = mtime
+        if stale:
+            print(f"🔄 Connectivity rules changed for themes {sorted(stale)}, reloading on next use")
+            self.invalidate(stale)
+
+    def get_stats(self) -> Dict:
+        return {
+            'themes_loaded': len(self._themes),
+            'rules_loaded': sum(len(t.compact) for t in list(self._themes.values())),
+            'rules_bytes': sum(t.nbytes for t in list(self._themes.values())),
+            'loads': self.loads,
+            'snapshot_loads': self.snapshot_loads,
+            'hits': self.hits,
+            'invalidations': self.invalidations,
+        }
+
+
+# Singleton instance for global access
+_global_store: Optional[RuleStore] = None
+
+
+def get_rule_store() -> RuleStore:
+    """Get or create the process-wide rule store"""
+    global _global_store
+
+    if _global_store is None:
+        _global_store = RuleStore(
+            version_path=rules_version_path(),
+            check_interval=float(os.getenv("RULES_VERSION_CHECK_INTERVAL", "5")),
+            snapshot_dir=snapshot_dir(),
+        )
+
+    return _global_store
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Rule Upsert - Set-based writes of connectivity_rules
+All rules of a write are staged in a temp table (COPY on Postgres, a
+single executemany elsewhere), then merged with one INSERT ... SELECT ...
+ON CONFLICT and one DELETE, instead of one statement and round-trip per
+rule. Rows with frequency <= 0 are deletions.
+"""
+
+import io
+import csv
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+STAGE_TABLE = "connectivity_rules_stage"
+STAGE_COLUMNS = ('part_a', 'part_b', 'connection_type', 'contact_points', 'frequency', 'theme_id')
+
+# Temp tables live for the session; every write clears the stage first
+STAGE_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS connectivity_rules_stage (
+        part_a VARCHAR NOT NULL,
+        part_b VARCHAR NOT NULL,
+        connection_type VARCHAR NOT NULL,
+        contact_points {json_type},
+        frequency INT NOT NULL,
+        theme_id INT NOT NULL
+    )
+"""
+
+# WHERE keeps SQLite from parsing ON CONFLICT as a join constraint
+MERGE_SQL = text("""
+    INSERT INTO connectivity_rules
+    (part_a, part_b, connection_type, contact_points, frequency, theme_id)
+    SELECT part_a, part_b, connection_type, contact_points, frequency, theme_id
+    FROM connectivity_rules_stage
+    WHERE frequency > 0
+    ON CONFLICT (part_a, part_b, connection_type, theme_id)
+    DO UPDATE SET
+        frequency = EXCLUDED.frequency,
+        contact_points = EXCLUDED.contact_points
+""")
+
+DELETE_SQL = text("""
+    DELETE FROM connectivity_rules
+    WHERE (part_a, part_b, connection_type, theme_id) IN (
+        SELECT part_a, part_b, connection_type, theme_id
+        FROM connectivity_rules_stage
+        WHERE frequency <= 0
+    )
+""")
+
+
+def _stage_rows(rules: Iterable[Dict]) -> List[Tuple]:
+    """Rule dicts (part_a, part_b, conn_type, contact_points JSON text, frequency, theme_id) -> stage tuples"""
+    return [(r['part_a'], r['part_b'], r['conn_type'], r['contact_points'], int(r['frequency']), int(r['theme_id']))
+            for r in rules]
+
+
+def _copy_rows(conn: Connection, rows: List[Tuple]):
+    """COPY rows into the stage through the driver connection (same transaction as conn)"""
+    driver = conn.dialect.driver
+    raw = conn.connection.driver_connection
+    copy_sql = f"COPY {STAGE_TABLE} ({', '.join(STAGE_COLUMNS)}) FROM STDIN"
+
+    if driver == 'psycopg':
+        with raw.cursor() as cursor:
+            with cursor.copy(copy_sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        return
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    with raw.cursor() as cursor:
+        cursor.copy_expert(copy_sql + " WITH (FORMAT csv)", buffer)
+
+
+def upsert_rules(conn: Connection, rules: Iterable[Dict]) -> Tuple[int, int]:
+    """
+    Write connectivity rules with absolute frequencies in one set-based merge
+
+    Args:
+        conn: Connection inside the caller's transaction
+        rules: {'part_a', 'part_b', 'conn_type', 'contact_points' (JSON text),
+                'frequency', 'theme_id'}; frequency <= 0 deletes the rule
+
+    Returns:
+        (rules inserted or updated, rules deleted)
+    """
+    rows = _stage_rows(rules)
+    if not rows:
+        return 0, 0
+
+    postgres = conn.dialect.name == 'postgresql'
+    conn.execute(text(STAGE_DDL.format(json_type='JSONB' if postgres else 'TEXT')))
+    conn.execute(text(f"DELETE FROM {STAGE_TABLE}"))
+
+    if postgres and conn.dialect.driver in ('psycopg2', 'psycopg'):
+        _copy_rows(conn, rows)
+    else:
+        placeholders = ', '.join(f":{c}" for c in STAGE_COLUMNS)
+        conn.execute(text(f"INSERT INTO {STAGE_TABLE} ({', '.join(STAGE_COLUMNS)}) VALUES ({placeholders})"),
+                     [dict(zip(STAGE_COLUMNS, row)) for row in rows])
+
+    upserted = conn.execute(MERGE_SQL).rowcount
+    deleted = conn.execute(DELETE_SQL).rowcount
+    conn.execute(text(f"DELETE FROM {STAGE_TABLE}"))
+    return upserted, deleted
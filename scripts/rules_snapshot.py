@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Rules Snapshot - Versioned binary snapshot of one theme's CompactRules
+Layout: 8-byte magic, uint32 header length, JSON header (format, theme,
+rules version, array table), then every CompactRules array (the sorted
+part vocabulary included) at 64-byte aligned offsets. Loading maps the
+file read-only and wraps each array around the mapped pages, so worker
+processes share one copy in the page cache and nothing is parsed beyond
+the header.
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import argparse
+import dataclasses
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from scripts.compact_rules import CompactRules
+
+MAGIC = b"BCRULES\0"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+DEFAULT_SNAPSHOT_DIR = "ai_data/rules_snapshots"
+
+ARRAY_FIELDS = tuple(f.name for f in dataclasses.fields(CompactRules))
+
+
+def snapshot_dir() -> str:
+    return os.getenv("RULES_SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
+
+
+def snapshot_path(theme_id: int, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or snapshot_dir(), f"theme_{int(theme_id)}.rules")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(compact: CompactRules, theme_id: int, version: Optional[str], path: str) -> str:
+    """Write atomically (readers that already mapped the old file keep their pages)"""
+    arrays = [(name, np.ascontiguousarray(getattr(compact, name))) for name in ARRAY_FIELDS]
+
+    # The header holds the array offsets, so size it with placeholder offsets first
+    table = {name: {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': 0} for name, a in arrays}
+    header = {
+        'format': FORMAT_VERSION,
+        'theme_id': int(theme_id),
+        'version': version,
+        'created_at': time.time(),
+        'num_rules': len(compact),
+        'num_parts': len(compact.part_nums),
+        'arrays': table,
+    }
+    header_size = len(json.dumps(header).encode()) + 16 * len(arrays)  # room for real offsets
+    offset = _align(len(MAGIC) + 4 + header_size)
+    for name, a in arrays:
+        table[name]['offset'] = offset
+        offset = _align(offset + a.nbytes)
+    header_bytes = json.dumps(header).encode().ljust(header_size)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for name, a in arrays:
+            f.seek(table[name]['offset'])
+            f.write(a.tobytes())
+        f.truncate(offset)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def _parse_header(prefix: bytes, f) -> Dict:
+    if len(prefix) < len(MAGIC) + 4 or prefix[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a connectivity rules snapshot")
+    header = json.loads(f.read(struct.unpack("<I", prefix[len(MAGIC):])[0]))
+    if not isinstance(header, dict):
+        raise ValueError("snapshot header is not an object")
+    if header.get('format') != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot format {header.get('format')}")
+    return header
+
+
+def load_snapshot(path: str) -> Optional[Tuple[CompactRules, Dict]]:
+    """
+    Map a snapshot read-only
+
+    Returns:
+        (CompactRules backed by the mapping, header), or None if the file is missing
+    Raises:
+        ValueError: corrupt / foreign / truncated file
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        header = _parse_header(f.read(len(MAGIC) + 4), f)
+        size = os.fstat(f.fileno()).st_size
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    arrays = {}
+    for name in ARRAY_FIELDS:
+        try:
+            spec = header['arrays'][name]
+            dtype = np.dtype(spec['dtype'])
+            shape = tuple(int(n) for n in spec['shape'])
+            offset = int(spec['offset'])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"malformed snapshot header entry for array {name}: {e!r}")
+        count = int(np.prod(shape, dtype=np.int64))
+        if min(shape, default=0) < 0 or offset < 0 or offset + count * dtype.itemsize > size:
+            raise ValueError(f"snapshot truncated at array {name}")
+        if count == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+            continue
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+    return CompactRules(**arrays), header
+
+
+def export_theme_snapshots(theme_ids: Iterable[int], version: Optional[str] = None,
+                           directory: Optional[str] = None) -> Dict[int, str]:
+    """Snapshot the current DB rules of each theme (tagged with the given rules version)"""
+    from scripts.db import get_engine, CONNECTIVITY_RULES_SQL
+
+    paths = {}
+    with get_engine().connect() as conn:
+        for theme_id in theme_ids:
+            rows = conn.execute(CONNECTIVITY_RULES_SQL, {'theme_id': theme_id}).fetchall()
+            compact = CompactRules.from_rows(rows)
+            paths[theme_id] = write_snapshot(compact, theme_id, version, snapshot_path(theme_id, directory))
+            print(f"💾 Theme {theme_id}: {len(compact)} rules → {paths[theme_id]} "
+                  f"({os.path.getsize(paths[theme_id]) / 1e6:.1f} MB)")
+    return paths
+
+
+def main():
+    from scripts.rule_store import bump_rules_version, read_rules_versions
+
+    parser = argparse.ArgumentParser(description="Export connectivity rules snapshots from the DB")
+    parser.add_argument("--themes", type=int, nargs="+", default=[158])
+    parser.add_argument("--dir", help=f"Snapshot directory (default: $RULES_SNAPSHOT_DIR or {DEFAULT_SNAPSHOT_DIR})")
+    parser.add_argument("--bump", action="store_true",
+                        help="Also bump the rules version so running services pick the snapshots up")
+    args = parser.parse_args()
+
+    print("🚀 Connectivity Rules Snapshot Export")
+    print("=" * 60)
+
+    versions = read_rules_versions()
+    if args.bump:
+        version = f"{time.time():.6f}"
+        export_theme_snapshots(args.themes, version, args.dir)
+        bump_rules_version(args.themes, version=version)
+    else:
+        for theme_id in args.themes:
+            export_theme_snapshots([theme_id], versions.get(theme_id), args.dir)
+
+    for theme_id in args.themes:
+        path = snapshot_path(theme_id, args.dir)
+        start = time.perf_counter()
+        compact, header = load_snapshot(path)
+        print(f"✅ {path}: {len(compact)} rules, v{header['version']}, "
+              f"mapped in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Running Stats - Mergeable (count, mean, M2) moments
+M2 is the sum of squared deviations from the mean (summed over vector
+components), so variance = M2 / count. Partials computed on disjoint
+chunks merge exactly (Chan et al.) and a previously merged partial can be
+removed again, which lets extraction fold in new or changed data without
+revisiting everything else.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+Moments = Tuple[float, np.ndarray, float]  # (count, mean, M2)
+
+
+def moments(values) -> Moments:
+    """Moments of a batch of observations ([N] scalars or [N, D] vectors)"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    mean = values.mean(axis=0)
+    return float(len(values)), mean, float(((values - mean) ** 2).sum())
+
+
+def merge_moments(n_a: float, mean_a: np.ndarray, m2_a: float,
+                  n_b: float, mean_b: np.ndarray, m2_b: float) -> Moments:
+    """Moments of the union of two disjoint partials"""
+    n = n_a + n_b
+    if n == 0:
+        return 0.0, np.zeros_like(np.asarray(mean_a, dtype=np.float64)), 0.0
+    delta = np.asarray(mean_b, dtype=np.float64) - mean_a
+    mean = mean_a + delta * (n_b / n)
+    m2 = m2_a + m2_b + float((delta ** 2).sum()) * n_a * n_b / n
+    return n, mean, m2
+
+
+def remove_moments(n: float, mean: np.ndarray, m2: float,
+                   n_b: float, mean_b: np.ndarray, m2_b: float) -> Moments:
+    """Moments left after taking partial b back out of a merged partial"""
+    n_a = n - n_b
+    if n_a <= 0:
+        return 0.0, np.zeros_like(np.asarray(mean, dtype=np.float64)), 0.0
+    mean_a = (np.asarray(mean, dtype=np.float64) * n - np.asarray(mean_b, dtype=np.float64) * n_b) / n_a
+    delta = np.asarray(mean_b, dtype=np.float64) - mean_a
+    m2_a = m2 - m2_b - float((delta ** 2).sum()) * n_a * n_b / n
+    return n_a, mean_a, max(m2_a, 0.0)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Connectivity extraction: incremental runs vs a full rebuild
+Builds a SQLite stand-in with construction steps whose connections have
+more observed offset modes than MAX_CONTACT_POINTS, extracts rules
+incrementally while steps are added and rewritten, then checks the result
+against full rebuilds of the final steps (different chunk sizes, in
+process and through the process pool).
+"""
+
+import os
+import json
+import random
+import sqlite3
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="connectivity_extraction_")
+DB_PATH = os.path.join(TEST_DIR, "steps.db")
+
+# scripts.db / build_connectivity_rules read these at import
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{DB_PATH}",
+    RULES_SNAPSHOT_DIR=os.path.join(TEST_DIR, "snapshots"),
+    RULES_VERSION_PATH=os.path.join(TEST_DIR, "rules.version.json"),
+    WATERMARK_LAG_SECONDS="0",
+)
+
+SCHEMA = """
+    CREATE TABLE construction_steps (id INTEGER PRIMARY KEY, set_num TEXT, step_number INT,
+                                     graph_snapshot JSON, spatial_data JSON, updated_at TIMESTAMP);
+    CREATE TABLE connectivity_rules (id INTEGER PRIMARY KEY, part_a TEXT NOT NULL, part_b TEXT NOT NULL,
+                                     connection_type TEXT NOT NULL, contact_points JSON,
+                                     frequency INTEGER DEFAULT 1, theme_id INTEGER,
+                                     UNIQUE (part_a, part_b, connection_type, theme_id));
+    CREATE TABLE connectivity_extraction_state (theme_id INT PRIMARY KEY, watermark TIMESTAMP NOT NULL,
+                                                steps_processed BIGINT DEFAULT 0,
+                                                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE connectivity_step_ledger (step_id INT NOT NULL, theme_id INT NOT NULL, digest TEXT NOT NULL,
+                                           partials JSON NOT NULL,
+                                           processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                           PRIMARY KEY (step_id, theme_id));
+    CREATE TABLE connectivity_rule_cells (part_a TEXT NOT NULL, part_b TEXT NOT NULL,
+                                          connection_type TEXT NOT NULL, theme_id INT NOT NULL,
+                                          cells JSON NOT NULL,
+                                          PRIMARY KEY (part_a, part_b, connection_type, theme_id));
+"""
+
+PARTS = ['3001', '3003', '3020']
+
+# Seven 'distant' placements per part pair (more modes than MAX_CONTACT_POINTS),
+# two of them only half a cell apart
+MODES = [(80, 0, 0), (-80, 0, 0), (0, 0, 80), (0, 0, -80), (60, 0, 60), (-60, -24, 60), (85, 0, 5)]
+
+
+def make_step(rng: random.Random):
+    nodes = [{'part_num': rng.choice(PARTS)} for _ in range(rng.randint(2, 6))]
+    spatial = {'0': {'pos': [0.0, 0.0, 0.0]}}
+    edges = []
+    for k in range(1, len(nodes)):
+        # Uneven mode popularity, so the cluster seeds depend on the counts
+        mode = MODES[min(int(rng.expovariate(0.5)), len(MODES) - 1)]
+        base = spatial[str(k - 1)]['pos']
+        spatial[str(k)] = {'pos': [b + m + rng.gauss(0, 1.5) for b, m in zip(base, mode)]}
+        edges.append([k - 1, k])
+    return json.dumps({'nodes': nodes, 'edges': edges}), json.dumps(spatial)
+
+
+def add_steps(conn, rng, step_ids, updated_at):
+    for step_id in step_ids:
+        graph, spatial = make_step(rng)
+        conn.execute("INSERT INTO construction_steps VALUES (?, ?, ?, ?, ?, ?)",
+                     (step_id, f"poc_{step_id:04d}", 1, graph, spatial, updated_at))
+    conn.commit()
+
+
+def read_rules(conn, theme_id):
+    return {
+        (a, b, t): (frequency, json.loads(contact_points))
+        for a, b, t, contact_points, frequency in conn.execute(
+            "SELECT part_a, part_b, connection_type, contact_points, frequency "
+            "FROM connectivity_rules WHERE theme_id = ?", (theme_id,))
+    }
+
+
+def assert_same_rules(got, expected, label):
+    assert got.keys() == expected.keys(), f"{label}: different rule keys"
+    for key, (frequency, points) in expected.items():
+        got_frequency, got_points = got[key]
+        assert got_frequency == frequency, f"{label}: {key} frequency {got_frequency} != {frequency}"
+        assert len(got_points) == len(points), f"{label}: {key} has {len(got_points)} != {len(points)} points"
+        for p, q in zip(got_points, points):
+            assert p['count'] == q['count'], f"{label}: {key} point counts differ"
+            for field in ('rel_pos', 'tolerance', 'm2'):
+                a, b = p[field], q[field]
+                diff = max(abs(x - y) for x, y in zip(a, b)) if isinstance(a, list) else abs(a - b)
+                assert diff < 1e-6, f"{label}: {key} {field} differs by {diff}"
+
+
+def test_incremental_matches_full_rebuild():
+    from scripts.build_connectivity_rules import MAX_CONTACT_POINTS, extract_connectivity_rules
+
+    conn = sqlite3.connect(DB_PATH)
+    conn.executescript(SCHEMA)
+    rng = random.Random(0)
+    incremental, full, full_small_chunks, full_pool = 1, 2, 3, 4
+
+    # Incremental: three batches, then two steps rewritten in place
+    add_steps(conn, rng, range(1, 151), "2026-01-01 00:00:00")
+    extract_connectivity_rules(incremental, workers=0, chunk_size=37)
+    add_steps(conn, rng, range(151, 301), "2026-01-02 00:00:00")
+    extract_connectivity_rules(incremental, workers=0, chunk_size=37)
+    for step_id in (5, 160):
+        graph, spatial = make_step(rng)
+        conn.execute("UPDATE construction_steps SET graph_snapshot = ?, spatial_data = ?, "
+                     "updated_at = '2026-01-03 00:00:00' WHERE id = ?", (graph, spatial, step_id))
+    add_steps(conn, rng, range(301, 401), "2026-01-03 00:00:00")
+    extract_connectivity_rules(incremental, workers=0, chunk_size=37)
+
+    extract_connectivity_rules(full, full=True, workers=0, chunk_size=1000)
+    extract_connectivity_rules(full_small_chunks, full=True, workers=0, chunk_size=37)
+    extract_connectivity_rules(full_pool, full=True, workers=3, chunk_size=20)
+
+    expected = read_rules(conn, full)
+    assert max(len(points) for _, points in expected.values()) == MAX_CONTACT_POINTS, \
+        "fixture should need every contact point slot"
+    assert_same_rules(read_rules(conn, full_small_chunks), expected, "chunk size 37 vs 1000")
+    assert_same_rules(read_rules(conn, incremental), expected, "incremental vs full")
+    assert_same_rules(read_rules(conn, full_pool), expected, "process pool vs in-process")
+    conn.close()
+    print(f"✅ Incremental and chunked extraction match the full rebuild ({len(expected)} rules)")
+
+
+if __name__ == "__main__":
+    test_incremental_matches_full_rebuild()
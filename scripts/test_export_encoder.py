@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Encoder export test: TorchScript and dynamic int8 encoders exported from
+fake artifacts match eager encoding (max |Δz| < 1e-4, min cosine > 0.99)
+and are picked up by ModelRegistry for their runtime
+Run: python -m scripts.test_export_encoder
+"""
+
+import tempfile
+
+import torch
+
+from scripts.benchmark_utils import write_fake_artifacts
+from scripts.export_encoder import export_encoder, load_encoder, check_parity
+from scripts.model_registry import ModelRegistry
+
+
+def test_exported_encoder_parity():
+    cpu = torch.device('cpu')
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_fake_artifacts(tmp, num_parts=500)
+        registry = ModelRegistry(paths['part_to_idx'], paths['node_features'], paths['model'], device=cpu)
+        artifacts = registry.get()
+
+        encoders = {}
+        for runtime in ('torchscript', 'torchscript-int8'):
+            export_encoder(artifacts.model, paths['model'], artifacts.version, runtime)
+            encoders[runtime] = load_encoder(paths['model'], artifacts.version, runtime, cpu)
+            assert encoders[runtime] is not None, f"{runtime} encoder did not load"
+
+        results = check_parity(artifacts.model, encoders, artifacts.node_features, num_graphs=50)
+        assert results['torchscript']['max_abs_error'] < 1e-4, results['torchscript']
+        assert results['torchscript-int8']['min_cosine'] > 0.99, results['torchscript-int8']
+        for runtime, result in results.items():
+            print(f"✅ {runtime:<18} max |Δz| {result['max_abs_error']:.2e}   min cosine {result['min_cosine']:.5f}")
+
+        for runtime in ('torchscript', 'torchscript-int8'):
+            served = ModelRegistry(paths['part_to_idx'], paths['node_features'], paths['model'],
+                                   device=cpu, runtime=runtime).get()
+            assert served.runtime == runtime, (runtime, served.runtime)
+        print("✅ ModelRegistry serves the exported encoders")
+
+
+if __name__ == "__main__":
+    test_exported_encoder_parity()
+    print("\n🎉 Encoder export tests passed")
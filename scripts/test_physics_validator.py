@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Physics validator test: List[Part] and PartArray inputs of the same parts
+give the same centre of mass and stability report (validator mass table,
+whatever Part.mass says); explicit PartArray masses are honoured
+Run: python -m scripts.test_physics_validator
+"""
+
+import numpy as np
+
+from scripts.physics_validator import PhysicsValidator, Part, PartArray, StabilityState
+
+IDENTITY = [1, 0, 0, 0, 1, 0, 0, 0, 1]
+
+
+def make_parts(num_parts: int = 200, seed: int = 0):
+    """Stacked parts on the stud grid, some unknown to the mass table, Part.mass left at 1.0 or randomised"""
+    rng = np.random.default_rng(seed)
+    part_nums = rng.choice(['3001', '3003', '3020', '3024', '32316', 'unknown_part'], size=num_parts)
+    parts = []
+    for i, part_num in enumerate(part_nums):
+        part = Part(str(part_num), 1, 20.0 * int(rng.integers(0, 6)), -8.0 * int(rng.integers(0, 12)),
+                    20.0 * int(rng.integers(0, 6)), IDENTITY)
+        if i % 2:
+            part.mass = float(rng.uniform(0.1, 5.0))
+        parts.append(part)
+    return parts
+
+
+def test_list_and_array_agree():
+    validator = PhysicsValidator()
+    parts = make_parts()
+    array = PartArray.from_parts(parts)
+
+    com_list = validator.calculate_center_of_mass(parts)
+    com_array = validator.calculate_center_of_mass(array)
+    assert np.allclose(com_list, com_array, rtol=0, atol=1e-9), (com_list, com_array)
+
+    score_list = validator.calculate_stability_score(parts)
+    score_array = validator.calculate_stability_score(array)
+    assert score_list == score_array, (score_list, score_array)
+    print(f"✅ from_parts: CoM {tuple(round(c, 3) for c in com_array)}, score {score_array['score']:.1f}")
+
+    expected = [validator.get_part_mass(p.part_num) for p in parts]
+    assert np.allclose(validator.as_part_array(parts).masses, expected), "list masses are not the mass table"
+
+    # A validator with its own table applies it to arrays without masses too
+    heavy = PhysicsValidator()
+    heavy.part_masses['3001'] = 50.0
+    assert np.allclose(heavy.calculate_center_of_mass(parts), heavy.calculate_center_of_mass(array), rtol=0, atol=1e-9)
+    assert not np.allclose(heavy.calculate_center_of_mass(array), com_array, rtol=0, atol=1e-6)
+    print("✅ Custom mass table applies to list and PartArray inputs")
+
+
+def test_explicit_masses_are_honoured():
+    validator = PhysicsValidator()
+    parts = make_parts()
+    masses = np.random.default_rng(1).uniform(0.1, 10.0, size=len(parts)).astype(np.float32)
+    array = PartArray.from_parts(parts, masses=masses)
+
+    positions = np.array([(p.x, p.y, p.z) for p in parts])
+    expected = masses.astype(np.float64) @ positions / masses.sum(dtype=np.float64)
+    com = validator.calculate_center_of_mass(array)
+    assert np.allclose(com, expected, rtol=0, atol=1e-6), (com, expected)
+    assert not np.allclose(com, validator.calculate_center_of_mass(parts), rtol=0, atol=1e-3)
+    assert np.array_equal(validator.as_part_array(array).masses, masses)
+    assert np.allclose([p.mass for p in array.to_parts()], masses)
+    print(f"✅ Explicit masses: CoM {tuple(round(c, 3) for c in com)}")
+
+
+def test_stability_state_agrees():
+    validator = PhysicsValidator()
+    parts = make_parts()
+    state = StabilityState(validator)
+    for part in parts:
+        state.add(part)
+    com_state = state.score()['com']
+    assert np.allclose(com_state, validator.calculate_center_of_mass(parts), rtol=0, atol=1e-6), com_state
+    print("✅ StabilityState agrees with the list path")
+
+
+if __name__ == "__main__":
+    test_list_and_array_agree()
+    test_explicit_masses_are_honoured()
+    test_stability_state_agrees()
+    print("\n🎉 Physics validator tests passed")
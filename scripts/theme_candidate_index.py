@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Theme Candidate Index - Materialized theme → (part, usage count) lookup
+Replaces the per-request inventory aggregation in the MOC generators with
+a precomputed table (theme_part_index) cached in process memory with a TTL.
+Rebuilds bump a version marker file, so other processes (the API) drop the
+rebuilt themes within a few seconds instead of at TTL expiry.
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from scripts.db import get_engine, THEME_CANDIDATES_SQL
+
+DEFAULT_VERSION_PATH = "ai_data/theme_part_index.version.json"
+ALL_THEMES = "*"  # marker key bumped by full rebuilds
+
+# Live aggregation (the old per-request query) - used to build the index
+# and as the fallback when the index table is missing or has no rows
+_AGGREGATE_SQL = """
+    SELECT s.theme_id, ip.part_num, COUNT(*) AS usage_count, SUM(ip.quantity) AS total_quantity
+    FROM inventory_parts ip
+    JOIN inventories i ON ip.inventory_id = i.id
+    JOIN sets s ON i.set_num = s.set_num
+    {theme_filter}
+    GROUP BY s.theme_id, ip.part_num
+"""
+
+
+@dataclass
+class ThemeCandidates:
+    """Cached candidates for one theme, sorted by usage (most used first)"""
+    theme_id: int
+    parts: List[str]
+    usage: List[int]
+    loaded_at: float
+    source: str  # 'index' or 'fallback'
+    version: Tuple[Optional[str], Optional[str]] = (None, None)  # (all-themes, theme) marker versions at load
+
+
+def index_version_path() -> str:
+    return os.getenv("THEME_INDEX_VERSION_PATH", DEFAULT_VERSION_PATH)
+
+
+def read_index_versions(path: Optional[str] = None) -> Dict[str, str]:
+    """Theme id (or ALL_THEMES) → index version from the marker file ({} if never written)"""
+    path = path or index_version_path()
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def bump_index_version(theme_ids: Optional[Iterable[int]] = None, path: Optional[str] = None) -> str:
+    """Mark the given themes (None = all) as rebuilt (atomic rewrite of the marker)"""
+    path = path or index_version_path()
+    versions = read_index_versions(path)
+    version = f"{time.time():.6f}"
+    for key in ([ALL_THEMES] if theme_ids is None else [str(int(t)) for t in theme_ids]):
+        versions[key] = version
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(versions, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+    return version
+
+
+class ThemeCandidateIndex:
+    """
+    In-memory theme → candidate parts cache
+
+    Lookups are a dict hit plus a slice; entries expire after ttl_seconds
+    and are reloaded from theme_part_index (or the live aggregation if the
+    index has not been built yet). Themes rebuilt by another process are
+    dropped once the version marker (stat'ed at most every check_interval
+    seconds) shows a new version for them.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600.0, max_parts_per_theme: int = 1000,
+                 version_path: Optional[str] = None, check_interval: float = 5.0):
+        self.ttl_seconds = ttl_seconds
+        self.max_parts_per_theme = max_parts_per_theme
+        self.version_path = version_path or index_version_path()
+        self.check_interval = check_interval
+        self._entries: Dict[int, ThemeCandidates] = {}
+        self._lock = threading.Lock()
+        self._versions: Dict[str, str] = {}
+        self._marker_mtime: Optional[int] = None
+        self._next_check = 0.0
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.fallbacks = 0
+        self.invalidations = 0
+
+    def get_candidates(self, theme_id: int, limit: int = 100) -> List[Tuple[str, int]]:
+        """Top parts for a theme as [(part_num, usage_count), ...]"""
+        entry = self._get_entry(theme_id)
+        return list(zip(entry.parts[:limit], entry.usage[:limit]))
+
+    def get_part_nums(self, theme_id: int, limit: int = 100) -> List[str]:
+        """Top part numbers for a theme (most used first)"""
+        return self._get_entry(theme_id).parts[:limit]
+
+    def is_fresh(self, theme_id: int) -> bool:
+        """True if a lookup for this theme would be served from memory"""
+        self._check_versions()
+        entry = self._entries.get(theme_id)
+        return entry is not None and time.time() - entry.loaded_at < self.ttl_seconds
+
+    def put(self, theme_id: int, rows: List[Tuple[str, int]], source: str = 'index'):
+        """Cache rows fetched elsewhere (the API loads them through the async pool)"""
+        self._check_versions()
+        entry = ThemeCandidates(
+            theme_id=theme_id,
+            parts=[part for part, _ in rows[:self.max_parts_per_theme]],
+            usage=[usage for _, usage in rows[:self.max_parts_per_theme]],
+            loaded_at=time.time(),
+            source=source,
+            version=self._theme_version(theme_id)
+        )
+        with self._lock:
+            self._entries[theme_id] = entry
+
+    def _get_entry(self, theme_id: int) -> ThemeCandidates:
+        self._check_versions()
+        entry = self._entries.get(theme_id)
+        if entry is not None and time.time() - entry.loaded_at < self.ttl_seconds:
+            self.cache_hits += 1
+            return entry
+
+        self.cache_misses += 1
+        with self._lock:
+            # Another request may have loaded it while we waited
+            entry = self._entries.get(theme_id)
+            if entry is not None and time.time() - entry.loaded_at < self.ttl_seconds:
+                return entry
+
+            entry = self._load_theme(theme_id)
+            self._entries[theme_id] = entry
+            return entry
+
+    def _load_theme(self, theme_id: int) -> ThemeCandidates:
+        """Read one theme from the index, falling back to live aggregation"""
+        version = self._theme_version(theme_id)
+        rows = []
+        try:
+            with get_engine().connect() as conn:
+                rows = conn.execute(THEME_CANDIDATES_SQL, {'theme_id': theme_id, 'limit': self.max_parts_per_theme}).fetchall()
+        except SQLAlchemyError as e:
+            print(f"⚠️ theme_part_index unavailable ({e.__class__.__name__}), using live query")
+
+        if rows:
+            return ThemeCandidates(
+                theme_id=theme_id,
+                parts=[str(r[0]) for r in rows],
+                usage=[int(r[1]) for r in rows],
+                loaded_at=time.time(),
+                source='index',
+                version=version
+            )
+
+        self.fallbacks += 1
+        fallback_sql = text(
+            _AGGREGATE_SQL.format(theme_filter="WHERE s.theme_id = :theme_id")
+            + " ORDER BY usage_count DESC, ip.part_num LIMIT :limit"
+        )
+        with get_engine().connect() as conn:
+            rows = conn.execute(fallback_sql, {'theme_id': theme_id, 'limit': self.max_parts_per_theme}).fetchall()
+
+        return ThemeCandidates(
+            theme_id=theme_id,
+            parts=[str(r[1]) for r in rows],
+            usage=[int(r[2]) for r in rows],
+            loaded_at=time.time(),
+            source='fallback',
+            version=version
+        )
+
+    def warm(self, theme_ids: Optional[Iterable[int]] = None):
+        """Load every theme (or the given ones) from the index in one query"""
+        self._check_versions()
+        sql = "SELECT theme_id, part_num, usage_count FROM theme_part_index"
+        params = {}
+        if theme_ids is not None:
+            sql += " WHERE theme_id = ANY(:theme_ids)"
+            params['theme_ids'] = list(theme_ids)
+        sql += " ORDER BY theme_id, usage_count DESC, part_num"
+
+        with get_engine().connect() as conn:
+            rows = conn.execute(text(sql), params).fetchall()
+
+        grouped: Dict[int, ThemeCandidates] = {}
+        now = time.time()
+        for theme_id, part_num, usage in rows:
+            entry = grouped.get(theme_id)
+            if entry is None:
+                entry = grouped[theme_id] = ThemeCandidates(theme_id, [], [], now, 'index',
+                                                            self._theme_version(theme_id))
+            if len(entry.parts) < self.max_parts_per_theme:
+                entry.parts.append(str(part_num))
+                entry.usage.append(int(usage))
+
+        with self._lock:
+            self._entries.update(grouped)
+
+        print(f"✅ Warmed theme candidate cache: {len(grouped)} themes, {len(rows)} rows")
+
+    def invalidate(self, theme_ids: Optional[Iterable[int]] = None):
+        """Drop cached themes so the next lookup reloads them"""
+        with self._lock:
+            if theme_ids is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                dropped = sum(self._entries.pop(t, None) is not None for t in theme_ids)
+            self.invalidations += dropped
+
+    def _theme_version(self, theme_id: int) -> Tuple[Optional[str], Optional[str]]:
+        return self._versions.get(ALL_THEMES), self._versions.get(str(theme_id))
+
+    def _check_versions(self):
+        """Drop themes whose index was rebuilt by another process"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+
+        try:
+            mtime = os.stat(self.version_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._marker_mtime:
+            return
+
+        self._versions = read_index_versions(self.version_path)
+        self._marker_mtime = mtime
+        stale = [t for t, entry in list(self._entries.items()) if self._theme_version(t) != entry.version]
+        if stale:
+            print(f"🔄 theme_part_index rebuilt for themes {sorted(stale)}, reloading on next use")
+            self.invalidate(stale)
+
+    def get_stats(self) -> Dict:
+        total = self.cache_hits + self.cache_misses
+        return {
+            'themes_cached': len(self._entries),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'fallbacks': self.fallbacks,
+            'invalidations': self.invalidations,
+            'hit_rate': self.cache_hits / total if total else 0.0,
+        }
+
+
+def rebuild_index(theme_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute theme_part_index for all themes or only the given ones
+
+    Returns:
+        Number of (theme, part) rows written
+    """
+    theme_ids = None if theme_ids is None else sorted(set(theme_ids))
+    if theme_ids is not None and not theme_ids:
+        return 0
+
+    if theme_ids is None:
+        delete_sql = text("DELETE FROM theme_part_index")
+        theme_filter = ""
+        params = {}
+    else:
+        delete_sql = text("DELETE FROM theme_part_index WHERE theme_id = ANY(:theme_ids)")
+        theme_filter = "WHERE s.theme_id = ANY(:theme_ids)"
+        params = {'theme_ids': theme_ids}
+
+    insert_sql = text(
+        "INSERT INTO theme_part_index (theme_id, part_num, usage_count, total_quantity) "
+        + _AGGREGATE_SQL.format(theme_filter=theme_filter)
+    )
+
+    with get_engine().connect() as conn:
+        conn.execute(delete_sql, params)
+        result = conn.execute(insert_sql, params)
+        conn.commit()
+
+    written = result.rowcount
+    scope = "all themes" if theme_ids is None else f"{len(theme_ids)} themes"
+    print(f"✅ Rebuilt theme_part_index for {scope}: {written} rows")
+
+    # Other processes (the API) see the marker change; this one drops its copies now
+    bump_index_version(theme_ids)
+    get_index().invalidate(theme_ids)
+    return written
+
+
+def refresh_after_ingest(inventory_ids: Iterable[int]) -> int:
+    """
+    Incremental refresh: rebuild only the themes touched by new inventories
+
+    Running services reload those themes after their next version check
+    (THEME_INDEX_VERSION_CHECK_INTERVAL), not at TTL expiry.
+    """
+    inventory_ids = sorted(set(int(i) for i in inventory_ids))
+    if not inventory_ids:
+        return 0
+
+    sql = text("""
+        SELECT DISTINCT s.theme_id
+        FROM inventories i
+        JOIN sets s ON i.set_num = s.set_num
+        WHERE i.id = ANY(:inventory_ids)
+    """)
+    with get_engine().connect() as conn:
+        theme_ids = [r[0] for r in conn.execute(sql, {'inventory_ids': inventory_ids}).fetchall()]
+
+    print(f"🔄 {len(inventory_ids)} inventories touched {len(theme_ids)} themes")
+    return rebuild_index(theme_ids)
+
+
+# Singleton instance for global access
+_global_index: Optional[ThemeCandidateIndex] = None
+
+
+def get_index() -> ThemeCandidateIndex:
+    """Get or create the process-wide candidate cache"""
+    global _global_index
+
+    if _global_index is None:
+        _global_index = ThemeCandidateIndex(
+            ttl_seconds=float(os.getenv("THEME_INDEX_TTL", "3600")),
+            version_path=index_version_path(),
+            check_interval=float(os.getenv("THEME_INDEX_VERSION_CHECK_INTERVAL", "5")),
+        )
+
+    return _global_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the theme → part candidate index")
+    parser.add_argument("--themes", type=int, nargs="*", help="Only rebuild these theme ids")
+    args = parser.parse_args()
+
+    print("🚀 Theme Candidate Index")
+    print("=" * 60)
+
+    start = time.time()
+    rebuild_index(args.themes)
+    print(f"   Build time: {time.time() - start:.2f}s")
+
+    # Lookup benchmark
+    index = get_index()
+    theme_id = args.themes[0] if args.themes else 158
+    index.get_candidates(theme_id)
+
+    start = time.time()
+    for _ in range(10000):
+        index.get_candidates(theme_id, limit=100)
+    elapsed = time.time() - start
+    print(f"\n⚡ 10,000 cached lookups: {elapsed:.3f}s ({10000 / elapsed:.0f} lookups/sec)")
+    print(f"   Stats: {index.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,44 +5,31 @@ Uses connectivity_rules database to reject impossible connections
 """
 
 import numpy as np
-from sqlalchemy import create_engine, text
-from dotenv import load_dotenv
-import os
-from typing import Tuple, Optional
+from typing import Sequence, Tuple, Optional, Union
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+from scripts.rule_store import RuleStore, get_rule_store
+from scripts.compact_rules import CONNECTION_TYPE_IDS, ConnectionType
+
+TECHNIC_PARTS = ['32523', '32316', '32525', '15458', '87080', '32140', '11946', '2825']
 
 class ConnectionValidator:
     """Validates physical connections between LEGO parts"""
     
-    def __init__(self, theme_id: int = 158):
+    def __init__(self, theme_id: int = 158, store: Optional[RuleStore] = None):
+        """
+        Args:
+            theme_id: Theme whose rules to use
+            store: Rule store to read from (defaults to the process-wide one);
+                   the theme is loaded from the DB on first use only
+        """
         self.theme_id = theme_id
-        self.rules_cache = {}
-        self._load_rules()
+        self.theme_rules = (store or get_rule_store()).get(theme_id)
+        self.rules = self.theme_rules.compact  # shared with other validators, read-only
     
-    def _load_rules(self):
-        """Load connectivity rules into memory for fast lookup"""
-        print(f"📚 Loading connectivity rules for theme {self.theme_id}...")
-        
-        sql = text("""
-            SELECT part_a, part_b, connection_type, contact_points, frequency
-            FROM connectivity_rules
-            WHERE theme_id = :theme_id
-        """)
-        
-        with engine.connect() as conn:
-            results = conn.execute(sql, {'theme_id': self.theme_id}).fetchall()
-        
-        for row in results:
-            key = (row[0], row[1], row[2])
-            self.rules_cache[key] = {
-                'contact_points': row[3],
-                'frequency': row[4]
-            }
-        
-        print(f"✅ Loaded {len(self.rules_cache)} rules")
+    @property
+    def rules_cache(self) -> dict:
+        """{(part_a, part_b, type): {...}} view of the rules (built on first access)"""
+        return self.theme_rules.rules
     
     def validate_connection(
         self,
@@ -75,35 +62,94 @@ class ConnectionValidator:
         # Classify connection type based on distance
         conn_type = self._classify_connection(part_a, part_b, distance)
         
-        # Check if this connection pattern exists in our rules
-        key = (part_a, part_b, conn_type)
-        reverse_key = (part_b, part_a, conn_type)
-        
-        rule = self.rules_cache.get(key) or self.rules_cache.get(reverse_key)
+        # Check if this connection pattern exists in our rules (either direction)
+        row = self.rules.find(part_a, part_b, CONNECTION_TYPE_IDS[conn_type])
         
-        if not rule:
+        if row < 0:
             return False, f"No rule found for {part_a} ↔ {part_b} ({conn_type})"
         
         # Check if relative position matches any valid contact point
-        contact_points = rule['contact_points']
-        
-        for cp in contact_points:
-            expected_pos = np.array(cp['rel_pos'])
-            tolerance = cp['tolerance']
-            
-            # Calculate deviation
-            deviation = np.linalg.norm(rel_pos - expected_pos)
-            
-            if deviation <= tolerance:
-                return True, f"Valid {conn_type} connection (deviation: {deviation:.1f} LDU)"
+        expected, tolerances = self.rules.points(row)
+        if not len(expected):
+            return False, f"No contact points recorded for {part_a} ↔ {part_b} ({conn_type})"
+        
+        # Nearest contact point (rules may hold several clustered placements)
+        deviations = np.linalg.norm(rel_pos - expected.astype(np.float64), axis=1)
+        nearest = int(np.lexsort((-tolerances, deviations))[0])  # ties: the most tolerant
+        deviation, tolerance = float(deviations[nearest]), float(tolerances[nearest])
+        
+        if deviation <= tolerance:
+            return True, f"Valid {conn_type} connection (deviation: {deviation:.1f} LDU)"
         
         return False, f"Geometry mismatch: deviation {deviation:.1f} > {tolerance:.1f} LDU"
     
+    def validate_connections_batch(
+        self,
+        parts_a: Union[str, Sequence[str]],
+        parts_b: Union[str, Sequence[str]],
+        pos_a: np.ndarray,
+        pos_b: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Validate N proposed connections at once (same rules as validate_connection)
+        
+        Args:
+            parts_a, parts_b: N part numbers each (a single string is broadcast)
+            pos_a, pos_b: [N, 3] positions ([3] is broadcast)
+        
+        Returns:
+            (valid bool [N], deviation float [N]) - deviation is the distance
+            to the nearest contact point of the matched rule, inf if no rule
+        """
+        pos_a = np.asarray(pos_a, dtype=np.float64)
+        pos_b = np.asarray(pos_b, dtype=np.float64)
+        batch_sizes = [len(x) for x in (parts_a, parts_b) if not isinstance(x, str)]
+        batch_sizes += [len(p) for p in (pos_a, pos_b) if p.ndim == 2]
+        n = max(batch_sizes, default=1)
+        parts_a = np.broadcast_to(np.asarray(parts_a, dtype=object), (n,))
+        parts_b = np.broadcast_to(np.asarray(parts_b, dtype=object), (n,))
+        rel_pos = np.broadcast_to(pos_b - pos_a, (n, 3))
+        distances = np.linalg.norm(rel_pos, axis=1)
+        conn_types = self._classify_connections(parts_a, parts_b, distances)
+        
+        # Rule row per pair (either direction), -1 if none
+        rows = self.rules.lookup(parts_a, parts_b, conn_types)
+        
+        valid = np.zeros(n, dtype=bool)
+        deviations = np.full(n, np.inf)
+        found = np.flatnonzero(rows >= 0)
+        starts = self.rules.offsets[rows[found]]
+        counts = self.rules.offsets[rows[found] + 1] - starts
+        found, starts, counts = found[counts > 0], starts[counts > 0], counts[counts > 0]
+        if found.size:
+            # One entry per (pair, contact point of its rule), segments reduced per pair
+            segments = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            points = np.repeat(starts - segments, counts) + np.arange(counts.sum())
+            expected = self.rules.contact_pos[points].astype(np.float64)
+            dev = np.linalg.norm(np.repeat(rel_pos[found], counts, axis=0) - expected, axis=1)
+            nearest = np.minimum.reduceat(dev, segments)
+            # Valid if the nearest contact point (ties: any of them) accepts the offset
+            ok = (dev <= self.rules.contact_tol[points]) & (dev == np.repeat(nearest, counts))
+            valid[found] = np.logical_or.reduceat(ok, segments)
+            deviations[found] = nearest
+        
+        return valid, deviations
+    
+    def _classify_connections(self, parts_a: np.ndarray, parts_b: np.ndarray,
+                              distances: np.ndarray) -> np.ndarray:
+        """Vectorized _classify_connection (ConnectionType values)"""
+        technic = np.isin(parts_a, TECHNIC_PARTS) | np.isin(parts_b, TECHNIC_PARTS)
+        standard = np.select(
+            [(distances >= 10) & (distances <= 30), distances < 10, (distances > 30) & (distances < 60)],
+            [ConnectionType.STUD, ConnectionType.STACKED, ConnectionType.ADJACENT],
+            default=ConnectionType.DISTANT
+        )
+        technic_type = np.where(distances < 30, ConnectionType.TECHNIC_PIN, ConnectionType.TECHNIC_BEAM)
+        return np.where(technic, technic_type, standard).astype(np.uint8)
+    
     def _classify_connection(self, part_a: str, part_b: str, distance: float) -> str:
         """Classify connection type (same logic as build_connectivity_rules.py)"""
-        technic_parts = ['32523', '32316', '32525', '15458', '87080', '32140', '11946', '2825']
-        
-        if part_a in technic_parts or part_b in technic_parts:
+        if part_a in TECHNIC_PARTS or part_b in TECHNIC_PARTS:
             if distance < 30:
                 return 'technic_pin'
             else:
@@ -119,20 +165,12 @@ class ConnectionValidator:
             return 'distant'
     
     def get_valid_neighbors(self, part_num: str, max_results: int = 10) -> list:
-        """Get list of parts that commonly connect to the given part"""
-        valid_neighbors = []
-        
-        for (part_a, part_b, conn_type), data in self.rules_cache.items():
-            if part_a == part_num:
-                valid_neighbors.append({
-                    'part': part_b,
-                    'type': conn_type,
-                    'frequency': data['frequency']
-                })
-        
-        # Sort by frequency
-        valid_neighbors.sort(key=lambda x: x['frequency'], reverse=True)
-        return valid_neighbors[:max_results]
+        """Get list of parts that commonly connect to the given part (either rule direction)"""
+        return self.rules.neighbors(part_num, max_results)
+    
+    def get_neighbor_parts(self, part_num: str, max_results: int = 10) -> list:
+        """Distinct parts that commonly connect to the given part, most frequent first"""
+        return self.rules.neighbor_parts(part_num, max_results)
 
 
 def test_validator():